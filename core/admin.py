@@ -1,6 +1,16 @@
 from django.contrib import admin
 
-from core.models import Call, Record, Bill
+from core.models import (
+    ArchivedRecord,
+    Call,
+    Record,
+    Bill,
+    LineState,
+    MonthlyStatement,
+    QueuedRecord,
+    StagedRecord,
+    Tariff
+)
 
 
 class CallAdmin(admin.ModelAdmin):
@@ -15,6 +25,43 @@ class BillAdmin(admin.ModelAdmin):
     list_display = ('call', 'price', 'start', 'end')
 
 
+class LineStateAdmin(admin.ModelAdmin):
+    list_display = ('phone', 'source_call', 'source_timestamp',
+                    'destination_call', 'destination_timestamp')
+
+
+class MonthlyStatementAdmin(admin.ModelAdmin):
+    list_display = ('source', 'year', 'month', 'call_count',
+                    'total_duration', 'total_price')
+
+
+class StagedRecordAdmin(admin.ModelAdmin):
+    list_display = ('call_id', 'type', 'timestamp', 'received_at', 'status')
+    list_filter = ('status',)
+
+
+class QueuedRecordAdmin(admin.ModelAdmin):
+    list_display = ('tracking_id', 'status', 'received_at', 'processed_at')
+    list_filter = ('status',)
+
+
+class ArchivedRecordAdmin(admin.ModelAdmin):
+    list_display = ('call_id', 'source', 'destination', 'start', 'end',
+                    'archived_at')
+
+
+class TariffAdmin(admin.ModelAdmin):
+    list_display = ('effective_from', 'std_hour_start', 'std_hour_end',
+                    'std_standing_charge', 'std_minute_charge',
+                    'rdc_standing_charge', 'rdc_minute_charge')
+
+
 admin.site.register(Call, CallAdmin)
 admin.site.register(Record, RecordAdmin)
 admin.site.register(Bill, BillAdmin)
+admin.site.register(LineState, LineStateAdmin)
+admin.site.register(MonthlyStatement, MonthlyStatementAdmin)
+admin.site.register(StagedRecord, StagedRecordAdmin)
+admin.site.register(QueuedRecord, QueuedRecordAdmin)
+admin.site.register(Tariff, TariffAdmin)
+admin.site.register(ArchivedRecord, ArchivedRecordAdmin)
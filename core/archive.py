@@ -0,0 +1,65 @@
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import ArchivedRecord, Record
+
+
+def archive(horizon_days, chunk_size=1000, pause=0, max_chunks=None):
+    """
+    Moves the records of the billed calls ended more than horizon_days ago
+    to ArchivedRecord, one row per call. Records are deleted directly, in
+    short transactions of chunk_size calls separated by pause seconds, so
+    calls and bills are kept and no cascade runs. Returns the number of
+    calls archived.
+
+    The records of a chunk are looked up between the earliest bill start
+    and the latest end of its calls, so only the partitions of those months
+    are read when records are partitioned.
+    """
+    cutoff = timezone.now() - timezone.timedelta(days=horizon_days)
+    ends = Record.objects.filter(
+        type=Record.END,
+        timestamp__lt=cutoff,
+        call__bill__isnull=False
+    ).order_by('id').values_list('id', 'call_id', 'source', 'destination',
+                                 'timestamp', 'call__bill__start')
+
+    archived = chunks = 0
+    last_id = 0
+    while True:
+        chunk = list(ends.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+
+        calls = Record.objects.filter(
+            call_id__in=[row[1] for row in chunk],
+            timestamp__gte=min(row[5] for row in chunk),
+            timestamp__lte=max(row[4] for row in chunk)
+        )
+        starts = dict(calls.filter(type=Record.START).values_list(
+            'call_id', 'timestamp'
+        ))
+        records = [
+            ArchivedRecord(call_id=call_id, source=source,
+                           destination=destination, start=starts[call_id],
+                           end=end)
+            for _, call_id, source, destination, end, _ in chunk
+            if call_id in starts
+        ]
+        with transaction.atomic():
+            ArchivedRecord.objects.bulk_create(records,
+                                               ignore_conflicts=True)
+            calls.filter(
+                call_id__in=[r.call_id for r in records]
+            ).delete()
+        archived += len(records)
+
+        chunks += 1
+        if max_chunks and chunks >= max_chunks:
+            break
+        if pause:
+            time.sleep(pause)
+    return archived
@@ -0,0 +1,189 @@
+import asyncio
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+TEXT_HEADERS = [(b'content-type', b'text/plain; charset=utf-8')]
+
+
+class RequestTooLarge(Exception):
+    pass
+
+
+def wsgi_environ(scope, body):
+    """
+    Returns the WSGI environ of an ASGI HTTP scope and its request body
+    """
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin-1'),
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'REMOTE_ADDR': client[0],
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        value = value.decode('latin-1')
+        if name in environ:
+            value = f'{environ[name]},{value}'
+        environ[name] = value
+    # The body is complete, even when it was sent in chunks
+    environ['CONTENT_LENGTH'] = str(len(body))
+    return environ
+
+
+class AsgiHandler:
+    """
+    Serves a WSGI application, such as Django's, to an ASGI server.
+
+    Requests are received and responses sent on the event loop, so slow
+    clients only hold a coroutine, and the application runs on a pool of at
+    most ``threads`` threads, each with its own database connection, only
+    while the view runs. A streaming response keeps its thread, and so its
+    cursor, until it is sent, waiting for the client once ``buffer`` chunks
+    are pending.
+    """
+
+    def __init__(self, application, threads=None, max_body_size=None,
+                 buffer=16):
+        self.application = application
+        self.threads = threads or settings.ASGI_THREADS
+        self.max_body_size = max_body_size or settings.ASGI_MAX_BODY_SIZE
+        self.buffer = buffer
+        self.executor = ThreadPoolExecutor(self.threads,
+                                           thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f'Unsupported ASGI scope: {scope["type"]}')
+
+        try:
+            body = await self.read_body(receive)
+        except RequestTooLarge:
+            await send({'type': 'http.response.start', 'status': 413,
+                        'headers': TEXT_HEADERS})
+            await send({'type': 'http.response.body',
+                        'body': b'Request body too large.'})
+            return
+        if body is None:
+            return
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(self.buffer)
+        closed = threading.Event()
+        future = loop.run_in_executor(
+            self.executor, self.run, wsgi_environ(scope, body), loop, queue,
+            closed
+        )
+        try:
+            while True:
+                message = await queue.get()
+                if message is None:
+                    break
+                await send(message)
+        finally:
+            closed.set()
+            # Makes room for a thread waiting to queue a chunk, so it stops
+            while not future.done():
+                while not queue.empty():
+                    queue.get_nowait()
+                await asyncio.wait([future], timeout=0.01)
+        await future
+
+    async def read_body(self, receive):
+        """
+        Returns the request body, or None when the client disconnects
+        before sending it
+        """
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            body += message.get('body', b'')
+            if len(body) > self.max_body_size:
+                raise RequestTooLarge
+            if not message.get('more_body', False):
+                return bytes(body)
+
+    def run(self, environ, loop, queue, closed):
+        """
+        Runs the application in a thread of the pool, queueing the response
+        messages for the event loop until the response is sent or the
+        client is gone
+        """
+        def put(message):
+            if not closed.is_set():
+                asyncio.run_coroutine_threadsafe(
+                    queue.put(message), loop
+                ).result()
+
+        response = {'start': None, 'sent': False}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response['sent']:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['start'] = {
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin-1'),
+                             value.encode('latin-1'))
+                            for name, value in headers]
+            }
+            return write
+
+        def send_start():
+            if not response['sent']:
+                put(response['start'])
+                response['sent'] = True
+
+        def write(data):
+            if data:
+                send_start()
+                put({'type': 'http.response.body', 'body': data,
+                     'more_body': True})
+
+        try:
+            iterable = self.application(environ, start_response)
+            try:
+                for data in iterable:
+                    if closed.is_set():
+                        break
+                    write(data)
+                send_start()
+                put({'type': 'http.response.body', 'body': b''})
+            finally:
+                if hasattr(iterable, 'close'):
+                    iterable.close()
+        finally:
+            put(None)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
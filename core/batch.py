@@ -0,0 +1,409 @@
+import csv
+import io
+from bisect import bisect_left, insort
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import AutoField, Max, Min, Q
+from rest_framework.exceptions import ValidationError
+
+from core.models import (
+    Bill,
+    Call,
+    LineState,
+    MonthlyStatement,
+    Record,
+    StagedRecord
+)
+from core.serializers import (
+    BatchEndRecordSerializer,
+    BatchStartRecordSerializer
+)
+
+
+def copy_insert(model, objs):
+    """
+    Inserts model instances with a PostgreSQL ``COPY``, which is faster than
+    ``INSERT`` for large loads. Auto primary keys are left to the database
+    and are not set on the instances.
+    """
+    if not objs:
+        return
+    fields = [f for f in model._meta.concrete_fields
+              if not isinstance(f, AutoField)]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for obj in objs:
+        writer.writerow([
+            f.get_db_prep_save(getattr(obj, f.attname), connection)
+            for f in fields
+        ])
+    buffer.seek(0)
+
+    quote_name = connection.ops.quote_name
+    columns = ', '.join(quote_name(f.column) for f in fields)
+    sql = (f'COPY {quote_name(model._meta.db_table)} ({columns}) '
+           f'FROM STDIN WITH (FORMAT csv)')
+    with connection.cursor() as cursor, connection.wrap_database_errors:
+        cursor.copy_expert(sql, buffer)
+
+
+class PhoneTimeline:
+    """
+    In-memory view of the records of a single phone number (as source or
+    destination), holding only the records needed to validate a batch
+    """
+
+    def __init__(self):
+        self.events = []
+
+    def add(self, timestamp, type):
+        insort(self.events, (timestamp, type))
+
+    def has_timestamp(self, timestamp):
+        index = bisect_left(self.events, (timestamp,))
+        return (index < len(self.events) and
+                self.events[index][0] == timestamp)
+
+    def type_less_than(self, timestamp):
+        """
+        Returns the type of the latest record before timestamp
+        """
+        index = bisect_left(self.events, (timestamp,))
+        if index:
+            return self.events[index - 1][1]
+
+    def type_greater_than(self, timestamp):
+        """
+        Returns the type of the earliest record at or after timestamp
+        """
+        index = bisect_left(self.events, (timestamp,))
+        if index < len(self.events):
+            return self.events[index][1]
+
+
+class RecordBatch:
+    """
+    Validates and stores a batch of start and end call records.
+
+    The batch is validated as if each record had been posted to
+    :view:`core.RecordCreate` in order, but the database is only hit by a
+    fixed number of set-based queries, whatever the size of the batch. Valid
+    records and their resulting bills are inserted with ``bulk_create``.
+
+    End records of unknown calls are staged as :model:`core.StagedRecord`,
+    unless stage_orphans is False. With use_copy, calls, records and bills
+    are loaded with ``COPY`` on PostgreSQL.
+    """
+
+    def __init__(self, data, stage_orphans=True, use_copy=False):
+        self.data = data
+        self.stage_orphans = stage_orphans
+        self.use_copy = use_copy and connection.vendor == 'postgresql'
+        self.results = [None] * len(data)
+        self.items = []
+        self.calls = {}
+        self.created_calls = []
+        self.records = {}
+        self.lines = {}
+        self.changed_lines = set()
+        self.stored_lines = set()
+        self.timelines = {'source': {}, 'destination': {}}
+
+    def parse(self):
+        """
+        Runs field validation for every item, without touching the database.
+        A single serializer per record type validates all the items, so its
+        fields are only built once.
+        """
+        serializers = {
+            Record.START: BatchStartRecordSerializer(),
+            Record.END: BatchEndRecordSerializer()
+        }
+        for index, item in enumerate(self.data):
+            if not isinstance(item, dict):
+                self.reject(index, ['Invalid record. Expected an object.'])
+                continue
+            if item.get('type') == Record.START:
+                serializer = serializers[Record.START]
+            else:
+                serializer = serializers[Record.END]
+
+            try:
+                data = serializer.run_validation(item)
+            except ValidationError as exc:
+                self.reject(index, exc.detail)
+            else:
+                self.items.append((index, serializer, data))
+
+    def reject(self, index, errors):
+        self.results[index] = {
+            'index': index,
+            'status': 400,
+            'errors': errors
+        }
+
+    def load_phones(self):
+        """
+        Loads the calls of the batch, and returns the source and destination
+        phones its records depend on
+        """
+        call_ids = {data['call_id'] for _, _, data in self.items}
+        self.calls = Call.objects.in_bulk(call_ids)
+
+        phones = {'source': set(), 'destination': set()}
+        for _, _, data in self.items:
+            call = self.calls.get(data['call_id'])
+            if data['type'] == Record.START:
+                phones['source'].add(data['source'])
+                phones['destination'].add(data['destination'])
+            elif call:
+                phones['source'].add(call.source)
+                phones['destination'].add(call.destination)
+        return phones
+
+    def load(self, phones):
+        """
+        Loads every record and neighbouring record the batch depends on
+        """
+        self.records = {}
+        self.changed_lines = set()
+        self.timelines = {'source': {}, 'destination': {}}
+        call_ids = {data['call_id'] for _, _, data in self.items}
+        for record in Record.objects.filter(call_id__in=call_ids):
+            self.records[(record.call_id, record.type)] = record.timestamp
+
+        self.lines = LineState.objects.in_bulk(
+            phones['source'] | phones['destination']
+        )
+        self.stored_lines = set(self.lines)
+        for phone in phones['source'] | phones['destination']:
+            self.lines.setdefault(phone, LineState(phone=phone))
+
+        timestamps = [data['timestamp'] for _, _, data in self.items]
+        if timestamps:
+            for phone in ('source', 'destination'):
+                self.load_timelines(phone, phones[phone],
+                                    min(timestamps), max(timestamps))
+
+    def load_timelines(self, phone, numbers, lower, upper):
+        """
+        Loads, for each number, the records within the batch time window and
+        the closest record on each side of the window
+        """
+        timelines = self.timelines[phone]
+        for number in numbers:
+            timelines[number] = PhoneTimeline()
+        if not numbers:
+            return
+
+        window = Record.objects.filter(
+            **{f'{phone}__in': numbers},
+            timestamp__gte=lower,
+            timestamp__lte=upper
+        ).values_list(phone, 'timestamp', 'type')
+        for number, timestamp, type in window:
+            timelines[number].add(timestamp, type)
+
+        bounds = Record.objects.filter(
+            **{f'{phone}__in': numbers}
+        ).values(phone).annotate(
+            before=Max('timestamp', filter=Q(timestamp__lt=lower)),
+            after=Min('timestamp', filter=Q(timestamp__gt=upper))
+        )
+        neighbours = set()
+        for bound in bounds:
+            for key in ('before', 'after'):
+                if bound[key] is not None:
+                    neighbours.add((bound[phone], bound[key]))
+        if not neighbours:
+            return
+
+        rows = Record.objects.filter(
+            **{f'{phone}__in': {number for number, _ in neighbours}},
+            timestamp__in={timestamp for _, timestamp in neighbours}
+        ).values_list(phone, 'timestamp', 'type')
+        for number, timestamp, type in rows:
+            if (number, timestamp) in neighbours:
+                timelines[number].add(timestamp, type)
+
+    def validate(self, data):
+        """
+        Mirrors :model:`core.Record` ``save`` validations against the
+        in-memory state. Returns the errors of the item, if any.
+        """
+        call_id, type = data['call_id'], data['type']
+        timestamp = data['timestamp']
+
+        if type == Record.START:
+            if call_id in self.calls:
+                return {'id': ['Call with this Id already exists.']}
+            call = Call(id=call_id, source=data['source'],
+                        destination=data['destination'])
+        else:
+            call = self.calls.get(call_id)
+            if call is None:
+                return {'call': [f'call instance with id {call_id} does '
+                                 f'not exist.']}
+            if (call_id, Record.END) in self.records:
+                return {'__all__': ['Record with this Call and Type already '
+                                    'exists.']}
+            start = self.records.get((call_id, Record.START))
+            if start is None:
+                return ['There is no start record for this call']
+            if timestamp <= start:
+                return ['Timestamp of end record cannot be less or equal to '
+                        'start record']
+
+        source = self.timelines['source'][call.source]
+        destination = self.timelines['destination'][call.destination]
+
+        if source.has_timestamp(timestamp):
+            return ['There is already a start record for this source and '
+                    'timestamp']
+        if destination.has_timestamp(timestamp):
+            return ['There is already a start record for this destination '
+                    'and timestamp']
+        if type == Record.START:
+            if self.lines[call.source].source_call_id:
+                return ['There is already an ongoing call from this source']
+            if self.lines[call.destination].destination_call_id:
+                return ['There is already an ongoing call for this '
+                        'destination']
+
+        for phone, timeline in (('source', source),
+                                ('destination', destination)):
+            less_than = timeline.type_less_than(timestamp)
+            greater_than = timeline.type_greater_than(timestamp)
+            if less_than == Record.START and greater_than == Record.END:
+                return [f'There is already a call record for this {phone} '
+                        f'in this interval.']
+            elif less_than == Record.END and type == Record.END:
+                return [f'Cannot end this call overlapping another call '
+                        f'record with the same {phone}']
+
+        if type == Record.START:
+            self.calls[call_id] = call
+        self.records[(call_id, type)] = timestamp
+        source.add(timestamp, type)
+        destination.add(timestamp, type)
+        for role in ('source', 'destination'):
+            line = self.lines[getattr(call, role)]
+            setattr(line, f'{role}_call_id',
+                    call_id if type == Record.START else None)
+            setattr(line, f'{role}_timestamp', timestamp)
+            self.changed_lines.add(line.phone)
+
+    def is_replay(self, data):
+        """
+        Checks if the item repeats a record already stored or accepted in
+        this batch, with the same timestamp, source and destination
+        """
+        call_id, type = data['call_id'], data['type']
+        if self.records.get((call_id, type)) != data['timestamp']:
+            return False
+        if type == Record.START:
+            call = self.calls[call_id]
+            return ((call.source, call.destination) ==
+                    (data['source'], data['destination']))
+        return True
+
+    def insert(self, model, objs):
+        if self.use_copy:
+            copy_insert(model, objs)
+        else:
+            model.objects.bulk_create(objs)
+
+    def save(self):
+        """
+        Validates the batch and bulk inserts its valid calls, records and
+        bills. Returns a result for each item, in the same order.
+        """
+        self.parse()
+        phones = self.load_phones()
+        while True:
+            locked = phones['source'] | phones['destination']
+            try:
+                # Lines are checked and updated by one transaction at a time
+                with LineState.objects.lock(*locked):
+                    # Calls are read again under the lock, as posts locking
+                    # other lines may have created some since. When they
+                    # bring other lines, the batch locks them all again
+                    phones = self.load_phones()
+                    if phones['source'] | phones['destination'] <= locked:
+                        return self.save_items(phones)
+            except IntegrityError:
+                # Such a post created a call of the batch after it was read
+                # again, so the batch is checked again against it
+                created = Call.objects.filter(id__in=self.created_calls)
+                if not created.exists():
+                    raise
+                phones = self.load_phones()
+
+    def save_items(self, phones):
+        self.load(phones)
+        calls, records, bills, staged = [], [], [], []
+        for index, serializer, data in self.items:
+            if self.is_replay(data):
+                self.results[index] = {
+                    'index': index,
+                    'status': 200,
+                    'data': serializer.to_representation(data)
+                }
+                continue
+
+            if (self.stage_orphans and data['type'] == Record.END and
+                    data['call_id'] not in self.calls):
+                staged.append(StagedRecord(**data))
+                self.results[index] = {
+                    'index': index,
+                    'status': 202,
+                    'data': serializer.to_representation(data)
+                }
+                continue
+
+            errors = self.validate(data)
+            if errors:
+                self.reject(index, errors)
+                continue
+
+            call = self.calls[data['call_id']]
+            if data['type'] == Record.START:
+                calls.append(call)
+            else:
+                bills.append(Bill.objects.build(
+                    call,
+                    start=self.records[(call.id, Record.START)],
+                    end=data['timestamp']
+                ))
+            records.append(Record(call=call, type=data['type'],
+                                  timestamp=data['timestamp'],
+                                  source=call.source,
+                                  destination=call.destination))
+            self.results[index] = {
+                'index': index,
+                'status': 201,
+                'data': serializer.to_representation(data)
+            }
+
+        self.created_calls = [call.id for call in calls]
+        with transaction.atomic():
+            self.insert(Call, calls)
+            self.insert(Record, records)
+            self.insert(Bill, bills)
+            StagedRecord.objects.bulk_create(staged, ignore_conflicts=True)
+            MonthlyStatement.objects.add_bills(bills)
+            # Rows of locked lines are updated in place, as they hold the lock
+            changed = [self.lines[phone]
+                       for phone in sorted(self.changed_lines)]
+            LineState.objects.bulk_update(
+                [line for line in changed if line.phone in self.stored_lines],
+                ['source_call', 'source_timestamp', 'destination_call',
+                 'destination_timestamp']
+            )
+            LineState.objects.bulk_create(
+                [line for line in changed
+                 if line.phone not in self.stored_lines],
+                ignore_conflicts=True
+            )
+
+        return self.results
@@ -0,0 +1,336 @@
+import asyncio
+import json
+import math
+import platform
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import Client, override_settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.asgi import AsgiHandler, wsgi_environ
+from core.batch import RecordBatch
+from core.cache import bills_cache
+from core.models import Bill, Call
+from core.utils import month_range
+
+# Longest call generated, so a skewed distribution cannot overlap periods
+MAX_CALL_SECONDS = 6 * 60 * 60
+
+
+def last_closed_period():
+    """
+    Returns the (month, year) of the last closed reference period
+    """
+    first_day = timezone.localtime().date().replace(day=1)
+    previous = first_day - timedelta(days=1)
+    return previous.month, previous.year
+
+
+def generate_cdrs(subscribers=10, calls=20, mean_duration=180,
+                  night_ratio=0.3, period=None, first_subscriber=0,
+                  first_call_id=1, seed=0):
+    """
+    Yields synthetic start and end records, in timestamp order, for calls
+    made during a reference period.
+
+    Each subscriber makes `calls` non overlapping calls, whose durations
+    follow an exponential distribution with `mean_duration` seconds, and
+    `night_ratio` of which start within the reduced tariff time.
+    Destinations are never subscribers, so calls do not collide.
+    """
+    rng = random.Random(seed)
+    m, y = period or last_closed_period()
+    period_start, period_end = month_range(m, y)
+    days = (period_end - period_start).days
+    std_start, std_end = settings.STD_HOUR_START, settings.STD_HOUR_END
+    night_hours = [h for h in range(24) if not std_start <= h < std_end]
+
+    records = []
+    call_id = first_call_id
+    for subscriber in range(first_subscriber,
+                            first_subscriber + subscribers):
+        source = f'1198{subscriber:07d}'
+        starts = []
+        for _ in range(calls):
+            if night_hours and rng.random() < night_ratio:
+                hour = rng.choice(night_hours)
+            else:
+                hour = rng.randrange(std_start, std_end)
+            starts.append(period_start + timedelta(
+                days=rng.randrange(days),
+                hours=hour,
+                seconds=rng.randrange(3600)
+            ))
+
+        free = period_start
+        for start in sorted(starts):
+            duration = min(int(rng.expovariate(1 / mean_duration)) + 1,
+                           MAX_CALL_SECONDS)
+            start = max(start, free)
+            end = start + timedelta(seconds=duration)
+            if end >= period_end:
+                break
+            free = end + timedelta(minutes=1)
+            records.append({
+                'type': 'start',
+                'call_id': call_id,
+                'timestamp': start,
+                'source': source,
+                'destination': f'2199{call_id:07d}'
+            })
+            records.append({
+                'type': 'end',
+                'call_id': call_id,
+                'timestamp': end
+            })
+            call_id += 1
+
+    records.sort(key=lambda r: (r['timestamp'], r['type'] == 'start'))
+    for record in records:
+        record['timestamp'] = record['timestamp'].isoformat()
+        yield record
+
+
+def percentile(values, percent):
+    """
+    Returns the nearest-rank percentile of a list of values
+    """
+    ordered = sorted(values)
+    rank = math.ceil(percent / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
+def latency(samples):
+    return {
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+        'max_ms': round(max(samples) * 1000, 3)
+    }
+
+
+def throughput(count, seconds, unit):
+    return {
+        unit: count,
+        'seconds': round(seconds, 4),
+        f'{unit}_per_second': round(count / seconds, 1) if seconds else None
+    }
+
+
+@override_settings(RECORD_INGESTION_MODE='sync')
+def bench_record_create(records):
+    """
+    Posts records one at a time to /records and measures records/s
+    """
+    client = Client()
+    started = time.perf_counter()
+    for record in records:
+        response = client.post('/records', json.dumps(record),
+                               content_type='application/json')
+        if response.status_code != 201:
+            raise RuntimeError(f'Record rejected: {response.content!r}')
+    return throughput(len(records), time.perf_counter() - started, 'records')
+
+
+def bench_pricing(records, repeat=1):
+    """
+    Prices in memory the bills of the calls in records and measures bills/s
+    """
+    starts = {r['call_id']: r for r in records if r['type'] == 'start'}
+    bills = [
+        Bill(
+            call=Call(id=r['call_id'], source=starts[r['call_id']]['source']),
+            start=parse_datetime(starts[r['call_id']]['timestamp']),
+            end=parse_datetime(r['timestamp'])
+        )
+        for r in records if r['type'] == 'end' and r['call_id'] in starts
+    ]
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for bill in bills:
+            bill.calculate_price()
+    return throughput(len(bills) * repeat, time.perf_counter() - started,
+                      'bills')
+
+
+def bench_bill_list(history_sizes=(10, 100, 1000), requests=50, period=None,
+                    first_call_id=1, **generator_options):
+    """
+    Measures the p50/p99 latency of /bills/<subscriber> for subscribers
+    with history_size calls in the reference period, with the response
+    cache cleared before each request (cold) and kept (warm)
+    """
+    m, y = period or last_closed_period()
+    client = Client()
+    results = []
+    for index, history_size in enumerate(history_sizes):
+        # Subscribers apart from the ones of generate_cdrs defaults
+        records = list(generate_cdrs(
+            subscribers=1, calls=history_size, period=(m, y),
+            first_subscriber=9 * 10 ** 6 + index, first_call_id=first_call_id,
+            **generator_options
+        ))
+        first_call_id += history_size
+        source = records[0]['source']
+        RecordBatch(records).save()
+
+        url = f'/bills/{source}?reference={m:02d}/{y}'
+        samples = {'cold': [], 'warm': []}
+        for mode in ('cold', 'warm'):
+            for _ in range(requests):
+                if mode == 'cold':
+                    bills_cache().clear()
+                started = time.perf_counter()
+                response = client.get(url)
+                samples[mode].append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise RuntimeError(f'Bill list failed: '
+                                       f'{response.content!r}')
+        results.append({
+            'history_size': history_size,
+            'bills': Bill.objects.filter(source=source).count(),
+            'requests': requests,
+            'cold': latency(samples['cold']),
+            'warm': latency(samples['warm'])
+        })
+    return results
+
+
+def bench_concurrency(url, clients=200, workers=4, delay=0.05):
+    """
+    Compares the throughput and latency of requests to url from clients
+    connecting at once and taking delay seconds to send their request,
+    served by workers threads: as WSGI, a thread serves a client from its
+    first byte to its response, and as ASGI, requests are received on the
+    event loop and only the views run on the threads. The response is
+    cached first, so views only read the generation of its statement.
+    """
+    response = Client().get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f'Request failed: {response.content!r}')
+    path, _, query = url.partition('?')
+    scope = {
+        'type': 'http',
+        'method': 'GET',
+        'path': path,
+        'query_string': query.encode(),
+        'headers': [(b'host', b'testserver')],
+        'server': ('testserver', 80)
+    }
+    application = get_wsgi_application()
+
+    def wsgi_request(started):
+        # The thread waits for the slow client to send its request
+        time.sleep(delay)
+        statuses = []
+        chunks = application(
+            wsgi_environ(scope, b''),
+            lambda status, headers, exc_info=None: statuses.append(status)
+        )
+        b''.join(chunks)
+        chunks.close()
+        return time.perf_counter() - started, int(statuses[0][:3])
+
+    async def asgi_request(handler, started):
+        async def receive():
+            await asyncio.sleep(delay)
+            return {'type': 'http.request', 'body': b''}
+
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await handler(scope, receive, send)
+        return time.perf_counter() - started, messages[0]['status']
+
+    async def asgi_clients(handler):
+        started = time.perf_counter()
+        return await asyncio.gather(*(
+            asgi_request(handler, started) for _ in range(clients)
+        ))
+
+    def summary(results, seconds):
+        if any(status != 200 for _, status in results):
+            raise RuntimeError('Concurrent requests failed')
+        return {
+            **throughput(len(results), seconds, 'requests'),
+            **latency([elapsed for elapsed, _ in results])
+        }
+
+    with ThreadPoolExecutor(workers) as executor:
+        started = time.perf_counter()
+        results = list(executor.map(wsgi_request, [started] * clients))
+        wsgi = summary(results, time.perf_counter() - started)
+
+    handler = AsgiHandler(application, threads=workers)
+    try:
+        started = time.perf_counter()
+        results = asyncio.run(asgi_clients(handler))
+        asgi = summary(results, time.perf_counter() - started)
+    finally:
+        handler.executor.shutdown()
+
+    return {
+        'clients': clients,
+        'workers': workers,
+        'client_delay_ms': round(delay * 1000, 3),
+        'wsgi': wsgi,
+        'asgi': asgi
+    }
+
+
+def run(subscribers=10, calls=20, mean_duration=180, night_ratio=0.3,
+        history_sizes=(10, 100, 1000), requests=50, pricing_repeat=10,
+        clients=200, workers=4, client_delay=0.05, seed=0):
+    """
+    Runs every benchmark against the current database and returns the
+    results as a JSON serializable dict
+    """
+    generator_options = {
+        'mean_duration': mean_duration,
+        'night_ratio': night_ratio,
+        'seed': seed
+    }
+    records = list(generate_cdrs(subscribers=subscribers, calls=calls,
+                                 **generator_options))
+    return {
+        'meta': {
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'parameters': {
+                'subscribers': subscribers,
+                'calls': calls,
+                'history_sizes': list(history_sizes),
+                'requests': requests,
+                'pricing_repeat': pricing_repeat,
+                'clients': clients,
+                'workers': workers,
+                'client_delay': client_delay,
+                **generator_options
+            }
+        },
+        'record_create': bench_record_create(records),
+        'pricing': bench_pricing(records, repeat=pricing_repeat),
+        'bill_list': bench_bill_list(
+            history_sizes=history_sizes,
+            requests=requests,
+            first_call_id=len(records) + 1,
+            **generator_options
+        ),
+        'concurrency': bench_concurrency(
+            f'/bills/{records[0]["source"]}',
+            clients=clients,
+            workers=workers,
+            delay=client_delay
+        )
+    }
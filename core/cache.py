@@ -0,0 +1,92 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.renderers import JSONRenderer
+
+
+def bills_cache():
+    """
+    Returns the cache backend holding closed period bill responses
+    """
+    return caches[settings.BILLS_CACHE]
+
+
+def bills_key(subscriber, m, y, generation, page=''):
+    return f'bills:{subscriber}:{y}:{m:02d}:{generation}:{page}'
+
+
+def generation_key(subscriber, m, y):
+    return f'bills-generation:{subscriber}:{y}:{m:02d}'
+
+
+def generation(statement):
+    """
+    Returns the generation of the bills of a period, replaced on their
+    statement whenever they change
+    """
+    return statement.generation.hex if statement.pk else ''
+
+
+def get_generation(subscriber, m, y):
+    """
+    Returns the cached generation of the bills of a period, or None when it
+    has to be read from their statement
+    """
+    return bills_cache().get(generation_key(subscriber, m, y))
+
+
+def add_generation(subscriber, m, y, generation):
+    """
+    Caches the generation read from the statement of a period, unless a
+    newer one was cached since
+    """
+    bills_cache().add(generation_key(subscriber, m, y), generation,
+                      settings.BILLS_GENERATION_TIMEOUT)
+
+
+def set_generations(statements):
+    """
+    Caches the generations of changed statements, so the pages cached under
+    the previous ones are no longer served
+    """
+    bills_cache().set_many(
+        {generation_key(s.source, s.month, s.year): generation(s)
+         for s in statements},
+        settings.BILLS_GENERATION_TIMEOUT
+    )
+
+
+def delete_generations(periods):
+    """
+    Drops the cached generations of (subscriber, month, year) periods
+    """
+    bills_cache().delete_many([generation_key(*period)
+                               for period in periods])
+
+
+def get_bills(subscriber, m, y, generation, page=''):
+    """
+    Returns the cached entry of a closed period bill response page, if any.
+    An entry is a dict with the response data, the cursor of the next page,
+    its ETag and its last modification time.
+    """
+    return bills_cache().get(bills_key(subscriber, m, y, generation, page))
+
+
+def set_bills(subscriber, m, y, generation, data, cursor=None, page=''):
+    """
+    Caches a closed period bill response page and returns its entry. The
+    URL of the next page depends on the request, so only its cursor is kept.
+    """
+    content = JSONRenderer().render({'data': data, 'cursor': cursor})
+    entry = {
+        'data': data,
+        'cursor': cursor,
+        'etag': f'"{hashlib.sha1(content).hexdigest()}"',
+        'last_modified': int(time.time())
+    }
+    bills_cache().set(bills_key(subscriber, m, y, generation, page), entry,
+                      settings.BILLS_CACHE_TIMEOUT)
+    return entry
@@ -0,0 +1,61 @@
+import csv
+import json
+
+from core.models import Bill
+
+FORMATS = ('csv', 'ndjson')
+
+FIELDS = ('call_id', 'source', 'destination', 'start', 'end', 'duration',
+          'price')
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+
+class Echo:
+    """
+    File-like object returning what is written to it, so csv.writer
+    produces lines instead of filling a buffer
+    """
+
+    def write(self, value):
+        return value
+
+
+def bill_rows(m, y, chunk_size=2000):
+    """
+    Yields a dict for each bill of a reference period, across all
+    subscribers. Rows are read with a server-side cursor where supported,
+    without building model instances.
+    """
+    queryset = Bill.objects.period(m, y).values_list(
+        'call_id', 'source', 'call__destination', 'start', 'end', 'price'
+    )
+    for call_id, source, destination, start, end, price in queryset.iterator(
+            chunk_size=chunk_size):
+        yield {
+            'call_id': call_id,
+            'source': source,
+            'destination': destination,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'duration': int((end - start).total_seconds()),
+            'price': str(price)
+        }
+
+
+def export_bills(m, y, format='csv', chunk_size=2000):
+    """
+    Yields the bills of a reference period as CSV or NDJSON lines
+    """
+    rows = bill_rows(m, y, chunk_size=chunk_size)
+    if format == 'ndjson':
+        for row in rows:
+            yield json.dumps(row) + '\n'
+    else:
+        writer = csv.writer(Echo())
+        yield writer.writerow(FIELDS)
+        for row in rows:
+            yield writer.writerow([row[field] for field in FIELDS])
@@ -0,0 +1,81 @@
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.db import connections
+
+_current = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """
+    Collects the number of SQL queries, the time spent running them and the
+    time spent in the functions decorated with timed, during a request
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.timings = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        # Database execute wrapper, see connection.execute_wrapper
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+    def add(self, name, seconds):
+        calls, total = self.timings.get(name, (0, 0.0))
+        self.timings[name] = (calls + 1, total + seconds)
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 3),
+            'timings': {
+                name: {'calls': calls, 'ms': round(total * 1000, 3)}
+                for name, (calls, total) in self.timings.items()
+            }
+        }
+
+
+@contextmanager
+def collect():
+    """
+    Collects the stats of the code run within the block, on every database
+    connection
+    """
+    stats = RequestStats()
+    token = _current.set(stats)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            yield stats
+    finally:
+        _current.reset(token)
+
+
+def timed(func):
+    """
+    Adds the time spent in func to the stats being collected, if any. Costs
+    a context variable lookup otherwise.
+    """
+    name = func.__qualname__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        stats = _current.get()
+        if stats is None:
+            return func(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats.add(name, time.perf_counter() - started)
+
+    return wrapper
@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.archive import archive
+
+
+class Command(BaseCommand):
+    help = ('Moves the records of old billed calls to the archive, in '
+            'rate-limited chunks')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horizon-days',
+            type=int,
+            default=settings.RECORD_ARCHIVE_HORIZON_DAYS,
+            help='Archive the calls ended more than this number of days ago'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Number of calls archived per transaction'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.1,
+            help='Seconds to wait between chunks'
+        )
+        parser.add_argument(
+            '--max-chunks',
+            type=int,
+            help='Stop after this number of chunks'
+        )
+
+    def handle(self, *args, **options):
+        archived = archive(
+            horizon_days=options['horizon_days'],
+            chunk_size=options['chunk_size'],
+            pause=options['pause'],
+            max_chunks=options['max_chunks']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{archived} calls archived.'
+        ))
@@ -0,0 +1,130 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings, setup_test_environment, teardown_test_environment
+)
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks record ingestion, pricing, bill listing and slow '
+            'client concurrency with synthetic call records, on a '
+            'throwaway test database')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--subscribers',
+            type=int,
+            default=10,
+            help='Number of subscribers posting records'
+        )
+        parser.add_argument(
+            '--calls',
+            type=int,
+            default=20,
+            help='Number of calls per subscriber'
+        )
+        parser.add_argument(
+            '--mean-duration',
+            type=int,
+            default=180,
+            help='Mean call duration in seconds, exponentially distributed'
+        )
+        parser.add_argument(
+            '--night-ratio',
+            type=float,
+            default=0.3,
+            help='Share of calls starting within the reduced tariff time'
+        )
+        parser.add_argument(
+            '--history-sizes',
+            default='10,100,1000',
+            help='Comma separated bill counts of the subscribers whose '
+                 '/bills latency is measured'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Number of /bills requests per history size and mode'
+        )
+        parser.add_argument(
+            '--pricing-repeat',
+            type=int,
+            default=10,
+            help='Number of times each bill is priced'
+        )
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=200,
+            help='Number of slow clients requesting /bills at once, served '
+                 'as WSGI and as ASGI'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of threads serving the slow clients'
+        )
+        parser.add_argument(
+            '--client-delay',
+            type=float,
+            default=0.05,
+            help='Seconds each slow client takes to send its request'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Seed of the synthetic records generator'
+        )
+        parser.add_argument(
+            '--output',
+            help='The JSON file to write to. Defaults to the standard output'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            history_sizes = [
+                int(size) for size in options['history_sizes'].split(',')
+            ]
+        except ValueError:
+            raise CommandError('Invalid history sizes. Expected a comma '
+                               'separated list of integers.')
+        if not 0 <= options['night_ratio'] <= 1:
+            raise CommandError('Night ratio must be between 0 and 1.')
+        if options['clients'] < 1 or options['workers'] < 1:
+            raise CommandError('Clients and workers must be positive.')
+
+        setup_test_environment(debug=False)
+        old_name = connection.creation.create_test_db(verbosity=0,
+                                                      autoclobber=True)
+        try:
+            with override_settings(DEBUG=False):
+                results = benchmark.run(
+                    subscribers=options['subscribers'],
+                    calls=options['calls'],
+                    mean_duration=options['mean_duration'],
+                    night_ratio=options['night_ratio'],
+                    history_sizes=history_sizes,
+                    requests=options['requests'],
+                    pricing_repeat=options['pricing_repeat'],
+                    clients=options['clients'],
+                    workers=options['workers'],
+                    client_delay=options['client_delay'],
+                    seed=options['seed']
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
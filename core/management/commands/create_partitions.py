@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import partitions
+
+
+class Command(BaseCommand):
+    help = ('Creates the monthly partitions of records and bills for the '
+            'current and next months, when partitioned storage is enabled')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=3,
+            help='Number of months after the current one to create'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='Seconds to wait before creating the partitions again. '
+                 'Without it, they are created once'
+        )
+
+    def handle(self, *args, **options):
+        if not partitions.is_enabled():
+            self.stdout.write('Partitioned storage is not enabled.')
+            return
+
+        while True:
+            created = partitions.create_partitions(
+                months_ahead=options['months_ahead']
+            )
+            for name in created:
+                self.stdout.write(f'Created {name}')
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(created)} partitions created.'
+        ))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.export import FORMATS, export_bills
+from core.utils import parse_reference
+
+
+class Command(BaseCommand):
+    help = 'Exports the bills of a reference period for all subscribers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--period',
+            required=True,
+            help='The reference period to export (MM/YYYY)'
+        )
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            default='csv',
+            help='The output format'
+        )
+        parser.add_argument(
+            '--output',
+            help='The file to write to. Defaults to the standard output'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Number of bills read from the database at a time'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            month, year = parse_reference(options['period'])
+        except ValueError:
+            raise CommandError('Invalid period. Expected MM/YYYY.')
+
+        lines = export_bills(month, year, format=options['format'],
+                             chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', newline='') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,147 @@
+import csv
+import json
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from core import staging
+from core.batch import RecordBatch
+
+FORMATS = ('jsonl', 'csv')
+
+
+def read_jsonl(file):
+    for line in file:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield line
+
+
+def read_csv(file):
+    for row in csv.DictReader(file):
+        yield {key: value for key, value in row.items() if value}
+
+
+def sort_key(item):
+    """
+    Sorts records by timestamp, leaving records without a valid timestamp
+    at the end, where they are rejected
+    """
+    line, record = item
+    timestamp = None
+    if isinstance(record, dict) and isinstance(record.get('timestamp'), str):
+        timestamp = parse_datetime(record['timestamp'])
+    if timestamp is None:
+        return (1, 0, line)
+    return (0, timestamp.timestamp(), line)
+
+
+class Command(BaseCommand):
+    help = ('Imports call detail records from a JSONL or CSV file, '
+            'validating and loading them in bulk')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The JSONL or CSV file to import')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='The file format. Defaults to the file extension'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Number of records validated and loaded at a time'
+        )
+        parser.add_argument(
+            '--rejects',
+            help='A JSONL file where rejected records and their errors are '
+                 'written'
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Load with INSERT instead of COPY on PostgreSQL'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if format not in FORMATS:
+            raise CommandError(f'Unknown file format. Use --format with one '
+                               f'of: {", ".join(FORMATS)}.')
+
+        try:
+            file = open(path, newline='')
+        except OSError as exc:
+            raise CommandError(f'Cannot open {path}: {exc.strerror}')
+
+        rejects = open(options['rejects'], 'w') if options['rejects'] else None
+        reader = read_jsonl(file) if format == 'jsonl' else read_csv(file)
+        records = enumerate(reader, start=1)
+        totals = {'read': 0, 'created': 0, 'replayed': 0, 'staged': 0,
+                  'rejected': 0}
+        started = time.monotonic()
+        try:
+            while True:
+                chunk = list(islice(records, options['chunk_size']))
+                if not chunk:
+                    break
+                self.import_chunk(chunk, totals, rejects,
+                                  use_copy=not options['no_copy'])
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'{totals["read"]} records read, {totals["created"]} '
+                    f'created, {totals["replayed"]} replayed, '
+                    f'{totals["staged"]} staged, '
+                    f'{totals["rejected"]} rejected '
+                    f'({totals["read"] / elapsed:.0f} records/s)'
+                )
+        finally:
+            file.close()
+            if rejects:
+                rejects.close()
+
+        reconciled = 0
+        while True:
+            count = staging.reconcile()
+            if not count:
+                break
+            reconciled += count
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {totals["created"]} of {totals["read"]} records in '
+            f'{time.monotonic() - started:.1f}s. {totals["rejected"]} '
+            f'rejected, {reconciled} staged records reconciled.'
+        ))
+
+    def import_chunk(self, chunk, totals, rejects, use_copy):
+        """
+        Validates and loads a chunk of (line, record) items, sorted by
+        timestamp so start records come before their end records
+        """
+        chunk.sort(key=sort_key)
+        batch = RecordBatch([record for _, record in chunk],
+                            use_copy=use_copy)
+        results = batch.save()
+
+        totals['read'] += len(chunk)
+        for (line, record), result in zip(chunk, results):
+            if result['status'] == 200:
+                totals['replayed'] += 1
+            elif result['status'] == 201:
+                totals['created'] += 1
+            elif result['status'] == 202:
+                totals['staged'] += 1
+            else:
+                totals['rejected'] += 1
+                if rejects:
+                    rejects.write(json.dumps({
+                        'line': line,
+                        'record': record,
+                        'errors': result['errors']
+                    }) + '\n')
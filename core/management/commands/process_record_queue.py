@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import record_queue
+
+
+class Command(BaseCommand):
+    help = ('Processes the records queued by the asynchronous ingestion '
+            'mode')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of queued records processed at a time'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1,
+            help='Seconds to wait when the queue is empty'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the queued records and exit'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        while True:
+            count = record_queue.process(batch_size=batch_size)
+            if count:
+                self.stdout.write(f'Processed {count} queued records')
+            if count < batch_size:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import MonthlyStatement
+from core.utils import parse_reference
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the monthly statements from the stored bills'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--period',
+            help='Only rebuild the given reference period (MM/YYYY)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Number of bills read from the database at a time'
+        )
+
+    def handle(self, *args, **options):
+        month = year = None
+        if options['period']:
+            try:
+                month, year = parse_reference(options['period'])
+            except ValueError:
+                raise CommandError('Invalid period. Expected MM/YYYY.')
+
+        count = MonthlyStatement.objects.rebuild(
+            m=month,
+            y=year,
+            chunk_size=options['chunk_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt monthly statements from {count} bills'
+        ))
@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import staging
+
+
+class Command(BaseCommand):
+    help = ('Reconciles staged end records with the start records of their '
+            'calls')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of staged records reconciled at a time'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds to wait when there is nothing left to reconcile'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Reconcile the pending records and exit'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        while True:
+            count = staging.reconcile(batch_size=batch_size)
+            expired = staging.expire(ttl=settings.STAGED_RECORD_TTL)
+            if count or expired:
+                self.stdout.write(f'Reconciled {count} staged records, '
+                                  f'expired {expired}')
+            if count < batch_size:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
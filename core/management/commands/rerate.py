@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.rerating import rerate
+from core.utils import parse_reference
+
+
+class Command(BaseCommand):
+    help = ('Prices again the bills of a reference period with the current '
+            'tariffs')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--period',
+            required=True,
+            help='The reference period to rerate (MM/YYYY)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Number of bills priced and updated at a time'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            month, year = parse_reference(options['period'])
+        except ValueError:
+            raise CommandError('Invalid period. Expected MM/YYYY.')
+
+        started = time.monotonic()
+        read, changed = rerate(month, year, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rerated {read} bills of {month:02d}/{year} in '
+            f'{time.monotonic() - started:.1f}s, {changed} prices changed.'
+        ))
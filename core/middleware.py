@@ -0,0 +1,59 @@
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core.instrumentation import collect
+
+logger = logging.getLogger(__name__)
+
+
+class RequestStatsMiddleware:
+    """
+    Reports, for a sample of the requests, the number of SQL queries, the
+    database time and the time spent validating records and pricing bills,
+    as a structured log line and, optionally, a Server-Timing header
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_STATS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.REQUEST_STATS_SAMPLE_RATE:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with collect() as stats:
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        data = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 3),
+            **stats.as_dict()
+        }
+        logger.info(json.dumps(data))
+        if settings.REQUEST_STATS_HEADER:
+            response['Server-Timing'] = server_timing(data)
+        return response
+
+
+def server_timing(data):
+    """
+    Formats request stats as a Server-Timing header value
+    """
+    metrics = [
+        f'total;dur={data["total_ms"]}',
+        f'db;dur={data["db_ms"]};desc="{data["queries"]} queries"'
+    ]
+    for name, timing in data['timings'].items():
+        metrics.append(f'{name};dur={timing["ms"]};'
+                       f'desc="{timing["calls"]} calls"')
+    return ', '.join(metrics)
@@ -0,0 +1,43 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_call_phones(apps, schema_editor):
+    Call = apps.get_model('core', 'Call')
+    Record = apps.get_model('core', 'Record')
+    calls = Call.objects.filter(id=OuterRef('call_id'))
+    Record.objects.update(
+        source=Subquery(calls.values('source')[:1]),
+        destination=Subquery(calls.values('destination')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_auto_20181003_0518'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='record',
+            name='destination',
+            field=models.CharField(default='', editable=False, max_length=11),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='record',
+            name='source',
+            field=models.CharField(default='', editable=False, max_length=11),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_call_phones, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['source', 'timestamp'], name='core_record_source_68dc67_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['destination', 'timestamp'], name='core_record_destina_a21463_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 2.1.1 on 2026-10-18 13:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Max
+
+
+def backfill_line_states(apps, schema_editor):
+    Record = apps.get_model('core', 'Record')
+    LineState = apps.get_model('core', 'LineState')
+
+    states = {}
+    for role in ('source', 'destination'):
+        last_ids = Record.objects.values(role).annotate(
+            last_id=Max('id')
+        ).values_list('last_id', flat=True)
+        for record in Record.objects.filter(id__in=list(last_ids)):
+            phone = getattr(record, role)
+            state = states.setdefault(phone, LineState(phone=phone))
+            if record.type == 'start':
+                setattr(state, f'{role}_call_id', record.call_id)
+            setattr(state, f'{role}_timestamp', record.timestamp)
+    LineState.objects.bulk_create(states.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_record_source_destination'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LineState',
+            fields=[
+                ('phone', models.CharField(max_length=11, primary_key=True, serialize=False)),
+                ('source_timestamp', models.DateTimeField(null=True)),
+                ('destination_timestamp', models.DateTimeField(null=True)),
+                ('destination_call', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.Call')),
+                ('source_call', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.Call')),
+            ],
+            options={
+                'verbose_name': 'line state',
+                'verbose_name_plural': 'line states',
+            },
+        ),
+        migrations.RunPython(backfill_line_states, migrations.RunPython.noop),
+    ]
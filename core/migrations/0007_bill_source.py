@@ -0,0 +1,30 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_call_source(apps, schema_editor):
+    Call = apps.get_model('core', 'Call')
+    Bill = apps.get_model('core', 'Bill')
+    calls = Call.objects.filter(id=OuterRef('call_id'))
+    Bill.objects.update(source=Subquery(calls.values('source')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_line_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bill',
+            name='source',
+            field=models.CharField(default='', editable=False, max_length=11),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_call_source, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['source', 'end'], name='core_bill_source_e308ea_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.28 on 2026-10-18 13:21
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_bill_source'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyStatement',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=11)),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('call_count', models.PositiveIntegerField(default=0)),
+                ('total_duration', models.PositiveIntegerField(default=0)),
+                ('total_price', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=12)),
+            ],
+            options={
+                'verbose_name': 'monthly statement',
+                'verbose_name_plural': 'monthly statements',
+                'unique_together': {('source', 'year', 'month')},
+            },
+        ),
+    ]
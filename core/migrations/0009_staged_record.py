@@ -0,0 +1,33 @@
+# Generated by Django 2.2.28 on 2026-10-18 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_monthly_statement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StagedRecord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('call_id', models.PositiveIntegerField(unique=True)),
+                ('type', models.CharField(choices=[('start', 'Start'), ('end', 'End')], default='end', max_length=5)),
+                ('timestamp', models.DateTimeField()),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('failed', 'Failed')], default='pending', max_length=7)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'staged record',
+                'verbose_name_plural': 'staged records',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='stagedrecord',
+            index=models.Index(fields=['status', 'received_at'], name='core_staged_status_03a1a8_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.28 on 2026-10-18 13:27
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_staged_record'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedRecord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tracking_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('payload', models.TextField()),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('created', 'Created'), ('staged', 'Staged'), ('rejected', 'Rejected')], default='queued', max_length=8)),
+                ('result', models.TextField(blank=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(null=True)),
+            ],
+            options={
+                'verbose_name': 'queued record',
+                'verbose_name_plural': 'queued records',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='queuedrecord',
+            index=models.Index(fields=['status', 'id'], name='core_queued_status_ac61f0_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.28 on 2026-10-18 13:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_queued_record'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tariff',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('effective_from', models.DateTimeField(unique=True)),
+                ('std_hour_start', models.PositiveSmallIntegerField()),
+                ('std_hour_end', models.PositiveSmallIntegerField()),
+                ('std_standing_charge', models.DecimalField(decimal_places=4, max_digits=8)),
+                ('std_minute_charge', models.DecimalField(decimal_places=4, max_digits=8)),
+                ('rdc_standing_charge', models.DecimalField(decimal_places=4, max_digits=8)),
+                ('rdc_minute_charge', models.DecimalField(decimal_places=4, max_digits=8)),
+            ],
+            options={
+                'verbose_name': 'tariff',
+                'verbose_name_plural': 'tariffs',
+                'ordering': ('effective_from',),
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 13:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_tariff'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['source', 'start', 'call'], name='core_bill_source_3cb99b_idx'),
+        ),
+    ]
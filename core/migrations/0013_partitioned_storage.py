@@ -0,0 +1,186 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.migrations.exceptions import IrreversibleError
+from django.utils import timezone
+
+# Frozen copy of core.partitions at this migration, so later changes to the
+# module do not change what it does
+
+PARTITIONED_TABLES = {
+    'core_record': 'timestamp',
+    'core_bill': 'end',
+}
+
+UNIQUE_COLUMNS = {
+    'core_record': [('call_id', 'type')],
+    'core_bill': [('call_id',)],
+}
+
+MONTHS_AHEAD = 3
+
+
+def month_range(month, year):
+    start = timezone.datetime(year, month, 1)
+    if month == 12:
+        end = start.replace(year=year + 1, month=1)
+    else:
+        end = start.replace(month=month + 1)
+    return timezone.make_aware(start), timezone.make_aware(end)
+
+
+def next_month(m, y):
+    return (1, y + 1) if m == 12 else (m + 1, y)
+
+
+def months(first, last):
+    m, y = first
+    while (y, m) <= (last[1], last[0]):
+        yield m, y
+        m, y = next_month(m, y)
+
+
+def partition_name(table, m, y):
+    return f'{table}_p{y}_{m:02d}'
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        'SELECT 1 FROM pg_partitioned_table p JOIN pg_class c '
+        'ON c.oid = p.partrelid WHERE c.relname = %s',
+        [table]
+    )
+    return cursor.fetchone() is not None
+
+
+def create_unique_indexes(cursor, table, partition):
+    qn = cursor.db.ops.quote_name
+    for columns in UNIQUE_COLUMNS[table]:
+        name = f'{partition}_{"_".join(columns)}_uniq'
+        cursor.execute(
+            f'CREATE UNIQUE INDEX IF NOT EXISTS {qn(name)} ON '
+            f'{qn(partition)} ({", ".join(qn(c) for c in columns)})'
+        )
+
+
+def create_partition(cursor, table, column, m, y):
+    qn = cursor.db.ops.quote_name
+    name = partition_name(table, m, y)
+    cursor.execute('SELECT to_regclass(%s)', [name])
+    if cursor.fetchone()[0] is not None:
+        return
+
+    start, end = month_range(m, y)
+    default = f'{table}_default'
+    cursor.execute(f'CREATE TABLE {qn(name)} (LIKE {qn(table)} '
+                   f'INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM {qn(default)} WHERE {qn(column)} >= %s '
+        f'AND {qn(column)} < %s RETURNING *) '
+        f'INSERT INTO {qn(name)} SELECT * FROM moved',
+        [start, end]
+    )
+    create_unique_indexes(cursor, table, name)
+    cursor.execute(f'ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} '
+                   f'FOR VALUES FROM (%s) TO (%s)', [start, end])
+
+
+def partition_table(cursor, table, column):
+    qn = cursor.db.ops.quote_name
+    new = f'{table}__partitioned'
+
+    cursor.execute(
+        'SELECT indexname, indexdef FROM pg_indexes '
+        'WHERE tablename = %s AND indexname <> %s',
+        [table, f'{table}_pkey']
+    )
+    indexes = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [table]
+    )
+    foreign_keys = cursor.fetchall()
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+    sequence, = cursor.fetchone()
+    cursor.execute(f'SELECT min({qn(column)}), max({qn(column)}) '
+                   f'FROM {qn(table)}')
+    first, last = cursor.fetchone()
+
+    cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY NONE')
+    cursor.execute(
+        f'CREATE TABLE {qn(new)} (LIKE {qn(table)} INCLUDING DEFAULTS '
+        f'INCLUDING CONSTRAINTS) PARTITION BY RANGE ({qn(column)})'
+    )
+    cursor.execute(f'CREATE TABLE {qn(table + "_default")} '
+                   f'PARTITION OF {qn(new)} DEFAULT')
+    partitions = [f'{table}_default']
+    if first is not None:
+        first = timezone.localtime(first)
+        last = timezone.localtime(last)
+        for m, y in months((first.month, first.year),
+                           (last.month, last.year)):
+            start, end = month_range(m, y)
+            cursor.execute(
+                f'CREATE TABLE {qn(partition_name(table, m, y))} '
+                f'PARTITION OF {qn(new)} FOR VALUES FROM (%s) TO (%s)',
+                [start, end]
+            )
+            partitions.append(partition_name(table, m, y))
+    cursor.execute(f'INSERT INTO {qn(new)} SELECT * FROM {qn(table)}')
+    cursor.execute(f'DROP TABLE {qn(table)}')
+    cursor.execute(f'ALTER TABLE {qn(new)} RENAME TO {qn(table)}')
+    cursor.execute(f'ALTER TABLE {qn(table)} ADD CONSTRAINT '
+                   f'{qn(table + "_pkey")} PRIMARY KEY (id, {qn(column)})')
+
+    for name, definition in indexes:
+        if not definition.startswith('CREATE UNIQUE INDEX'):
+            cursor.execute(definition)
+    for partition in partitions:
+        create_unique_indexes(cursor, table, partition)
+    for name, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} '
+                       f'{definition}')
+    cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {qn(table)}.id')
+
+
+def partition_tables(apps, schema_editor):
+    connection = schema_editor.connection
+    if not (settings.PARTITIONED_STORAGE and
+            connection.vendor == 'postgresql'):
+        return
+    today = timezone.localdate()
+    first = (today.month, today.year)
+    last = first
+    for _ in range(MONTHS_AHEAD):
+        last = next_month(*last)
+
+    with connection.cursor() as cursor:
+        for table, column in PARTITIONED_TABLES.items():
+            if not is_partitioned(cursor, table):
+                partition_table(cursor, table, column)
+            for m, y in months(first, last):
+                create_partition(cursor, table, column, m, y)
+
+
+def check_unpartitioned(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for table in PARTITIONED_TABLES:
+            if is_partitioned(cursor, table):
+                raise IrreversibleError(
+                    f'{table} is partitioned and cannot be converted back '
+                    f'automatically'
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_bill_keyset_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables, check_unpartitioned),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_partitioned_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRecord',
+            fields=[
+                ('call_id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('source', models.CharField(max_length=11)),
+                ('destination', models.CharField(max_length=11)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'archived record',
+                'verbose_name_plural': 'archived records',
+            },
+        ),
+    ]
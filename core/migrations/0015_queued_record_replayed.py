@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 13:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_archived_record'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='queuedrecord',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('created', 'Created'), ('staged', 'Staged'), ('rejected', 'Rejected'), ('replayed', 'Replayed')], default='queued', max_length=8),
+        ),
+    ]
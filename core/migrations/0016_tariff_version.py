@@ -0,0 +1,24 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_queued_record_replayed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TariffVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'tariff version',
+                'verbose_name_plural': 'tariff versions',
+            },
+        ),
+    ]
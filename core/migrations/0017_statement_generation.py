@@ -0,0 +1,19 @@
+# Generated by Django 2.2.28 on 2026-10-18 14:20
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_tariff_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monthlystatement',
+            name='generation',
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+    ]
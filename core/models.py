@@ -1,13 +1,22 @@
-from datetime import timedelta, time
+import threading
+import uuid
+from contextlib import contextmanager, nullcontext
 from decimal import Decimal
 
 from django.conf import settings
 from django.core.validators import RegexValidator
-from django.db import models
-from django.db.models.signals import post_save
+from django.db import connection, models, transaction
+from django.db.models import Case, F, Subquery, Value, When
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.functional import cached_property
 from rest_framework.exceptions import ValidationError
 
+from core import cache, pricing, tariffs
+from core.instrumentation import timed
+from core.utils import format_duration, month_range
+
 
 class Call(models.Model):
     """
@@ -38,19 +47,15 @@ class Call(models.Model):
         if self.source == self.destination:
             raise ValidationError('Source and Destination cannot be equal')
 
-    def save(self, *args, **kwargs):
-        self.clean_fields()
+    def save(self, *args, clean=True, **kwargs):
+        # Fields already checked by core.validation are not cleaned again
+        if clean:
+            self.clean_fields()
         self.validate_source_destination()
         super(Call, self).save(*args, **kwargs)
 
 
 class RecordManager(models.Manager):
-    def start_call_exists(self, call):
-        """
-        Checks if a start call record exists
-        """
-        return self.filter(call=call, type=Record.START).exists()
-
     def timestamp(self, type, call_id):
         """
         Returns a timestamp of a call record associated with call_id and type
@@ -59,51 +64,88 @@ class RecordManager(models.Manager):
         timestamp = self.get(call__id=call_id, type=type).timestamp
         return timestamp
 
-    def last_source_record_type(self, call):
-        """
-        Returns the last record type for a source
-        """
-        return self.filter(
-            call__source=call.source
-        ).values_list('type', flat=True).last()
 
-    def last_destination_record_type(self, call):
-        """
-        Returns the last record type for a destination
-        """
-        return self.filter(
-            call__destination=call.destination
-        ).values_list('type', flat=True).last()
+class RecordContext:
+    """
+    Lookups shared by the validations of a :model:`core.Record` and the bill
+    of its call, loaded once per record instead of once per validation.
 
-    def type_less_than(self, call, timestamp, phone):
-        """
-        Returns the first type of a record less than a given timestamp
-        """
-        if phone == 'source':
-            return self.filter(
-                call__source=call.source,
-                timestamp__lt=timestamp
-            ).order_by('timestamp').values_list('type', flat=True).last()
-        else:
-            return self.filter(
-                call__destination=call.destination,
-                timestamp__lt=timestamp
-            ).order_by('timestamp').values_list('type', flat=True).last()
+    Holds the timestamps of the records already stored for the call, which
+    callers that read them already may pass as records, and for the source
+    and destination lines their ongoing call and the records around the
+    record timestamp. Both are read with a single query of the line states.
+    """
 
-    def type_greater_than(self, call, timestamp, phone):
+    def __init__(self, record, records=None):
+        self.record = record
+        if records is not None:
+            self.records = records
+
+    @cached_property
+    def records(self):
+        # Records of a call may be in any month, so with partitioned storage
+        # this probes the (call, type) index of every partition. Read under
+        # the lock of the lines, it also stands for the uniqueness of the
+        # call records across partitions
+        for line in self.lines.values():
+            return {type: getattr(line, f'call_{type}')
+                    for type in (Record.START, Record.END)
+                    if getattr(line, f'call_{type}') is not None}
+        return dict(Record.objects.filter(
+            call_id=self.record.call_id
+        ).values_list('type', 'timestamp'))
+
+    @cached_property
+    def lines(self):
         """
-        Returns the first type of a record greater than a given timestamp
+        Reads the line states of the source and destination, annotated with
+        the types of the records right before and at or after the record
+        timestamp for each role, and with the timestamps of the records of
+        the call. Every phone with records has a line state, so a phone
+        without one has no records around the timestamp either.
         """
-        if phone == 'source':
-            return self.filter(
-                call__source=call.source,
-                timestamp__gte=timestamp
-            ).order_by('timestamp').values_list('type', flat=True).first()
-        else:
-            return self.filter(
-                call__destination=call.destination,
-                timestamp__gte=timestamp
-            ).order_by('timestamp').values_list('type', flat=True).first()
+        record = self.record
+        calls = Record.objects.filter(call_id=record.call_id)
+        annotations = {
+            f'call_{type}': Subquery(
+                calls.filter(type=type).values('timestamp')[:1]
+            )
+            for type in (Record.START, Record.END)
+        }
+        for role in ('source', 'destination'):
+            records = Record.objects.filter(**{role: getattr(record, role)})
+            before = records.filter(
+                timestamp__lt=record.timestamp
+            ).order_by('-timestamp')[:1]
+            after = records.filter(
+                timestamp__gte=record.timestamp
+            ).order_by('timestamp')[:1]
+            annotations.update({
+                f'{role}_before': Subquery(before.values('type')),
+                f'{role}_after': Subquery(after.values('type')),
+                f'{role}_after_timestamp': Subquery(after.values('timestamp'))
+            })
+        return LineState.objects.annotate(**annotations).in_bulk(
+            [record.source, record.destination]
+        )
+
+    def neighbour(self, role, key):
+        # Annotations are the same on every line state of the record
+        for line in self.lines.values():
+            return getattr(line, f'{role}_{key}')
+
+    def open_call_id(self, role):
+        line = self.lines.get(getattr(self.record, role))
+        return getattr(line, f'{role}_call_id', None)
+
+    def has_timestamp(self, role):
+        return self.neighbour(role, 'after_timestamp') == self.record.timestamp
+
+    def type_less_than(self, role):
+        return self.neighbour(role, 'before')
+
+    def type_greater_than(self, role):
+        return self.neighbour(role, 'after')
 
 
 class Record(models.Model):
@@ -130,6 +172,10 @@ class Record(models.Model):
 
     timestamp = models.DateTimeField()
 
+    # Copied from the call, so phone and timestamp lookups avoid a join
+    source = models.CharField(max_length=11, editable=False)
+    destination = models.CharField(max_length=11, editable=False)
+
     objects = RecordManager()
 
     def __str__(self):
@@ -137,84 +183,74 @@ class Record(models.Model):
 
     class Meta:
         unique_together = ("call", "type")
+        indexes = [
+            models.Index(fields=['source', 'timestamp']),
+            models.Index(fields=['destination', 'timestamp']),
+        ]
         verbose_name = 'record'
         verbose_name_plural = 'records'
 
+    @timed
     def validate_exists_start_record_before_end_record(self):
         if self.type == Record.END:
-            if not Record.objects.start_call_exists(self.call):
+            if Record.START not in self.context.records:
                 raise ValidationError('There is no start record for this call')
 
+    @timed
     def validate_timestamp_end_record(self):
         """
         Checks if end record timestamp is valid (Greater than start record)
         """
         if self.type == Record.END:
-            start_record = Record.objects.get(
-                call=self.call,
-                type=Record.START)
-            if self.timestamp <= start_record.timestamp:
+            if self.timestamp <= self.context.records[Record.START]:
                 raise ValidationError('Timestamp of end record cannot be less '
                                       'or equal to start record')
 
+    @timed
     def validate_unique_source_timestamp(self):
         """
         Checks if exists a call record for the same source and timestamp
         """
-        conflict = Record.objects.filter(
-            call__source=self.call.source,
-            timestamp=self.timestamp).exists()
-        if conflict:
+        if self.context.has_timestamp('source'):
             raise ValidationError('There is already a start record for this '
                                   'source and timestamp')
 
+    @timed
     def validate_unique_destination_timestamp(self):
         """
         Checks if exists a call record for the same destination and timestamp
         """
-        conflict = Record.objects.filter(
-            call__destination=self.call.destination,
-            timestamp=self.timestamp).exists()
-        if conflict:
+        if self.context.has_timestamp('destination'):
             raise ValidationError('There is already a start record for this '
                                   'destination and timestamp')
 
+    @timed
     def validate_unique_start_record_for_source(self):
         """
         Checks if exists a ongoing call for the same source
         """
         if self.type == Record.START:
-            last_type = Record.objects.last_source_record_type(call=self.call)
-            if last_type == Record.START:
+            if self.context.open_call_id('source'):
                 raise ValidationError('There is already an ongoing call from '
                                       'this source')
 
+    @timed
     def validate_unique_start_record_for_destination(self):
         """
         Checks if exists a ongoing call for the same destination
         """
         if self.type == Record.START:
-            last_type = Record.objects.last_destination_record_type(
-                call=self.call
-            )
-            if last_type == Record.START:
+            if self.context.open_call_id('destination'):
                 raise ValidationError('There is already an ongoing call for '
                                       'this destination')
 
+    @timed
     def validate_overlapping_record_for_source(self):
         """
         Checks if a call does not overlap an existent record
         """
-        type_less_than = Record.objects.type_less_than(
-            call=self.call,
-            timestamp=self.timestamp,
-            phone='source'
-        )
-        type_greater_than = Record.objects.type_greater_than(
-            call=self.call,
-            timestamp=self.timestamp,
-            phone='source'
-        )
+        type_less_than = self.context.type_less_than('source')
+        type_greater_than = self.context.type_greater_than('source')
         if type_less_than == Record.START and type_greater_than == Record.END:
             raise ValidationError('There is already a call record for this '
                                   'source in this interval.')
@@ -223,20 +259,13 @@ class Record(models.Model):
                                       'another call record with the same '
                                       'source')
 
+    @timed
     def validate_overlapping_record_for_destination(self):
         """
         Checks if a call does not overlap an existent range of dates
         """
-        type_less_than = Record.objects.type_less_than(
-            call=self.call,
-            timestamp=self.timestamp,
-            phone='destination'
-        )
-        type_greater_than = Record.objects.type_greater_than(
-            call=self.call,
-            timestamp=self.timestamp,
-            phone='destination'
-        )
+        type_less_than = self.context.type_less_than('destination')
+        type_greater_than = self.context.type_greater_than('destination')
         if type_less_than == Record.START and type_greater_than == Record.END:
             raise ValidationError('There is already a call record for this '
                                   'destination in this interval.')
@@ -246,28 +275,351 @@ class Record(models.Model):
                                       'destination')
 
 
-    def save(self, *args, **kwargs):
-        self.clean_fields()
-        self.validate_exists_start_record_before_end_record()
-        self.validate_timestamp_end_record()
-        self.validate_unique_source_timestamp()
-        self.validate_unique_destination_timestamp()
-        self.validate_unique_start_record_for_source()
-        self.validate_unique_start_record_for_destination()
-        self.validate_overlapping_record_for_source()
-        self.validate_overlapping_record_for_destination()
-        super(Record, self).save(*args, **kwargs)
+    def save(self, *args, clean=True, context=None, locked=False, **kwargs):
+        self.source = self.call.source
+        self.destination = self.call.destination
+        if clean:
+            self.clean_fields()
+        self.context = context or RecordContext(self)
+        # Lines are checked and updated by one transaction at a time, unless
+        # the caller holds their lock already
+        if locked:
+            lock = nullcontext()
+        else:
+            lock = LineState.objects.lock(self.source, self.destination)
+        with lock:
+            self.validate_exists_start_record_before_end_record()
+            self.validate_timestamp_end_record()
+            self.validate_unique_source_timestamp()
+            self.validate_unique_destination_timestamp()
+            self.validate_unique_start_record_for_source()
+            self.validate_unique_start_record_for_destination()
+            self.validate_overlapping_record_for_source()
+            self.validate_overlapping_record_for_destination()
+            adding = self._state.adding
+            super(Record, self).save(*args, **kwargs)
+            if adding:
+                LineState.objects.track(self)
+                self.context.records[self.type] = self.timestamp
+                if self.type == Record.END:
+                    Bill.objects.create_for_calls([(
+                        self.call,
+                        self.context.records[Record.START],
+                        self.timestamp
+                    )])
+
+
+# Taken by the transactions locking lines on databases without row locks
+write_lock = threading.RLock()
+
+
+class LineStateManager(models.Manager):
+    @contextmanager
+    def lock(self, *phones):
+        """
+        Locks the lines of phone numbers in a transaction, so the records of
+        a phone are checked and inserted by one transaction at a time, while
+        records of other phones are ingested in parallel. Missing lines are
+        created, and lines are locked in phone order, so concurrent
+        transactions cannot deadlock.
+
+        Without row locks, as on SQLite, creating the lines takes the
+        database write lock, which serializes writers, and the threads of a
+        process take turns on write_lock, as connections to an in-memory
+        database fail instead of waiting for the database lock.
+        """
+        phones = sorted(set(phones))
+        row_locks = connection.features.has_select_for_update
+        with (nullcontext() if row_locks else write_lock), \
+                transaction.atomic():
+            self.bulk_create([self.model(phone=phone) for phone in phones],
+                             ignore_conflicts=True)
+            if row_locks:
+                list(self.select_for_update().filter(
+                    phone__in=phones
+                ).order_by('phone').values_list('phone', flat=True))
+            yield
+
+    def track(self, record):
+        """
+        Updates the state of the source and destination lines of a record,
+        created by the lock taken to save it, with a single statement
+        """
+        call_id = record.call_id if record.type == Record.START else None
+        state = {}
+        for role in ('source', 'destination'):
+            when = {'phone': getattr(record, role)}
+            for field, value in (('call_id', call_id),
+                                 ('timestamp', record.timestamp)):
+                output_field = LineState._meta.get_field(f'{role}_{field}')
+                state[f'{role}_{field}'] = Case(
+                    When(**when, then=Value(value,
+                                            output_field=output_field)),
+                    default=F(f'{role}_{field}'),
+                    output_field=output_field
+                )
+        self.filter(phone__in=[record.source, record.destination]).update(
+            **state
+        )
+
+
+class LineState(models.Model):
+    """
+    Stores the current state of a phone line, related to :model:`core.Call`.
+    Keeps the ongoing call placed from (source) and to (destination) the
+    phone, along with the timestamp of the last record in each role.
+    """
+    phone = models.CharField(max_length=11, primary_key=True)
+    source_call = models.ForeignKey(
+        Call,
+        related_name='+',
+        null=True,
+        on_delete=models.SET_NULL
+    )
+    source_timestamp = models.DateTimeField(null=True)
+    destination_call = models.ForeignKey(
+        Call,
+        related_name='+',
+        null=True,
+        on_delete=models.SET_NULL
+    )
+    destination_timestamp = models.DateTimeField(null=True)
+
+    objects = LineStateManager()
+
+    def __str__(self):
+        return f'{self.phone}'
+
+    class Meta:
+        verbose_name = 'line state'
+        verbose_name_plural = 'line states'
+
+
+class StagedRecord(models.Model):
+    """
+    Stores an end record received before the start record of its call,
+    until it is reconciled into a :model:`core.Record`
+    """
+    PENDING, FAILED = ('pending', 'failed')
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (FAILED, 'Failed')
+    )
+
+    call_id = models.PositiveIntegerField(unique=True)
+    type = models.CharField(
+        max_length=5,
+        choices=Record.CALL_TYPES,
+        default=Record.END
+    )
+    timestamp = models.DateTimeField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(
+        max_length=7,
+        choices=STATUSES,
+        default=PENDING
+    )
+    error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f'{self.call_id}, {self.type}, {self.timestamp}'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'received_at']),
+        ]
+        verbose_name = 'staged record'
+        verbose_name_plural = 'staged records'
+
+
+class ArchivedRecord(models.Model):
+    """
+    Stores the start and end timestamps of an old billed call, in a single
+    row, once its :model:`core.Record` rows are archived
+    """
+    call_id = models.PositiveIntegerField(primary_key=True)
+    source = models.CharField(max_length=11)
+    destination = models.CharField(max_length=11)
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.call_id}, {self.start} - {self.end}'
+
+    class Meta:
+        verbose_name = 'archived record'
+        verbose_name_plural = 'archived records'
+
+
+class QueuedRecord(models.Model):
+    """
+    Stores a start or end record accepted by the asynchronous ingestion
+    mode, until a worker runs it through :model:`core.Record` validations.
+    Records are processed in arrival (primary key) order.
+    """
+    QUEUED, CREATED, STAGED, REJECTED, REPLAYED = (
+        'queued', 'created', 'staged', 'rejected', 'replayed'
+    )
+    STATUSES = (
+        (QUEUED, 'Queued'),
+        (CREATED, 'Created'),
+        (STAGED, 'Staged'),
+        (REJECTED, 'Rejected'),
+        (REPLAYED, 'Replayed')
+    )
+    RESULT_STATUSES = {
+        200: REPLAYED,
+        201: CREATED,
+        202: STAGED,
+        400: REJECTED
+    }
+
+    tracking_id = models.UUIDField(default=uuid.uuid4, unique=True,
+                                   editable=False)
+    payload = models.TextField()
+    status = models.CharField(
+        max_length=8,
+        choices=STATUSES,
+        default=QUEUED
+    )
+    result = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f'{self.tracking_id}, {self.status}'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+        verbose_name = 'queued record'
+        verbose_name_plural = 'queued records'
 
 
 class BillQueryset(models.QuerySet):
+    def period(self, m, y):
+        """
+        Returns the bills ended within a reference period, filtering on a
+        half-open timestamp range so an index on end can be used
+        """
+        start, end = month_range(m, y)
+        return self.filter(end__gte=start, end__lt=end)
+
     def get_bills(self, source, m, y):
         """
         Returns a queryset with selected bills based on source number and
         reference period. m(month) and y(year)
         """
-        return self.filter(call__source=source, end__year=y,
-                           end__month=m).all()
+        return self.filter(source=source).period(m, y).select_related('call')
+
+    def build(self, call, start, end):
+        """
+        Returns the unsaved bill of a call, from the timestamps of its start
+        and end records, priced by the tariff in effect at its start
+        """
+        bill = self.model(call=call, start=start, end=end, source=call.source)
+        bill.price = bill.calculate_price()
+        return bill
+
+    def create_for_calls(self, calls):
+        """
+        Bills (call, start, end) tuples, inserting the bills and adding them
+        to the monthly statements in a single transaction. Unlike
+        ``Bill.save``, used by the admin, it does not read the records.
+        """
+        bills = [self.build(*call) for call in calls]
+        # Nested in the transaction of a record, no savepoint is needed, as
+        # a failure rolls the record back too
+        with transaction.atomic(savepoint=False):
+            self.bulk_create(bills)
+            MonthlyStatement.objects.add_bills(bills)
+        return bills
+
+    def totals(self):
+        """
+        Returns the number of calls, the total duration (timedelta) and the
+        total price of the bills, aggregated by the database
+        """
+        totals = self.aggregate(
+            total_calls=models.Count('id'),
+            total_duration=models.Sum(models.ExpressionWrapper(
+                models.F('end') - models.F('start'),
+                output_field=models.DurationField()
+            )),
+            total_price=models.Sum('price')
+        )
+        return {
+            'total_calls': totals['total_calls'],
+            'total_duration': totals['total_duration'] or timezone.timedelta(),
+            'total_price': totals['total_price'] or Decimal(0)
+        }
+
 
+class Tariff(models.Model):
+    """
+    Stores the pricing rules in effect for calls started from effective_from.
+    Calls started before the first tariff are priced with the pricing
+    settings.
+    """
+    effective_from = models.DateTimeField(unique=True)
+    std_hour_start = models.PositiveSmallIntegerField()
+    std_hour_end = models.PositiveSmallIntegerField()
+    std_standing_charge = models.DecimalField(max_digits=8, decimal_places=4)
+    std_minute_charge = models.DecimalField(max_digits=8, decimal_places=4)
+    rdc_standing_charge = models.DecimalField(max_digits=8, decimal_places=4)
+    rdc_minute_charge = models.DecimalField(max_digits=8, decimal_places=4)
+
+    def compile(self):
+        return tariffs.compile_tariff(
+            self.std_hour_start,
+            self.std_hour_end,
+            self.std_standing_charge,
+            self.std_minute_charge,
+            self.rdc_standing_charge,
+            self.rdc_minute_charge
+        )
+
+    def __str__(self):
+        return f'tariff from {self.effective_from}'
+
+    class Meta:
+        ordering = ('effective_from',)
+        verbose_name = 'tariff'
+        verbose_name_plural = 'tariffs'
+
+
+
+class TariffVersionManager(models.Manager):
+    def current(self):
+        """
+        Returns the version of the tariffs, 0 until a tariff changes
+        """
+        version = self.filter(pk=1).values_list('version', flat=True).first()
+        return version or 0
+
+    def bump(self):
+        """
+        Increments the version of the tariffs, within the transaction
+        changing them
+        """
+        self.get_or_create(pk=1)
+        self.filter(pk=1).update(version=models.F('version') + 1)
+
+
+class TariffVersion(models.Model):
+    """
+    Single row counting the changes of :model:`core.Tariff`, so every
+    process reloads its tariffs once a change is committed
+    """
+    version = models.PositiveIntegerField(default=0)
+
+    objects = TariffVersionManager()
+
+    class Meta:
+        verbose_name = 'tariff version'
+        verbose_name_plural = 'tariff versions'
 
 class Bill(models.Model):
     """
@@ -278,88 +630,213 @@ class Bill(models.Model):
     price = models.DecimalField(max_digits=6, decimal_places=2, null=True)
     start = models.DateTimeField()
     end = models.DateTimeField()
+    # Copied from the call, so bills are looked up by (source, end)
+    source = models.CharField(max_length=11, editable=False)
 
     objects = BillQueryset.as_manager()
 
     @property
     def duration(self):
-        total_sec = int((self.end - self.start).total_seconds())
-        hours, rem = divmod(total_sec, 60 * 60)
-        minutes, seconds = divmod(rem, 60)
-        return f'{hours}h{minutes}m{seconds}s'
+        return format_duration(self.total_seconds)
+
+    @property
+    def total_seconds(self):
+        return int((self.end - self.start).total_seconds())
 
     @property
     def total_minutes(self):
         minutes, _ = divmod((self.end - self.start).total_seconds(), 60)
         return int(minutes)
 
-    def standard_minutes(self):
-        record_start = self.start.replace(second=0, microsecond=0)
-        t_minutes = self.total_minutes
+    def tariff(self):
+        return tariffs.for_time(self.start)
 
-        std_start = time(hour=settings.STD_HOUR_START)
-        std_end = time(hour=settings.STD_HOUR_END)
-
-        minutes = 0
-        for minute in range(t_minutes):
-            cond_1 = std_start <= record_start.time() < std_end
-            # excluding end_limit
-            cond_2 = (record_start + timedelta(minutes=1)).time() < std_end
-            if all([cond_1, cond_2]):
-                minutes += 1
-            record_start += timedelta(minutes=1)
-        return minutes
+    def standard_minutes(self, tariff=None):
+        tariff = tariff or self.tariff()
+        return pricing.standard_minutes(
+            start=self.start,
+            total_minutes=self.total_minutes,
+            std_hour_start=tariff.std_hour_start,
+            std_hour_end=tariff.std_hour_end
+        )
 
     def __str__(self):
         return f'call_id: {self.call} - price: {self.price}'
 
-    def standing_charge(self):
-        record_start = self.start
-        std_start_hour = settings.STD_HOUR_START
-        std_end_hour = settings.STD_HOUR_END
-
-        if std_start_hour <= record_start.hour < std_end_hour:
-            st_charge = settings.STD_STANDING_CHARGE
-        else:
-            st_charge = settings.RDC_STANDING_CHARGE
-        return st_charge
+    def standing_charge(self, tariff=None):
+        return pricing.standing_charge(self.start, tariff or self.tariff())
 
+    @timed
     def calculate_price(self):
-        standard_minutes = self.standard_minutes()
-        reduced_minutes = self.total_minutes - standard_minutes
-
-        std_minute_charge = settings.STD_MINUTE_CHARGE
-        rdc_minute_charge = settings.RDC_MINUTE_CHARGE
-        std_price = (Decimal(standard_minutes) * Decimal(std_minute_charge))
-        rdc_price = Decimal(reduced_minutes) * Decimal(rdc_minute_charge)
-
-        standing_charge = self.standing_charge()
-
-        total = std_price + rdc_price + Decimal(standing_charge)
-        return total.quantize(Decimal('0.01'))
+        return pricing.price(self.start, self.end, self.tariff())
 
     class Meta:
+        indexes = [
+            models.Index(fields=['source', 'end']),
+            # Keyset pagination of the bills of a source
+            models.Index(fields=['source', 'start', 'call']),
+        ]
         verbose_name = 'bill'
         verbose_name_plural = 'bills'
 
     def save(self, *args, **kwargs):
-        self.start = Record.objects.timestamp(
-            call_id=self.call.id,
-            type=Record.START
-        )
-        self.end = Record.objects.timestamp(
-            call_id=self.call.id,
-            type=Record.END
-        )
+        self.source = self.call.source
+        # As from the admin, the timestamps are read from the call records,
+        # which may have been edited. Records of old calls may be archived,
+        # and then a stored bill keeps its timestamps
+        records = dict(Record.objects.filter(
+            call_id=self.call.id
+        ).values_list('type', 'timestamp'))
+        if Record.START in records and Record.END in records:
+            self.start = records[Record.START]
+            self.end = records[Record.END]
+        elif self._state.adding:
+            raise Record.DoesNotExist('The call has no start and end records')
         self.price = self.calculate_price()
-        super(Bill, self).save(*args, **kwargs)
+        with transaction.atomic():
+            stored = None
+            if not self._state.adding:
+                # Its statement totals move from the stored bill to this one
+                stored = Bill.objects.select_for_update().only(
+                    'source', 'start', 'end', 'price'
+                ).filter(pk=self.pk).first()
+            super(Bill, self).save(*args, **kwargs)
+            if stored is not None:
+                stored.price = stored.price or 0
+                MonthlyStatement.objects.remove_bills([stored])
+            MonthlyStatement.objects.add_bills([self])
+
+
+class MonthlyStatementManager(models.Manager):
+    def add_bills(self, bills):
+        """
+        Adds bills to the statements of their source and reference period
+        """
+        self._apply(bills, sign=1)
+
+    def remove_bills(self, bills):
+        """
+        Removes bills from the statements of their source and reference period
+        """
+        self._apply(bills, sign=-1)
+
+    def rebuild(self, m=None, y=None, chunk_size=2000):
+        """
+        Rebuilds the statements from the bills, for every reference period or
+        only for m(month) and y(year). Returns the number of bills read.
+        """
+        bills = Bill.objects.only('source', 'start', 'end', 'price')
+        statements = self.all()
+        if m is not None:
+            bills = bills.period(m, y)
+            statements = statements.filter(year=y, month=m)
+
+        count = 0
+        with transaction.atomic():
+            # Statements left without bills are not created again
+            periods = list(statements.values_list('source', 'month', 'year'))
+            transaction.on_commit(lambda: cache.delete_generations(periods))
+            statements.delete()
+            chunk = []
+            for bill in bills.iterator(chunk_size=chunk_size):
+                chunk.append(bill)
+                if len(chunk) == chunk_size:
+                    self.add_bills(chunk)
+                    count += len(chunk)
+                    chunk = []
+            self.add_bills(chunk)
+            count += len(chunk)
+        return count
+
+    def _apply(self, bills, sign):
+        totals = {}
+        for bill in bills:
+            end = timezone.localtime(bill.end)
+            key = (bill.source, end.year, end.month)
+            count, duration, price = totals.get(key, (0, 0, Decimal(0)))
+            totals[key] = (count + sign,
+                           duration + sign * bill.total_seconds,
+                           price + sign * bill.price)
+        if not totals:
+            return
+
+        with transaction.atomic(savepoint=False):
+            statements = {
+                (s.source, s.year, s.month): s
+                for s in self.select_for_update().filter(
+                    source__in={source for source, _, _ in totals},
+                    year__in={year for _, year, _ in totals},
+                    month__in={month for _, _, month in totals}
+                )
+            }
+            created, updated = [], []
+            for key, (count, duration, price) in totals.items():
+                statement = statements.get(key)
+                if statement is None:
+                    source, year, month = key
+                    statement = self.model(source=source, year=year,
+                                           month=month)
+                    created.append(statement)
+                else:
+                    # Pages of the bills cached under the old one are dropped
+                    statement.generation = uuid.uuid4()
+                    updated.append(statement)
+                statement.call_count += count
+                statement.total_duration += duration
+                statement.total_price += price
+
+            self.bulk_update(updated, ['call_count', 'total_duration',
+                                       'total_price', 'generation'])
+            self.bulk_create(created)
+            # Cached once committed, so no page of the bills before it is
+            # cached under the new generation
+            transaction.on_commit(
+                lambda: cache.set_generations(created + updated)
+            )
+
+
+class MonthlyStatement(models.Model):
+    """
+    Stores the monthly totals of the bills of a source, related to
+    :model:`core.Bill`
+    """
+    source = models.CharField(max_length=11)
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    call_count = models.PositiveIntegerField(default=0)
+    total_duration = models.PositiveIntegerField(default=0)
+    total_price = models.DecimalField(max_digits=12, decimal_places=2,
+                                      default=Decimal(0))
+    # Replaced whenever the bills change, keying their cached responses
+    generation = models.UUIDField(default=uuid.uuid4, editable=False)
+
+    objects = MonthlyStatementManager()
+
+    @property
+    def duration(self):
+        return format_duration(self.total_duration)
+
+    def __str__(self):
+        return f'{self.source} - {self.month:02d}/{self.year}'
+
+    class Meta:
+        unique_together = ('source', 'year', 'month')
+        verbose_name = 'monthly statement'
+        verbose_name_plural = 'monthly statements'
+
+
+@receiver(post_delete, sender=Bill)
+def remove_bill_from_statement(sender, instance, **kwargs):
+    """
+    On delete of a bill, its statement totals are decreased
+    """
+    MonthlyStatement.objects.remove_bills([instance])
 
 
-@receiver(post_save, sender=Record)
-def create_bill(sender, instance, created, **kwargs):
+@receiver(post_save, sender=Tariff)
+@receiver(post_delete, sender=Tariff)
+def invalidate_tariffs(sender, **kwargs):
     """
-    On post save of a end call record, a bill created
+    On change of a tariff, the tariff tables of every process are reloaded
     """
-    if created and instance.type == Record.END:
-        call = Call.objects.get(id=instance.call_id)
-        Bill.objects.create(call=call)
+    tariffs.invalidate()
@@ -0,0 +1,60 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(start, call_id):
+    """
+    Returns an opaque cursor pointing after the bill of (start, call_id)
+    """
+    value = json.dumps([start.isoformat(), call_id]).encode()
+    return base64.urlsafe_b64encode(value).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Returns the (start, call_id) of a cursor. Raises ValueError when the
+    cursor is invalid.
+    """
+    try:
+        value = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        start, call_id = json.loads(value.decode())
+        start = parse_datetime(start)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+    if start is None or not isinstance(call_id, int):
+        raise ValueError('Invalid cursor')
+    return start, call_id
+
+
+def bill_page(queryset, period_end, cursor=None, size=1000):
+    """
+    Returns a page of the bills of a subscriber period, ordered by
+    (start, call_id), and the cursor of the next page, if any.
+
+    Pages are read with a keyset condition on (start, call_id) instead of an
+    offset, so deep pages cost the same as the first one. Calls of a source
+    never overlap, so the first bill ending within the period is also the
+    first one starting, and its start bounds the first page. Bills ending
+    before period_end also start before it, which bounds the range of every
+    page.
+    """
+    queryset = queryset.filter(start__lt=period_end)
+    if cursor is None:
+        first = queryset.order_by('end').values_list('start', flat=True)[:1]
+        if not first:
+            return [], None
+        queryset = queryset.filter(start__gte=first[0])
+    else:
+        start, call_id = cursor
+        queryset = queryset.filter(start__gte=start).filter(
+            Q(start__gt=start) | Q(call_id__gt=call_id)
+        )
+
+    bills = list(queryset.order_by('start', 'call_id')[:size + 1])
+    if len(bills) <= size:
+        return bills, None
+    bills = bills[:size]
+    return bills, encode_cursor(bills[-1].start, bills[-1].call_id)
@@ -0,0 +1,204 @@
+from django.conf import settings
+from django.db import connection as default_connection, transaction
+from django.utils import timezone
+
+from core.utils import month_range
+
+# Partitioned tables and the timestamp column they are partitioned by. Bills
+# are looked up by end, so a reference period is read from one partition
+PARTITIONED_TABLES = {
+    'core_record': 'timestamp',
+    'core_bill': 'end',
+}
+
+# Unique columns of the partitioned tables. A partitioned table cannot hold
+# a unique index without its partition column, so each partition gets its
+# own unique index on them, and validation checks them across partitions
+UNIQUE_COLUMNS = {
+    'core_record': [('call_id', 'type')],
+    'core_bill': [('call_id',)],
+}
+
+
+def is_enabled(connection=None):
+    """
+    Returns whether Record and Bill are stored in monthly partitions, which
+    requires PostgreSQL 11 or later
+    """
+    connection = connection or default_connection
+    return (settings.PARTITIONED_STORAGE and
+            connection.vendor == 'postgresql')
+
+
+def partition_name(table, m, y):
+    return f'{table}_p{y}_{m:02d}'
+
+
+def next_month(m, y):
+    return (1, y + 1) if m == 12 else (m + 1, y)
+
+
+def months(first, last):
+    """
+    Yields the (month, year) periods from first to last, both included
+    """
+    m, y = first
+    while (y, m) <= (last[1], last[0]):
+        yield m, y
+        m, y = next_month(m, y)
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        'SELECT 1 FROM pg_partitioned_table p JOIN pg_class c '
+        'ON c.oid = p.partrelid WHERE c.relname = %s',
+        [table]
+    )
+    return cursor.fetchone() is not None
+
+
+def partitions_of(cursor, table):
+    cursor.execute(
+        'SELECT c.relname FROM pg_inherits i JOIN pg_class c '
+        'ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass '
+        'ORDER BY c.relname',
+        [table]
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def create_unique_indexes(cursor, table, partition):
+    """
+    Creates the unique indexes of UNIQUE_COLUMNS on a partition of table
+    """
+    qn = cursor.db.ops.quote_name
+    for columns in UNIQUE_COLUMNS[table]:
+        name = f'{partition}_{"_".join(columns)}_uniq'
+        cursor.execute(
+            f'CREATE UNIQUE INDEX IF NOT EXISTS {qn(name)} ON '
+            f'{qn(partition)} ({", ".join(qn(c) for c in columns)})'
+        )
+
+
+def partition_table(cursor, table, column):
+    """
+    Replaces a table with one partitioned by month on column, holding the
+    same rows, indexes and foreign keys, with a partition for each month of
+    data and a default partition.
+
+    Primary keys and unique indexes of a partitioned table must include the
+    partition column, so the primary key becomes (id, column) and the other
+    unique indexes, (call_id, type) of records and call_id of bills, are
+    created on each partition instead. Rows of different months are only
+    checked by validation, under the lock of their lines.
+    """
+    qn = cursor.db.ops.quote_name
+    new = f'{table}__partitioned'
+
+    cursor.execute(
+        'SELECT indexname, indexdef FROM pg_indexes '
+        'WHERE tablename = %s AND indexname <> %s',
+        [table, f'{table}_pkey']
+    )
+    indexes = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [table]
+    )
+    foreign_keys = cursor.fetchall()
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+    sequence, = cursor.fetchone()
+    cursor.execute(f'SELECT min({qn(column)}), max({qn(column)}) '
+                   f'FROM {qn(table)}')
+    first, last = cursor.fetchone()
+
+    cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY NONE')
+    cursor.execute(
+        f'CREATE TABLE {qn(new)} (LIKE {qn(table)} INCLUDING DEFAULTS '
+        f'INCLUDING CONSTRAINTS) PARTITION BY RANGE ({qn(column)})'
+    )
+    cursor.execute(f'CREATE TABLE {qn(table + "_default")} '
+                   f'PARTITION OF {qn(new)} DEFAULT')
+    if first is not None:
+        first = timezone.localtime(first)
+        last = timezone.localtime(last)
+        for m, y in months((first.month, first.year),
+                           (last.month, last.year)):
+            start, end = month_range(m, y)
+            cursor.execute(
+                f'CREATE TABLE {qn(partition_name(table, m, y))} '
+                f'PARTITION OF {qn(new)} FOR VALUES FROM (%s) TO (%s)',
+                [start, end]
+            )
+    cursor.execute(f'INSERT INTO {qn(new)} SELECT * FROM {qn(table)}')
+    cursor.execute(f'DROP TABLE {qn(table)}')
+    cursor.execute(f'ALTER TABLE {qn(new)} RENAME TO {qn(table)}')
+    cursor.execute(f'ALTER TABLE {qn(table)} ADD CONSTRAINT '
+                   f'{qn(table + "_pkey")} PRIMARY KEY (id, {qn(column)})')
+
+    for name, definition in indexes:
+        if not definition.startswith('CREATE UNIQUE INDEX'):
+            cursor.execute(definition)
+    for partition in partitions_of(cursor, table):
+        create_unique_indexes(cursor, table, partition)
+    for name, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} '
+                       f'{definition}')
+    cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {qn(table)}.id')
+
+
+def create_partition(cursor, table, column, m, y):
+    """
+    Creates the partition of a month, if missing, moving into it the rows
+    of that month stored in the default partition. Returns whether it was
+    created.
+    """
+    qn = cursor.db.ops.quote_name
+    name = partition_name(table, m, y)
+    cursor.execute('SELECT to_regclass(%s)', [name])
+    if cursor.fetchone()[0] is not None:
+        return False
+
+    start, end = month_range(m, y)
+    default = f'{table}_default'
+    cursor.execute(f'CREATE TABLE {qn(name)} (LIKE {qn(table)} '
+                   f'INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM {qn(default)} WHERE {qn(column)} >= %s '
+        f'AND {qn(column)} < %s RETURNING *) '
+        f'INSERT INTO {qn(name)} SELECT * FROM moved',
+        [start, end]
+    )
+    create_unique_indexes(cursor, table, name)
+    cursor.execute(f'ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} '
+                   f'FOR VALUES FROM (%s) TO (%s)', [start, end])
+    return True
+
+
+def create_partitions(months_ahead=3, connection=None):
+    """
+    Creates the partitions of the current month and of the next
+    months_ahead months, for every partitioned table. Returns the names of
+    the partitions created.
+    """
+    connection = connection or default_connection
+    if not is_enabled(connection):
+        return []
+
+    today = timezone.localdate()
+    first = (today.month, today.year)
+    last = first
+    for _ in range(months_ahead):
+        last = next_month(*last)
+
+    created = []
+    with transaction.atomic(using=connection.alias), \
+            connection.cursor() as cursor:
+        for table, column in PARTITIONED_TABLES.items():
+            if not is_partitioned(cursor, table):
+                continue
+            for m, y in months(first, last):
+                if create_partition(cursor, table, column, m, y):
+                    created.append(partition_name(table, m, y))
+    return created
@@ -0,0 +1,59 @@
+from decimal import Decimal
+
+MINUTES_PER_DAY = 24 * 60
+CENT = Decimal('0.01')
+
+
+def _band_minutes_until(minute, band_start, band_end):
+    """
+    Returns how many minutes in [0, minute) fall inside the daily band
+    [band_start, band_end), both given as minutes of the day
+    """
+    band = band_end - band_start
+    days, minute_of_day = divmod(minute, MINUTES_PER_DAY)
+    return days * band + min(max(minute_of_day - band_start, 0), band)
+
+
+def standard_minutes(start, total_minutes, std_hour_start, std_hour_end):
+    """
+    Returns how many of the total_minutes completed minutes of a call,
+    counted from the start minute, are charged at the standard tariff.
+
+    A minute is standard when it starts within the standard time and ends
+    before the standard end limit, so the last minute before std_hour_end is
+    excluded. The count is worked out with interval arithmetic, in constant
+    time whatever the duration of the call.
+    """
+    band_start = std_hour_start * 60
+    band_end = std_hour_end * 60 - 1
+    if band_end <= band_start or total_minutes <= 0:
+        return 0
+
+    first = start.hour * 60 + start.minute
+    last = first + total_minutes
+    return (_band_minutes_until(last, band_start, band_end) -
+            _band_minutes_until(first, band_start, band_end))
+
+
+def standing_charge(start, tariff):
+    """
+    Returns the standing charge of a call, set by the tariff time it starts
+    """
+    if tariff.std_hour_start <= start.hour < tariff.std_hour_end:
+        return tariff.std_standing_charge
+    return tariff.rdc_standing_charge
+
+
+def price(start, end, tariff):
+    """
+    Returns the price of a call, given a compiled tariff of Decimal charges
+    """
+    total_minutes = int((end - start).total_seconds() // 60)
+    std_minutes = standard_minutes(start, total_minutes,
+                                   tariff.std_hour_start, tariff.std_hour_end)
+    rdc_minutes = total_minutes - std_minutes
+
+    total = (std_minutes * tariff.std_minute_charge +
+             rdc_minutes * tariff.rdc_minute_charge +
+             standing_charge(start, tariff))
+    return total.quantize(CENT)
@@ -0,0 +1,43 @@
+import json
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.batch import RecordBatch
+from core.models import QueuedRecord
+
+
+def enqueue(data):
+    """
+    Appends a record to the ingestion queue and returns its queue entry
+    """
+    return QueuedRecord.objects.create(payload=json.dumps(data))
+
+
+def process(batch_size=1000):
+    """
+    Runs the oldest queued records through the batch validation and billing
+    path, in arrival order, and stores the result of each one. Workers
+    running concurrently take turns, so arrival order is kept. Returns the
+    number of records processed.
+    """
+    with transaction.atomic():
+        queued = list(
+            QueuedRecord.objects.select_for_update().filter(
+                status=QueuedRecord.QUEUED
+            ).order_by('id')[:batch_size]
+        )
+        if not queued:
+            return 0
+
+        results = RecordBatch([json.loads(q.payload) for q in queued]).save()
+        processed_at = timezone.now()
+        for record, result in zip(queued, results):
+            record.status = QueuedRecord.RESULT_STATUSES[result['status']]
+            record.result = json.dumps(result.get('data',
+                                                  result.get('errors')))
+            record.processed_at = processed_at
+        QueuedRecord.objects.bulk_update(
+            queued, ['status', 'result', 'processed_at']
+        )
+    return len(queued)
@@ -0,0 +1,125 @@
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import timezone
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+from core.models import Record
+
+RecordKey = namedtuple('RecordKey', [
+    'call_id', 'type', 'timestamp', 'source', 'destination'
+])
+
+
+def record_key(data):
+    """
+    Returns the identity of a posted record, with its timestamp in UTC, or
+    None when the record is not well formed enough to have one
+    """
+    if not isinstance(data, dict):
+        return None
+    try:
+        call_id = int(data.get('call_id'))
+        timestamp = parse_datetime(str(data.get('timestamp')))
+    except (TypeError, ValueError):
+        return None
+    type = data.get('type')
+    if timestamp is None or timestamp.tzinfo is None or \
+            type not in (Record.START, Record.END):
+        return None
+
+    if type == Record.START:
+        source, destination = data.get('source'), data.get('destination')
+    else:
+        source = destination = None
+    return RecordKey(call_id, type, timestamp.astimezone(timezone.utc),
+                     source, destination)
+
+
+class RecentRecords:
+    """
+    Least recently used mapping of the keys of the records created by this
+    process to their response payload
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            payload = self.entries.get(key)
+            if payload is not None:
+                self.entries.move_to_end(key)
+            return payload
+
+    def add(self, key, payload):
+        with self.lock:
+            self.entries[key] = payload
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.RECORD_REPLAY_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+recent = RecentRecords()
+
+
+def remember(data):
+    """
+    Remembers the payload of a created record, so a replay of it is
+    answered without touching the database
+    """
+    key = record_key(data)
+    if key is not None:
+        recent.add(key, data)
+
+
+def recall(data):
+    """
+    Returns the payload of a record recently created by this process with
+    the same call, type, timestamp, source and destination, or None,
+    without touching the database
+    """
+    key = record_key(data)
+    if key is None:
+        return None
+    return recent.get(key)
+
+
+def find(data, serializer_class):
+    """
+    Returns the original payload of a record already stored with the same
+    call, type, timestamp, source and destination, or None. Recent records
+    are found in memory, others with a lookup on the (call, type) unique
+    index, bounded by the timestamp so a single partition is read when
+    records are partitioned.
+    """
+    key = record_key(data)
+    if key is None:
+        return None
+    payload = recent.get(key)
+    if payload is not None:
+        return payload
+
+    stored = Record.objects.filter(
+        call_id=key.call_id,
+        type=key.type,
+        timestamp=key.timestamp
+    ).values_list('source', 'destination').first()
+    if stored is None:
+        return None
+    if key.type == Record.START and stored != (key.source, key.destination):
+        return None
+
+    record = {'call_id': key.call_id, 'type': key.type,
+              'timestamp': key.timestamp}
+    if key.type == Record.START:
+        record.update(source=key.source, destination=key.destination)
+    payload = serializer_class(record).data
+    recent.add(key, payload)
+    return payload
@@ -0,0 +1,40 @@
+from django.db import transaction
+
+from core import pricing, tariffs
+from core.models import Bill, MonthlyStatement
+
+
+def rerate(m, y, chunk_size=2000):
+    """
+    Prices again the bills of a reference period with the current tariffs.
+    Bills are read in chunks of plain values, ordered by id, and only the
+    changed prices are written back, together with their statement totals.
+    Returns the number of bills read and of bills changed.
+    """
+    bills = Bill.objects.period(m, y).order_by('id').values_list(
+        'id', 'source', 'start', 'end', 'price'
+    )
+    read = changed = 0
+    last_id = 0
+    while True:
+        chunk = list(bills.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+        read += len(chunk)
+
+        old, new = [], []
+        for id, source, start, end, price in chunk:
+            new_price = pricing.price(start, end, tariffs.for_time(start))
+            if new_price != price:
+                old.append(Bill(id=id, source=source, start=start, end=end,
+                                price=price or 0))
+                new.append(Bill(id=id, source=source, start=start, end=end,
+                                price=new_price))
+        if new:
+            with transaction.atomic():
+                Bill.objects.bulk_update(new, ['price'])
+                MonthlyStatement.objects.remove_bills(old)
+                MonthlyStatement.objects.add_bills(new)
+            changed += len(new)
+    return read, changed
@@ -57,6 +57,46 @@ def get_record_schema():
     return record_schema
 
 
+def get_record_status_schema():
+    """
+    Generates a ManualSchema for RecordStatus view
+    """
+    record_status_schema = schemas.ManualSchema(fields=[
+        coreapi.Field(
+            "tracking_id",
+            required=True,
+            location="path",
+            schema=coreschema.String(
+                description='Tracking id returned when the record was queued'
+            )
+        )
+    ])
+
+    return record_status_schema
+
+
+def get_record_batch_schema():
+    """
+    Generates a ManualSchema for RecordBatchCreate view
+    """
+    record_batch_schema = schemas.ManualSchema(
+        fields=[
+            coreapi.Field(
+                "records",
+                required=True,
+                location="body",
+                schema=coreschema.Array(
+                    description='A list of start and end call records, in '
+                                'the same format accepted by /records'
+                )
+            ),
+        ],
+        encoding="application/json",
+    )
+
+    return record_batch_schema
+
+
 def get_bill_schema():
     """
     Generates a ManualSchema for BillList view
@@ -77,7 +117,50 @@ def get_bill_schema():
             schema=coreschema.String(
                 description='The reference period (month/year) '
             )
+        ),
+        coreapi.Field(
+            "cursor",
+            required=False,
+            location="query",
+            schema=coreschema.String(
+                description='The cursor of the page, given as next by the '
+                            'previous page'
+            )
+        ),
+        coreapi.Field(
+            "page_size",
+            required=False,
+            location="query",
+            schema=coreschema.Integer(
+                description='Number of bills per page'
+            )
         )
     ])
 
     return bill_schema
+
+
+def get_bill_export_schema():
+    """
+    Generates a ManualSchema for BillExport view
+    """
+    bill_export_schema = schemas.ManualSchema(fields=[
+        coreapi.Field(
+            "reference",
+            required=False,
+            location="query",
+            schema=coreschema.String(
+                description='The reference period (month/year) '
+            )
+        ),
+        coreapi.Field(
+            "output",
+            required=False,
+            location="query",
+            schema=coreschema.String(
+                description='The output format: csv (default) or ndjson'
+            )
+        )
+    ])
+
+    return bill_export_schema
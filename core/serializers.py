@@ -1,7 +1,17 @@
+import json
+
 from django.db import transaction
 from rest_framework import serializers
 
-from core.models import Call, Record, Bill
+from core.models import (
+    Call,
+    Record,
+    Bill,
+    MonthlyStatement,
+    QueuedRecord,
+    StagedRecord
+)
+from core.utils import format_price
 
 
 class CallSerializer(serializers.ModelSerializer):
@@ -59,11 +69,11 @@ class EndRecordSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Record
-        exclude = ('call',)
+        exclude = ('call', 'source', 'destination')
 
     def validate(self, attrs):
         record = Record(**attrs)
-        record.full_clean()
+        record.full_clean(exclude=['source', 'destination'])
 
         return attrs
 
@@ -106,5 +116,75 @@ class BillSerializer(serializers.ModelSerializer):
         return obj.duration
 
     def get_call_price(self, obj):
-        price = f'R$ {obj.price:.2f}'.replace('.', ',')
-        return price
+        return format_price(obj.price)
+
+
+class StagedRecordSerializer(serializers.ModelSerializer):
+    """
+    Stages an end record received before the start record of its call
+    """
+    call_id = serializers.IntegerField(required=True)
+
+    class Meta:
+        model = StagedRecord
+        fields = ('call_id', 'type', 'timestamp')
+
+    def validate(self, attrs):
+        if attrs.get('type') != Record.END:
+            raise serializers.ValidationError('Only end records can be '
+                                              'staged')
+        if Call.objects.filter(id=attrs.get('call_id')).exists():
+            raise serializers.ValidationError('This call already exists')
+
+        return attrs
+
+    def create(self, validated_data):
+        StagedRecord.objects.get_or_create(
+            call_id=validated_data.get('call_id'),
+            defaults={
+                'type': validated_data.get('type'),
+                'timestamp': validated_data.get('timestamp')
+            }
+        )
+
+        return validated_data
+
+
+class QueuedRecordSerializer(serializers.ModelSerializer):
+    result = serializers.SerializerMethodField()
+
+    class Meta:
+        model = QueuedRecord
+        fields = ('tracking_id', 'status', 'result', 'received_at',
+                  'processed_at')
+
+    def get_result(self, obj):
+        if obj.result:
+            return json.loads(obj.result)
+
+
+class BatchStartRecordSerializer(StartRecordSerializer):
+    """
+    Validates the fields of a start record within a batch. Checks depending
+    on the database are run by :class:`core.batch.RecordBatch`
+    """
+
+    def validate(self, attrs):
+        call = Call(
+            id=attrs.get('call_id'),
+            source=attrs.get('source'),
+            destination=attrs.get('destination')
+        )
+        call.validate_source_destination()
+
+        return attrs
+
+
+class BatchEndRecordSerializer(EndRecordSerializer):
+    """
+    Validates the fields of an end record within a batch. Checks depending
+    on the database are run by :class:`core.batch.RecordBatch`
+    """
+
+    def validate(self, attrs):
+        return attrs
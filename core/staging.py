@@ -0,0 +1,54 @@
+import json
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.batch import RecordBatch
+from core.models import Call, StagedRecord
+
+
+def reconcile(batch_size=1000):
+    """
+    Pairs pending staged end records with the start records received since,
+    validating and storing them, with their bills, as a single batch.
+    Returns the number of staged records processed.
+    """
+    staged = list(
+        StagedRecord.objects.filter(
+            status=StagedRecord.PENDING,
+            call_id__in=Call.objects.values('id')
+        ).order_by('timestamp')[:batch_size]
+    )
+    if not staged:
+        return 0
+
+    data = [
+        {'type': s.type, 'call_id': s.call_id, 'timestamp': s.timestamp}
+        for s in staged
+    ]
+    with transaction.atomic():
+        results = RecordBatch(data, stage_orphans=False).save()
+        reconciled, failed = [], []
+        for record, result in zip(staged, results):
+            if result['status'] in (200, 201):
+                reconciled.append(record.pk)
+            else:
+                record.status = StagedRecord.FAILED
+                record.error = json.dumps(result['errors'])
+                failed.append(record)
+        StagedRecord.objects.filter(pk__in=reconciled).delete()
+        StagedRecord.objects.bulk_update(failed, ['status', 'error'])
+    return len(staged)
+
+
+def expire(ttl):
+    """
+    Marks as failed the staged records pending for more than ttl seconds,
+    whose start record never arrived. Returns the number of records expired.
+    """
+    limit = timezone.now() - timezone.timedelta(seconds=ttl)
+    return StagedRecord.objects.filter(
+        status=StagedRecord.PENDING,
+        received_at__lt=limit
+    ).update(status=StagedRecord.FAILED,
+             error=json.dumps(['There is no start record for this call']))
@@ -0,0 +1,126 @@
+import bisect
+import threading
+import time
+from collections import namedtuple
+from decimal import Decimal
+
+from django.conf import settings
+
+CompiledTariff = namedtuple('CompiledTariff', [
+    'std_hour_start',
+    'std_hour_end',
+    'std_standing_charge',
+    'std_minute_charge',
+    'rdc_standing_charge',
+    'rdc_minute_charge',
+])
+
+
+def compile_tariff(std_hour_start, std_hour_end, std_standing_charge,
+                   std_minute_charge, rdc_standing_charge, rdc_minute_charge):
+    """
+    Returns a tariff with its charges converted to Decimal once
+    """
+    return CompiledTariff(
+        std_hour_start=int(std_hour_start),
+        std_hour_end=int(std_hour_end),
+        std_standing_charge=Decimal(str(std_standing_charge)),
+        std_minute_charge=Decimal(str(std_minute_charge)),
+        rdc_standing_charge=Decimal(str(rdc_standing_charge)),
+        rdc_minute_charge=Decimal(str(rdc_minute_charge))
+    )
+
+
+def current_version():
+    """
+    Returns the version of the tariffs, stored in the database so every
+    process sees a change once it is committed
+    """
+    from core.models import TariffVersion
+
+    return TariffVersion.objects.current()
+
+
+class TariffTable:
+    """
+    In-process copy of the tariffs, sorted by effective date. It is reloaded
+    from the database only when the version stamp changes, which is checked
+    at most every TARIFF_VERSION_CHECK_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # (version, effective dates, tariffs), replaced as a whole
+        self.state = (None, [], [])
+        self.checked_at = None
+        self.default = None
+
+    def refresh(self):
+        now = time.monotonic()
+        checked_at = self.checked_at
+        if (checked_at is not None and
+                now - checked_at < settings.TARIFF_VERSION_CHECK_INTERVAL):
+            return
+        with self.lock:
+            version = current_version()
+            if version != self.state[0]:
+                self.state = (version, *self.load())
+            self.checked_at = now
+
+    def load(self):
+        from core.models import Tariff
+
+        starts, tariffs = [], []
+        for tariff in Tariff.objects.order_by('effective_from'):
+            starts.append(tariff.effective_from)
+            tariffs.append(tariff.compile())
+        return starts, tariffs
+
+    def default_tariff(self):
+        """
+        Returns the tariff defined by the pricing settings, used before the
+        first effective date. It is compiled again only when they change.
+        """
+        values = (
+            settings.STD_HOUR_START,
+            settings.STD_HOUR_END,
+            settings.STD_STANDING_CHARGE,
+            settings.STD_MINUTE_CHARGE,
+            settings.RDC_STANDING_CHARGE,
+            settings.RDC_MINUTE_CHARGE
+        )
+        if self.default is None or self.default[0] != values:
+            self.default = (values, compile_tariff(*values))
+        return self.default[1]
+
+    def for_time(self, timestamp):
+        self.refresh()
+        _, starts, tariffs = self.state
+        index = bisect.bisect_right(starts, timestamp) - 1
+        if index < 0:
+            return self.default_tariff()
+        return tariffs[index]
+
+
+table = TariffTable()
+
+
+def for_time(timestamp):
+    """
+    Returns the compiled tariff in effect at timestamp
+    """
+    return table.for_time(timestamp)
+
+
+def invalidate():
+    """
+    Reloads the tariffs of this process on next use, and of the other
+    processes once the current transaction is committed
+    """
+    from core.models import TariffVersion
+
+    table.reset()
+    TariffVersion.objects.bump()
@@ -0,0 +1,57 @@
+from django.core.management import call_command
+from django.utils import timezone
+
+from core.models import ArchivedRecord, Bill, Call, Record
+
+
+def test_archive_old_billed_records(make_call_record):
+    make_call_record(
+        start_timestamp='2018-08-25T08:28:00Z',
+        end_timestamp='2018-08-25T08:30:00Z'
+    )
+    recent = timezone.now() - timezone.timedelta(days=1)
+    make_call_record(
+        id='43',
+        start_timestamp=recent.isoformat(),
+        end_timestamp=(recent + timezone.timedelta(minutes=2)).isoformat()
+    )
+    call_command('archive_records', '--horizon-days=30', '--chunk-size=1',
+                 '--pause=0')
+
+    archived = ArchivedRecord.objects.get()
+    assert archived.call_id == 42
+    assert archived.source == '99988526423'
+    assert archived.end - archived.start == timezone.timedelta(minutes=2)
+    assert list(Record.objects.values_list('call_id', flat=True)) == [43, 43]
+    assert Call.objects.count() == 2
+    assert Bill.objects.count() == 2
+
+
+def test_archive_keeps_unbilled_records(make_start_record):
+    make_start_record('2018-08-25T08:28:00Z')
+    call_command('archive_records', '--horizon-days=30', '--pause=0')
+    assert Record.objects.count() == 1
+    assert not ArchivedRecord.objects.exists()
+
+
+def test_archive_max_chunks(make_call_record):
+    for call_id, day in (('42', 24), ('43', 25)):
+        make_call_record(
+            id=call_id,
+            start_timestamp=f'2018-08-{day}T08:28:00Z',
+            end_timestamp=f'2018-08-{day}T08:30:00Z'
+        )
+    call_command('archive_records', '--horizon-days=30', '--chunk-size=1',
+                 '--max-chunks=1', '--pause=0')
+    assert ArchivedRecord.objects.count() == 1
+
+
+def test_bill_saved_after_archive(make_call_record):
+    make_call_record(
+        start_timestamp='2018-08-25T08:28:00Z',
+        end_timestamp='2018-08-25T08:30:00Z'
+    )
+    call_command('archive_records', '--horizon-days=30', '--pause=0')
+    bill = Bill.objects.get()
+    bill.save()
+    assert bill.total_minutes == 2
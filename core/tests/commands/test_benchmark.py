@@ -0,0 +1,69 @@
+import json
+from collections import Counter
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+from core import benchmark
+from core.models import Call
+
+
+def test_generated_calls_do_not_overlap():
+    records = list(benchmark.generate_cdrs(subscribers=3, calls=30))
+    ongoing = {}
+    for record in records:
+        if record['type'] == 'start':
+            assert record['source'] not in ongoing.values()
+            ongoing[record['call_id']] = record['source']
+        else:
+            del ongoing[record['call_id']]
+    assert not ongoing
+    assert len(records) == 3 * 30 * 2
+
+
+def test_generated_night_ratio():
+    records = benchmark.generate_cdrs(subscribers=10, calls=50,
+                                      night_ratio=1)
+    hours = Counter(
+        settings.STD_HOUR_START <= parse_datetime(r['timestamp']).hour <
+        settings.STD_HOUR_END
+        for r in records if r['type'] == 'start'
+    )
+    assert hours[False] > hours[True]
+
+
+def test_generator_is_deterministic():
+    assert (list(benchmark.generate_cdrs(seed=1)) ==
+            list(benchmark.generate_cdrs(seed=1)))
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert benchmark.percentile(values, 50) == 50
+    assert benchmark.percentile(values, 99) == 99
+    assert benchmark.percentile([3], 99) == 3
+
+
+def test_run_results_are_json(transactional_db):
+    results = benchmark.run(subscribers=2, calls=3, history_sizes=(2, 5),
+                            requests=3, pricing_repeat=1, clients=4,
+                            workers=2, client_delay=0.01)
+    assert json.loads(json.dumps(results)) == results
+    assert results['record_create']['records'] == 12
+    assert results['pricing']['bills'] == 6
+    assert [r['bills'] for r in results['bill_list']] == [2, 5]
+    assert Call.objects.count() == 6 + 2 + 5
+    assert results['concurrency']['wsgi']['requests'] == 4
+    assert results['concurrency']['asgi']['requests'] == 4
+
+
+def test_concurrency_slow_clients(transactional_db, make_call_record):
+    make_call_record(start_timestamp='2018-08-25T08:28:00Z',
+                     end_timestamp='2018-08-25T08:30:00Z')
+    results = benchmark.bench_concurrency(
+        '/bills/99988526423?reference=08/2018', clients=20, workers=2,
+        delay=0.05
+    )
+    # Each WSGI thread waits for 10 slow clients in turn
+    assert results['wsgi']['seconds'] >= 0.5
+    assert results['asgi']['seconds'] < results['wsgi']['seconds']
@@ -0,0 +1,34 @@
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+
+
+def test_export_bills_ndjson(make_call_record, tmpdir):
+    make_call_record(
+        start_timestamp='2018-08-25T08:28:00Z',
+        end_timestamp='2018-08-25T08:30:00Z'
+    )
+    output = tmpdir.join('bills.ndjson')
+    call_command('export_bills', '--period=08/2018', '--format=ndjson',
+                 f'--output={output}', '--chunk-size=1')
+    rows = [json.loads(line) for line in output.readlines()]
+    assert len(rows) == 1
+    assert rows[0]['price'] == '0.54'
+
+
+def test_export_bills_stdout(make_call_record, capsys):
+    make_call_record(
+        start_timestamp='2018-08-25T08:28:00Z',
+        end_timestamp='2018-08-25T08:30:00Z'
+    )
+    call_command('export_bills', '--period=08/2018')
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == ('call_id,source,destination,start,end,duration,'
+                        'price')
+    assert len(lines) == 2
+
+
+def test_export_bills_invalid_period():
+    with pytest.raises(CommandError):
+        call_command('export_bills', '--period=2018')
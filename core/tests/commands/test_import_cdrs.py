@@ -0,0 +1,52 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from core.models import Bill, Record, StagedRecord
+
+RECORDS = [
+    {'type': 'end', 'call_id': 70, 'timestamp': '2018-09-25T08:28:00Z'},
+    {'type': 'start', 'call_id': 70, 'timestamp': '2018-09-25T08:20:00Z',
+     'source': '99988526423', 'destination': '9933468278'},
+    {'type': 'start', 'call_id': 71, 'timestamp': '2018-09-25T09:00:00Z',
+     'source': '99988526423', 'destination': '99988526423'},
+]
+
+
+def test_import_jsonl(tmp_path):
+    path = tmp_path / 'cdrs.jsonl'
+    path.write_text('\n'.join(json.dumps(r) for r in RECORDS) + '\n')
+    rejects = tmp_path / 'rejects.jsonl'
+    call_command('import_cdrs', str(path), f'--rejects={rejects}')
+    assert Record.objects.count() == 2
+    assert Bill.objects.get(call_id=70).total_minutes == 8
+    rejected = [json.loads(line) for line in rejects.read_text().splitlines()]
+    assert [r['line'] for r in rejected] == [3]
+
+
+def test_import_csv(tmp_path):
+    path = tmp_path / 'cdrs.csv'
+    path.write_text(
+        'type,call_id,timestamp,source,destination\n'
+        'start,70,2018-09-25T08:20:00Z,99988526423,9933468278\n'
+        'end,70,2018-09-25T08:28:00Z,,\n'
+    )
+    call_command('import_cdrs', str(path), '--chunk-size=1')
+    assert Bill.objects.get(call_id=70).total_minutes == 8
+
+
+def test_import_reconciles_across_chunks(tmp_path):
+    path = tmp_path / 'cdrs.jsonl'
+    path.write_text('\n'.join(json.dumps(r) for r in RECORDS[:2]))
+    call_command('import_cdrs', str(path), '--chunk-size=1')
+    assert not StagedRecord.objects.exists()
+    assert Bill.objects.get(call_id=70).total_minutes == 8
+
+
+def test_import_unknown_format(tmp_path):
+    path = tmp_path / 'cdrs.txt'
+    path.write_text('')
+    with pytest.raises(CommandError):
+        call_command('import_cdrs', str(path))
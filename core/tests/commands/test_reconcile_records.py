@@ -0,0 +1,50 @@
+import json
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from core.models import Bill, Record, StagedRecord
+
+
+def stage(call_id=42, timestamp='2018-09-25T08:28:00Z'):
+    return StagedRecord.objects.create(
+        call_id=call_id,
+        type=Record.END,
+        timestamp=timestamp
+    )
+
+
+def test_reconcile_staged_record(make_start_record):
+    stage(timestamp='2018-09-25T08:28:00Z')
+    make_start_record('2018-09-25T08:20:00Z')
+    call_command('reconcile_records', '--once')
+    assert not StagedRecord.objects.exists()
+    assert Record.objects.filter(call_id=42, type=Record.END).exists()
+    assert Bill.objects.get(call_id=42).total_minutes == 8
+
+
+def test_reconcile_waits_for_start_record():
+    stage()
+    call_command('reconcile_records', '--once')
+    assert StagedRecord.objects.get().status == StagedRecord.PENDING
+
+
+def test_reconcile_invalid_staged_record(make_start_record):
+    stage(timestamp='2018-09-25T08:10:00Z')
+    make_start_record('2018-09-25T08:20:00Z')
+    call_command('reconcile_records', '--once', '--batch-size=1')
+    staged = StagedRecord.objects.get()
+    assert staged.status == StagedRecord.FAILED
+    assert json.loads(staged.error) == ['Timestamp of end record cannot be '
+                                        'less or equal to start record']
+    assert not Bill.objects.exists()
+
+
+def test_reconcile_expires_staged_records(settings):
+    settings.STAGED_RECORD_TTL = 60
+    staged = stage()
+    StagedRecord.objects.filter(pk=staged.pk).update(
+        received_at=timezone.now() - timezone.timedelta(minutes=2)
+    )
+    call_command('reconcile_records', '--once')
+    assert StagedRecord.objects.get().status == StagedRecord.FAILED
@@ -0,0 +1,60 @@
+from decimal import Decimal
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from core.models import Bill, MonthlyStatement, Tariff
+
+
+def add_tariff(effective_from='2018-08-01T00:00:00Z'):
+    Tariff.objects.create(
+        effective_from=effective_from,
+        std_hour_start=6,
+        std_hour_end=22,
+        std_standing_charge='0.50',
+        std_minute_charge='0.10',
+        rdc_standing_charge='0.40',
+        rdc_minute_charge='0.01'
+    )
+
+
+def test_rerate_period(make_call_record):
+    make_call_record(
+        start_timestamp='2018-08-25T08:28:00Z',
+        end_timestamp='2018-08-25T08:30:00Z'
+    )
+    make_call_record(
+        id='43',
+        start_timestamp='2018-08-25T23:00:00Z',
+        end_timestamp='2018-08-25T23:10:00Z'
+    )
+    make_call_record(
+        id='44',
+        start_timestamp='2018-09-25T08:28:00Z',
+        end_timestamp='2018-09-25T08:30:00Z'
+    )
+    add_tariff()
+    call_command('rerate', '--period=08/2018', '--chunk-size=1')
+
+    prices = dict(Bill.objects.values_list('call_id', 'price'))
+    assert prices == {42: Decimal('0.70'), 43: Decimal('0.50'),
+                      44: Decimal('0.54')}
+    statement = MonthlyStatement.objects.get(year=2018, month=8)
+    assert statement.call_count == 2
+    assert statement.total_price == Decimal('1.20')
+
+
+def test_rerate_unchanged_prices(make_call_record, capsys):
+    make_call_record(
+        start_timestamp='2018-08-25T08:28:00Z',
+        end_timestamp='2018-08-25T08:30:00Z'
+    )
+    add_tariff(effective_from='2018-09-01T00:00:00Z')
+    call_command('rerate', '--period=08/2018')
+    assert '0 prices changed' in capsys.readouterr().out
+    assert MonthlyStatement.objects.get().total_price == Decimal('0.54')
+
+
+def test_rerate_invalid_period():
+    with pytest.raises(CommandError):
+        call_command('rerate', '--period=2018-08')
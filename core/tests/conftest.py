@@ -5,7 +5,8 @@ import pytest
 from django.conf import settings
 from django.utils import timezone
 
-from core import models
+from core import models, replay, tariffs
+from core.cache import bills_cache
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'phonemanager.config.settings')
 
@@ -20,6 +21,24 @@ def enable_db_access_for_all_tests(db):
     pass
 
 
+@pytest.fixture(autouse=True)
+def clear_bills_cache():
+    yield
+    bills_cache().clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_tariffs():
+    yield
+    tariffs.table.reset()
+
+
+@pytest.fixture(autouse=True)
+def clear_recent_records():
+    yield
+    replay.recent.clear()
+
+
 @pytest.mark.django_db
 @pytest.fixture()
 def make_call():
@@ -1,8 +1,15 @@
 from decimal import Decimal
 
+import pytest
 from django.conf import settings
+from django.db import connection
+from django.db.models.signals import post_save
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
-from core.models import Bill
+from core import tariffs
+from core.models import Bill, MonthlyStatement, Record
+from core.utils import month_range
 
 
 def test_bill_creation(make_call_record):
@@ -160,7 +167,7 @@ def test_standing_charge_standard(make_call_record):
         end_timestamp='2017-12-12T21:10:13Z'
     )
     bill = Bill.objects.get(call=call_record)
-    expected = 0.36
+    expected = Decimal('0.36')
     assert bill.standing_charge() == expected
 
 
@@ -170,7 +177,7 @@ def test_standing_charge_reduced(make_call_record):
         end_timestamp='2017-12-12T23:10:13Z'
     )
     bill = Bill.objects.get(call=call_record)
-    expected = 0.36
+    expected = Decimal('0.36')
     assert bill.standing_charge() == expected
 
 
@@ -194,3 +201,111 @@ def test_calculate_price_all_reduced(make_call_record):
     bill = Bill.objects.get(call=call_record)
     expected = Decimal('0.36')
     assert bill.price == expected
+
+
+def test_bill_source(make_call_record):
+    call_record = make_call_record()
+    bill = Bill.objects.get(call=call_record)
+    assert bill.source == call_record.source
+
+
+def test_month_range_december():
+    start, end = month_range(12, 2017)
+    assert start.isoformat() == '2017-12-01T00:00:00+00:00'
+    assert end.isoformat() == '2018-01-01T00:00:00+00:00'
+
+
+def test_get_bills_period_limits(make_call_record):
+    make_call_record(
+        id='42',
+        start_timestamp='2018-01-31T23:50:00Z',
+        end_timestamp='2018-01-31T23:59:59Z'
+    )
+    make_call_record(
+        id='43',
+        start_timestamp='2018-02-28T23:50:00Z',
+        end_timestamp='2018-03-01T00:00:00Z'
+    )
+    january = Bill.objects.get_bills(source='99988526423', m=1, y=2018)
+    february = Bill.objects.get_bills(source='99988526423', m=2, y=2018)
+    march = Bill.objects.get_bills(source='99988526423', m=3, y=2018)
+    assert [bill.call_id for bill in january] == [42]
+    assert not february.exists()
+    assert [bill.call_id for bill in march] == [43]
+
+
+@pytest.mark.skipif(connection.vendor != 'postgresql',
+                    reason='EXPLAIN plans are checked on PostgreSQL only')
+def test_get_bills_index_range_scan(make_call_record):
+    make_call_record(
+        start_timestamp='2018-08-25T08:28:00Z',
+        end_timestamp='2018-08-25T08:30:00Z'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+    queryset = Bill.objects.get_bills(source='99988526423', m=8, y=2018)
+    plan = queryset.explain()
+    assert 'core_bill_source_e308ea_idx' in plan
+    assert 'Index Cond' in plan
+    assert 'date_part' not in plan.lower()
+
+
+def test_create_for_calls(make_call):
+    calls = [make_call(id=42), make_call(id=43, source='11987665433')]
+    start = timezone.datetime(2018, 2, 28, 21, 57, 13, tzinfo=timezone.utc)
+    end = timezone.datetime(2018, 2, 28, 22, 10, 56, tzinfo=timezone.utc)
+    tariffs.for_time(start)
+
+    with CaptureQueriesContext(connection) as queries:
+        bills = Bill.objects.create_for_calls(
+            [(call, start, end) for call in calls]
+        )
+    # Neither calls nor records are read, only the statements to update
+    reads = [q['sql'] for q in queries.captured_queries
+             if q['sql'].startswith('SELECT')]
+    assert len(reads) == 1
+    assert reads[0].startswith('SELECT "core_monthlystatement"')
+    assert [bill.price for bill in bills] == [Decimal('0.54')] * 2
+    assert Bill.objects.filter(source='11987665433').get().price == \
+        Decimal('0.54')
+    statement = MonthlyStatement.objects.get(source='99988526423')
+    assert (statement.call_count, statement.total_price) == (1,
+                                                             Decimal('0.54'))
+
+
+def test_end_record_billed_without_signals(make_call_record):
+    assert not post_save.has_listeners(Record)
+    call = make_call_record(start_timestamp='2018-02-28T21:57:13Z',
+                            end_timestamp='2018-02-28T22:10:56Z')
+    assert Bill.objects.get(call=call).price == Decimal('0.54')
+
+
+def test_bill_save_reads_records(make_call_record):
+    call = make_call_record(start_timestamp='2018-02-28T21:57:13Z',
+                            end_timestamp='2018-02-28T22:10:56Z')
+    Bill.objects.all().delete()
+
+    # As from the admin, the timestamps are read from the call records
+    bill = Bill(call=call)
+    bill.save()
+    assert (bill.start, bill.end) == (
+        Record.objects.timestamp(type=Record.START, call_id=call.id),
+        Record.objects.timestamp(type=Record.END, call_id=call.id)
+    )
+    assert bill.price == Decimal('0.54')
+    assert MonthlyStatement.objects.get().call_count == 1
+
+
+def test_bill_save_reads_edited_records(make_call_record):
+    call = make_call_record(start_timestamp='2018-02-28T21:57:13Z',
+                            end_timestamp='2018-02-28T22:10:56Z')
+    # As edited from the admin, on a stored bill
+    Record.objects.filter(call=call, type=Record.END).update(
+        timestamp=timezone.datetime(2018, 2, 28, 22, 20, 56,
+                                    tzinfo=timezone.utc)
+    )
+    bill = Bill.objects.get(call=call)
+    bill.save()
+    assert bill.total_minutes == 23
+    statement = MonthlyStatement.objects.get()
+    assert (statement.call_count, statement.total_price) == (1, bill.price)
@@ -0,0 +1,255 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+
+import pytest
+from django.core.management import call_command
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    OperationalError,
+    connection,
+    connections,
+    transaction
+)
+from django.test import Client
+
+from core.models import Bill, Call, LineState, Record, write_lock
+
+
+def test_start_record_opens_lines(make_start_record):
+    record = make_start_record(source='99988526423', destination='9933468278')
+    source = LineState.objects.get(phone='99988526423')
+    destination = LineState.objects.get(phone='9933468278')
+    assert source.source_call_id == record.call_id
+    assert source.destination_call_id is None
+    assert destination.destination_call_id == record.call_id
+    assert destination.source_call_id is None
+
+
+def test_end_record_closes_lines(make_call_record):
+    make_call_record(
+        source='99988526423',
+        destination='9933468278',
+        start_timestamp='2017-12-12T04:57:13Z',
+        end_timestamp='2017-12-12T06:10:56Z'
+    )
+    source = LineState.objects.get(phone='99988526423')
+    assert source.source_call_id is None
+    assert source.source_timestamp.isoformat() == '2017-12-12T06:10:56+00:00'
+
+
+def test_line_state_str(make_start_record):
+    make_start_record(source='99988526423')
+    assert str(LineState.objects.get(phone='99988526423')) == '99988526423'
+
+
+def test_lock_creates_lines():
+    with LineState.objects.lock('9933468278', '99988526423', '9933468278'):
+        assert set(LineState.objects.values_list('phone', flat=True)) == {
+            '99988526423', '9933468278'
+        }
+        # Locks are reentrant within a transaction
+        with LineState.objects.lock('99988526423'):
+            pass
+
+
+@contextmanager
+def default_database(alias):
+    """
+    Makes the database of alias the default one of the current thread
+    """
+    default = connections[DEFAULT_DB_ALIAS]
+    connections[DEFAULT_DB_ALIAS] = connections[alias]
+    try:
+        yield
+    finally:
+        connections[alias].close()
+        connections[DEFAULT_DB_ALIAS] = default
+
+
+@pytest.fixture()
+def file_database(tmp_path, django_db_blocker):
+    """
+    Migrates a SQLite database stored in a file, whose connections wait for
+    the database lock, unlike those of the shared in-memory test database,
+    which fail at once. Returns its alias.
+    """
+    connections.databases['file'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': str(tmp_path / 'db.sqlite3')
+    }
+    try:
+        with django_db_blocker.unblock():
+            with default_database('file'):
+                call_command('migrate', verbosity=0)
+            yield 'file'
+    finally:
+        del connections['file']
+        del connections.databases['file']
+
+
+def post_records(records, database=None):
+    """
+    Posts records to /records from concurrent threads, all released at
+    once, using the database of the given alias instead of the default one.
+    Returns the status codes of the responses, in the records order.
+    """
+    barrier = threading.Barrier(len(records))
+
+    def post(record):
+        with default_database(database) if database else nullcontext():
+            try:
+                barrier.wait()
+                return Client().post(
+                    '/records', json.dumps(record),
+                    content_type='application/json'
+                ).status_code
+            finally:
+                connection.close()
+
+    with ThreadPoolExecutor(len(records)) as executor:
+        return list(executor.map(post, records))
+
+
+def start_record(call_id, source, destination, timestamp):
+    return {'type': Record.START, 'call_id': call_id, 'source': source,
+            'destination': destination, 'timestamp': timestamp}
+
+
+@pytest.mark.skipif(not connection.features.has_select_for_update,
+                    reason='Reads outside the lock fail on shared in-memory '
+                           'SQLite databases instead of waiting')
+def test_lock_concurrent_start_records(transactional_db):
+    for round in range(5):
+        timestamp = f'2018-09-{round + 10}T08:00:00Z'
+        # Every call is placed from the same source at the same time
+        records = [
+            start_record(round * 100 + worker, '99988526423',
+                         f'119876{round}{worker:04d}', timestamp)
+            for worker in range(8)
+        ]
+        assert sorted(post_records(records)) == [201] + [400] * 7
+        assert Record.objects.filter(source='99988526423',
+                                     timestamp=timestamp).count() == 1
+        LineState.objects.filter(phone='99988526423').update(
+            source_call=None
+        )
+
+    # The same record, resent at once, is created once and replayed
+    record = start_record(1000, '21987650000', '31987650000',
+                          '2018-09-20T08:00:00Z')
+    assert sorted(post_records([record] * 4)) == [200] * 3 + [201]
+
+    # Another record of the same call is answered as already existing
+    records = [
+        start_record(1001, f'2198765{worker:04d}', f'3198765{worker:04d}',
+                     '2018-09-21T08:00:00Z')
+        for worker in range(1, 5)
+    ]
+    assert sorted(post_records(records)) == [201] + [400] * 3
+    assert Call.objects.filter(id=1001).count() == 1
+
+    # Calls of different phones are all created
+    records = [
+        start_record(2000 + worker, f'4198765{worker:04d}',
+                     f'5198765{worker:04d}', '2018-09-22T08:00:00Z')
+        for worker in range(8)
+    ]
+    assert post_records(records) == [201] * 8
+
+
+@pytest.mark.skipif(not connection.features.has_select_for_update,
+                    reason='Reads outside the lock fail on shared in-memory '
+                           'SQLite databases instead of waiting')
+def test_lock_concurrent_end_records(transactional_db):
+    post_records([start_record(42, '99988526423', '9933468278',
+                               '2018-09-25T08:00:00Z')])
+    # End records in other months are stored in other partitions
+    records = [
+        {'type': Record.END, 'call_id': 42,
+         'timestamp': f'2018-{month}-25T08:00:00Z'}
+        for month in range(10, 13)
+    ]
+    statuses = post_records(records + records[:1])
+    assert statuses.count(201) == 1
+    assert not any(status >= 500 for status in statuses)
+    assert Record.objects.filter(call_id=42, type=Record.END).count() == 1
+    assert Bill.objects.filter(call_id=42).count() == 1
+
+
+@pytest.mark.skipif(connection.vendor != 'sqlite',
+                    reason='Lines are locked by write_lock on SQLite only')
+def test_lock_concurrent_start_records_on_file_database(file_database):
+    for round in range(5):
+        # Every call is placed from the same source at the same time
+        source = f'9998852{round:04d}'
+        records = [
+            start_record(round * 100 + worker, source,
+                         f'119876{round}{worker:04d}', '2018-09-25T08:00:00Z')
+            for worker in range(8)
+        ]
+        statuses = post_records(records, file_database)
+        assert sorted(statuses) == [201] + [400] * 7
+        with default_database(file_database):
+            assert list(Record.objects.filter(source=source).values_list(
+                'call_id', flat=True
+            )) == [records[statuses.index(201)]['call_id']]
+
+    # Starts of the same call on other lines are answered as existing
+    records = [
+        start_record(1000, f'2198765{worker:04d}', f'3198765{worker:04d}',
+                     '2018-09-25T09:00:00Z')
+        for worker in range(4)
+    ]
+    assert sorted(post_records(records, file_database)) == [201] + [400] * 3
+    with default_database(file_database):
+        assert Call.objects.filter(id=1000).count() == 1
+
+
+@pytest.mark.skipif(not connection.features.has_select_for_update,
+                    reason='Lines are locked by row locks on PostgreSQL')
+def test_lock_other_phones_in_parallel(transactional_db):
+    locked, release = threading.Event(), threading.Event()
+
+    def hold_lock():
+        try:
+            with LineState.objects.lock('99988526423'):
+                locked.set()
+                release.wait(10)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=hold_lock)
+    thread.start()
+    try:
+        assert locked.wait(10)
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL lock_timeout = '1s'")
+            with LineState.objects.lock('9933468278'):
+                pass
+        with pytest.raises(OperationalError):
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL lock_timeout = '100ms'")
+                with LineState.objects.lock('99988526423'):
+                    pass
+    finally:
+        release.set()
+        thread.join()
+
+
+@pytest.mark.skipif(connection.features.has_select_for_update,
+                    reason='Lines are locked by write_lock without row locks')
+def test_lock_without_row_locks_takes_write_lock(transactional_db):
+    with LineState.objects.lock('99988526423'):
+        acquired = []
+        thread = threading.Thread(
+            target=lambda: acquired.append(write_lock.acquire(timeout=0.1))
+        )
+        thread.start()
+        thread.join()
+        assert acquired == [False]
+    assert write_lock.acquire(timeout=0.1)
+    write_lock.release()
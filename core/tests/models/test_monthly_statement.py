@@ -0,0 +1,99 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.db.models import F
+
+from core.models import Bill, MonthlyStatement, Record
+
+
+def edit_end_record(call_id, delta):
+    """
+    Moves the end record of a call, as edited from the admin
+    """
+    Record.objects.filter(call_id=call_id, type=Record.END).update(
+        timestamp=F('timestamp') + delta
+    )
+
+
+def make_two_calls(make_call_record):
+    make_call_record(
+        id='42',
+        start_timestamp='2018-02-28T21:57:13Z',
+        end_timestamp='2018-03-01T22:10:56Z'
+    )
+    make_call_record(
+        id='43',
+        start_timestamp='2018-03-12T04:57:13Z',
+        end_timestamp='2018-03-12T06:10:56Z'
+    )
+
+
+def test_statement_totals(make_call_record):
+    make_two_calls(make_call_record)
+    statement = MonthlyStatement.objects.get(source='99988526423', year=2018,
+                                             month=3)
+    bills = Bill.objects.get_bills(source='99988526423', m=3, y=2018)
+    assert statement.call_count == 2
+    assert statement.total_duration == sum(b.total_seconds for b in bills)
+    assert statement.total_price == sum(b.price for b in bills)
+    assert statement.duration == '25h27m26s'
+    assert str(statement) == '99988526423 - 03/2018'
+
+
+def test_statement_bill_deleted(make_call_record):
+    make_two_calls(make_call_record)
+    Bill.objects.get(call_id=43).delete()
+    statement = MonthlyStatement.objects.get(source='99988526423', year=2018,
+                                             month=3)
+    bill = Bill.objects.get(call_id=42)
+    assert statement.call_count == 1
+    assert statement.total_price == bill.price
+
+
+def test_statement_bill_saved_again(make_call_record):
+    make_two_calls(make_call_record)
+    edit_end_record(43, timedelta(hours=1))
+    bill = Bill.objects.get(call_id=43)
+    bill.save()
+    statement = MonthlyStatement.objects.get(source='99988526423', year=2018,
+                                             month=3)
+    totals = Bill.objects.get_bills(source='99988526423', m=3,
+                                    y=2018).totals()
+    assert statement.call_count == totals['total_calls'] == 2
+    assert statement.total_duration == \
+        totals['total_duration'].total_seconds()
+    assert statement.total_price == totals['total_price']
+
+
+def test_statement_bill_moved_to_other_period(make_call_record):
+    make_two_calls(make_call_record)
+    edit_end_record(43, timedelta(days=20))
+    bill = Bill.objects.get(call_id=43)
+    bill.save()
+    march, april = MonthlyStatement.objects.filter(
+        source='99988526423', year=2018
+    ).order_by('month')
+    assert (march.month, march.call_count) == (3, 1)
+    assert march.total_price == Bill.objects.get(call_id=42).price
+    assert (april.month, april.call_count) == (4, 1)
+    assert april.total_price == bill.price
+
+
+def test_rebuild_statements(make_call_record):
+    make_two_calls(make_call_record)
+    MonthlyStatement.objects.update(call_count=0, total_price=Decimal(0))
+    call_command('rebuild_statements', '--chunk-size=1')
+    statement = MonthlyStatement.objects.get(source='99988526423', year=2018,
+                                             month=3)
+    assert statement.call_count == 2
+    assert statement.total_price == sum(b.price for b in Bill.objects.all())
+
+
+def test_rebuild_statements_period(make_call_record):
+    make_two_calls(make_call_record)
+    MonthlyStatement.objects.update(call_count=0)
+    call_command('rebuild_statements', '--period=02/2018')
+    statement = MonthlyStatement.objects.get(source='99988526423', year=2018,
+                                             month=3)
+    assert statement.call_count == 0
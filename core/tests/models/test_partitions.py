@@ -0,0 +1,96 @@
+import time
+
+import pytest
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+
+from core import partitions
+from core.models import Bill, Record
+
+
+def test_months_across_years():
+    assert list(partitions.months((11, 2018), (2, 2019))) == [
+        (11, 2018), (12, 2018), (1, 2019), (2, 2019)
+    ]
+
+
+def test_partition_name():
+    assert partitions.partition_name('core_bill', 3, 2019) == \
+        'core_bill_p2019_03'
+
+
+@pytest.mark.skipif(connection.vendor != 'sqlite',
+                    reason='SQLite tables are never partitioned')
+def test_disabled_on_sqlite(settings):
+    settings.PARTITIONED_STORAGE = True
+    assert not partitions.is_enabled()
+    assert partitions.create_partitions() == []
+
+
+def test_create_partitions_disabled(settings, capsys):
+    settings.PARTITIONED_STORAGE = False
+    call_command('create_partitions')
+    assert 'not enabled' in capsys.readouterr().out
+
+
+@pytest.mark.skipif(not partitions.is_enabled(),
+                    reason='Partitioned storage is enabled on PostgreSQL only')
+def test_bill_period_reads_one_partition(make_call_record):
+    make_call_record(
+        start_timestamp='2018-08-25T08:28:00Z',
+        end_timestamp='2018-08-25T08:30:00Z'
+    )
+    with connection.cursor() as cursor:
+        partitions.create_partition(cursor, 'core_bill', 'end', 9, 2018)
+        assert partitions.is_partitioned(cursor, 'core_bill')
+        assert partitions.is_partitioned(cursor, 'core_record')
+    plan = Bill.objects.get_bills(source='99988526423', m=8, y=2018).explain()
+    assert 'core_bill_p2018_08' in plan or 'core_bill_default' in plan
+    assert 'core_bill_p2018_09' not in plan
+
+
+@pytest.mark.skipif(not partitions.is_enabled(),
+                    reason='Partitioned storage is enabled on PostgreSQL only')
+def test_partitions_keep_unique_indexes(make_call_record):
+    call = make_call_record(
+        start_timestamp='2018-08-25T08:28:00Z',
+        end_timestamp='2018-08-25T08:30:00Z'
+    )
+    with connection.cursor() as cursor:
+        partitions.create_partition(cursor, 'core_record', 'timestamp', 10,
+                                    2018)
+        for table, unique_columns in partitions.UNIQUE_COLUMNS.items():
+            for partition in partitions.partitions_of(cursor, table):
+                cursor.execute('SELECT indexdef FROM pg_indexes '
+                               'WHERE tablename = %s', [partition])
+                definitions = [row[0] for row in cursor.fetchall()]
+                for columns in unique_columns:
+                    assert any(
+                        d.startswith('CREATE UNIQUE INDEX') and
+                        d.endswith(f'({", ".join(columns)})')
+                        for d in definitions
+                    )
+    record = Record.objects.get(call=call, type=Record.END)
+    with pytest.raises(IntegrityError), transaction.atomic():
+        Record.objects.bulk_create([Record(
+            call=call, type=Record.END, timestamp=record.timestamp,
+            source=record.source, destination=record.destination
+        )])
+
+
+def test_create_partitions_every_interval(monkeypatch, capsys):
+    monkeypatch.setattr(partitions, 'is_enabled', lambda: True)
+    monkeypatch.setattr(partitions, 'create_partitions',
+                        lambda months_ahead: ['core_bill_p2019_03'])
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 2:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(time, 'sleep', sleep)
+    with pytest.raises(KeyboardInterrupt):
+        call_command('create_partitions', '--interval', '60')
+    assert sleeps == [60, 60]
+    assert capsys.readouterr().out.count('Created core_bill_p2019_03') == 2
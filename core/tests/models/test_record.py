@@ -1,7 +1,10 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework.exceptions import ValidationError as DRFValidationError
 
-from core.models import Record
+from core.models import Bill, Record, RecordContext
 
 
 def test_start_record_creation(make_call):
@@ -23,6 +26,12 @@ def test_end_record_creation(make_start_record):
     assert isinstance(record, Record)
 
 
+def test_record_stores_call_phones(make_start_record):
+    record = make_start_record(source='99988526423', destination='9933468278')
+    assert record.source == '99988526423'
+    assert record.destination == '9933468278'
+
+
 def test_record_str(make_start_record):
     record = make_start_record()
     assert record.__str__() == (f'{record.call}, {record.type}, '
@@ -224,4 +233,46 @@ def test_end_record_overlap_for_source(make_call_record):
         )
     error_msg = ('Cannot end this call overlapping another call record with '
                  'the same source')
-    assert error_msg in str(excinfo)
\ No newline at end of file
+    assert error_msg in str(excinfo)
+
+def test_record_context_shared_with_bill(make_start_record):
+    start_record = make_start_record('2016-02-29T12:00:00Z')
+    record = Record(
+        call=start_record.call,
+        type=Record.END,
+        timestamp=timezone.datetime(2016, 2, 29, 12, 2, tzinfo=timezone.utc)
+    )
+    context = RecordContext(record, {Record.START: start_record.timestamp})
+    with CaptureQueriesContext(connection) as queries:
+        record.save(clean=False, context=context)
+
+    # Neither the call nor its records are read by validations or the bill
+    reads = [q['sql'] for q in queries.captured_queries
+             if q['sql'].startswith('SELECT')]
+    lines = [sql for sql in reads if sql.startswith('SELECT "core_linestate"')]
+    assert len(lines) == 1
+    assert not [sql for sql in reads if sql not in lines and
+                ('FROM "core_record"' in sql or 'FROM "core_call"' in sql)]
+    bill = Bill.objects.get(call=record.call)
+    assert (bill.start, bill.end) == (start_record.timestamp,
+                                      record.timestamp)
+
+
+def test_record_context_neighbours(make_call_record, make_call):
+    make_call_record(start_timestamp='2018-09-25T08:00:00Z',
+                     end_timestamp='2018-09-25T09:00:00Z')
+    record = Record(
+        call=make_call(id=43, source='99988526423',
+                       destination='11987665433'),
+        type=Record.START,
+        timestamp=timezone.datetime(2018, 9, 25, 9, tzinfo=timezone.utc)
+    )
+    record.source, record.destination = '99988526423', '11987665433'
+    context = RecordContext(record)
+    assert context.records == {}
+    assert context.type_less_than('source') == Record.START
+    assert context.type_greater_than('source') == Record.END
+    assert context.has_timestamp('source')
+    assert not context.has_timestamp('destination')
+    assert context.type_less_than('destination') is None
+    assert context.open_call_id('source') is None
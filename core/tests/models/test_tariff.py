@@ -0,0 +1,82 @@
+from decimal import Decimal
+
+import pytest
+from django.utils.dateparse import parse_datetime
+
+from core import tariffs
+from core.models import Bill, Tariff, TariffVersion
+
+
+@pytest.fixture()
+def make_tariff():
+    def _make_tariff(effective_from, std_minute_charge='0.10'):
+        return Tariff.objects.create(
+            effective_from=effective_from,
+            std_hour_start=6,
+            std_hour_end=22,
+            std_standing_charge='0.50',
+            std_minute_charge=std_minute_charge,
+            rdc_standing_charge='0.40',
+            rdc_minute_charge='0.01'
+        )
+
+    return _make_tariff
+
+
+def test_default_tariff_from_settings(settings):
+    settings.STD_MINUTE_CHARGE = 0.09
+    tariff = tariffs.for_time(parse_datetime('2018-01-01T10:00:00Z'))
+    assert tariff.std_minute_charge == Decimal('0.09')
+
+
+def test_tariff_selected_by_start_time(make_tariff):
+    make_tariff('2018-03-01T00:00:00Z', std_minute_charge='0.10')
+    make_tariff('2018-06-01T00:00:00Z', std_minute_charge='0.12')
+    charge = [
+        tariffs.for_time(parse_datetime(timestamp)).std_minute_charge
+        for timestamp in ('2018-02-28T23:59:59Z', '2018-03-01T00:00:00Z',
+                          '2018-05-31T10:00:00Z', '2018-07-01T10:00:00Z')
+    ]
+    assert charge == [Decimal('0.09'), Decimal('0.10'), Decimal('0.10'),
+                      Decimal('0.12')]
+
+
+def test_bill_priced_with_tariff(make_tariff, make_call_record):
+    make_tariff('2018-03-01T00:00:00Z')
+    call = make_call_record(
+        start_timestamp='2018-03-05T10:00:00Z',
+        end_timestamp='2018-03-05T10:05:00Z'
+    )
+    assert Bill.objects.get(call=call).price == Decimal('1.00')
+
+
+def test_tariffs_cached_in_process(make_tariff, django_assert_num_queries):
+    make_tariff('2018-03-01T00:00:00Z')
+    start = parse_datetime('2018-03-05T10:00:00Z')
+    tariffs.for_time(start)
+    with django_assert_num_queries(0):
+        tariffs.for_time(start)
+
+
+def test_tariffs_reloaded_on_version_change(settings, make_tariff):
+    settings.TARIFF_VERSION_CHECK_INTERVAL = 0
+    start = parse_datetime('2018-03-05T10:00:00Z')
+    tariffs.for_time(start)
+    Tariff.objects.bulk_create([Tariff(
+        effective_from=parse_datetime('2018-03-01T00:00:00Z'),
+        std_hour_start=6, std_hour_end=22, std_standing_charge='0.50',
+        std_minute_charge='0.20', rdc_standing_charge='0.40',
+        rdc_minute_charge='0.01'
+    )])
+    assert tariffs.for_time(start).std_minute_charge == Decimal('0.09')
+    # As done by another process changing a tariff
+    TariffVersion.objects.bump()
+    assert tariffs.for_time(start).std_minute_charge == Decimal('0.20')
+
+
+def test_tariff_change_bumps_version(make_tariff):
+    assert TariffVersion.objects.current() == 0
+    tariff = make_tariff('2018-03-01T00:00:00Z')
+    assert TariffVersion.objects.current() == 1
+    tariff.delete()
+    assert TariffVersion.objects.current() == 2
@@ -0,0 +1,101 @@
+import sys
+import timeit
+from datetime import datetime, time, timedelta
+
+from hypothesis import given, strategies as st
+
+from core import pricing
+from core.pricing import standard_minutes
+
+
+def loop_standard_minutes(start, total_minutes, std_hour_start,
+                          std_hour_end):
+    """
+    Reference per-minute implementation of the standard minutes rule
+    """
+    record_start = start.replace(second=0, microsecond=0)
+    std_start = time(hour=std_hour_start)
+    std_end = time(hour=std_hour_end)
+
+    minutes = 0
+    for minute in range(total_minutes):
+        cond_1 = std_start <= record_start.time() < std_end
+        # excluding end_limit
+        cond_2 = (record_start + timedelta(minutes=1)).time() < std_end
+        if all([cond_1, cond_2]):
+            minutes += 1
+        record_start += timedelta(minutes=1)
+    return minutes
+
+
+@given(
+    start=st.datetimes(min_value=datetime(2000, 1, 1),
+                       max_value=datetime(2030, 12, 31)),
+    total_minutes=st.integers(min_value=0, max_value=5 * 24 * 60),
+    std_hour_start=st.integers(min_value=0, max_value=23),
+    std_hour_end=st.integers(min_value=0, max_value=23)
+)
+def test_equivalent_to_per_minute_loop(start, total_minutes, std_hour_start,
+                                       std_hour_end):
+    args = (start, total_minutes, std_hour_start, std_hour_end)
+    assert standard_minutes(*args) == loop_standard_minutes(*args)
+
+
+def test_excludes_minute_before_end_limit():
+    start = datetime(2017, 12, 12, 21, 57, 13)
+    assert standard_minutes(start, 6, 6, 22) == 2
+
+
+def test_multiple_days():
+    start = datetime(2018, 2, 28, 21, 57, 13)
+    assert standard_minutes(start, 1453, 6, 22) == 961
+
+
+def count_steps(function, *args):
+    """
+    Returns the number of lines of core.pricing run by a call
+    """
+    steps = 0
+
+    def trace(frame, event, arg):
+        nonlocal steps
+        if frame.f_code.co_filename == pricing.__file__:
+            if event == 'line':
+                steps += 1
+            return trace
+        return None
+
+    previous = sys.gettrace()
+    sys.settrace(trace)
+    try:
+        function(*args)
+    finally:
+        sys.settrace(previous)
+    return steps
+
+
+def test_constant_time():
+    """
+    A multi-year call runs the same steps as a short one
+    """
+    start = datetime(2018, 2, 28, 21, 57, 13)
+    short = count_steps(standard_minutes, start, 10, 6, 22)
+    long = count_steps(standard_minutes, start, 3 * 365 * 24 * 60, 6, 22)
+    assert 0 < short == long
+
+
+def test_benchmark(record_property):
+    """
+    Times the closed form against the per-minute loop for a ten-day call.
+    Timings are recorded as test properties, written by ``--junitxml``,
+    and never asserted; bills priced per second are measured by the
+    ``pricing`` section of ``manage.py benchmark``.
+    """
+    args = (datetime(2018, 2, 28, 21, 57, 13), 10 * 24 * 60, 6, 22)
+    closed_form = min(timeit.repeat(lambda: standard_minutes(*args),
+                                    number=1000, repeat=3)) / 1000
+    loop = min(timeit.repeat(lambda: loop_standard_minutes(*args),
+                             number=1, repeat=3))
+    record_property('standard_minutes_seconds', closed_form)
+    record_property('loop_standard_minutes_seconds', loop)
+    assert standard_minutes(*args) == loop_standard_minutes(*args)
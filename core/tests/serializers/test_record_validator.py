@@ -0,0 +1,159 @@
+import pytest
+from django.db import connection
+from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
+from hypothesis import given, strategies as st
+
+from core.models import Call, Record
+from core.serializers import EndRecordSerializer, StartRecordSerializer
+from core.validation import RecordValidator
+
+
+def start_data(**fields):
+    data = {
+        'type': Record.START,
+        'call_id': 70,
+        'timestamp': '2018-09-25T08:20:00Z',
+        'source': '99988526423',
+        'destination': '9933468278'
+    }
+    data.update(fields)
+    return {key: value for key, value in data.items() if value is not ...}
+
+
+def end_data(**fields):
+    data = {
+        'type': Record.END,
+        'call_id': 42,
+        'timestamp': '2018-09-25T08:28:00Z'
+    }
+    data.update(fields)
+    return {key: value for key, value in data.items() if value is not ...}
+
+
+def assert_equivalent(data):
+    """
+    Checks the validator answers a record as the serializer chosen by
+    RecordCreate does
+    """
+    if isinstance(data, dict) and data.get('type') == Record.START:
+        serializer = StartRecordSerializer(data=data)
+    else:
+        serializer = EndRecordSerializer(data=data)
+    validator = RecordValidator(data)
+
+    assert validator.is_valid() == serializer.is_valid()
+    assert validator.errors == serializer.errors
+    if not validator.errors:
+        assert validator.validated_data == dict(serializer.validated_data)
+        assert validator.data == serializer.to_representation(
+            serializer.validated_data)
+
+
+@pytest.mark.parametrize('data', [
+    start_data(),
+    start_data(call_id=...),
+    start_data(call_id=None),
+    start_data(call_id=''),
+    start_data(call_id='70.0'),
+    start_data(call_id='7a'),
+    start_data(call_id=True),
+    start_data(call_id='9' * 1001),
+    start_data(source=...),
+    start_data(source=None),
+    start_data(source=''),
+    start_data(source='   '),
+    start_data(source=' 99988526423 '),
+    start_data(source=99988526423),
+    start_data(source=['99988526423']),
+    start_data(source=False),
+    start_data(source='1199'),
+    start_data(source='9998852642a'),
+    start_data(source='9998852642\x00'),
+    start_data(source='999885264234'),
+    start_data(destination='99988526423'),
+    start_data(timestamp=...),
+    start_data(timestamp=None),
+    start_data(timestamp=''),
+    start_data(timestamp=1537863600),
+    start_data(timestamp='2018-09-25'),
+    start_data(timestamp='2018-13-25T08:20:00Z'),
+    start_data(timestamp='2018-09-25T08:20:00'),
+    start_data(timestamp='2018-09-25T05:20:00.123456-03:00'),
+    start_data(call_id=..., source='1199', timestamp='now'),
+    end_data(),
+    end_data(type=...),
+    end_data(type=None),
+    end_data(type=''),
+    end_data(type='stop'),
+    end_data(type=1),
+    end_data(call_id=43),
+    end_data(call_id=-1),
+    end_data(call_id='42'),
+    end_data(timestamp='yesterday'),
+    end_data(source='1199'),
+    {},
+    ['start'],
+])
+def test_validator_equivalent_to_serializers(make_start_record, data):
+    make_start_record('2018-09-25T08:00:00Z')
+    assert_equivalent(data)
+
+
+def test_validator_equivalent_existing_records(make_call_record):
+    make_call_record(start_timestamp='2018-09-25T08:00:00Z',
+                     end_timestamp='2018-09-25T08:10:00Z')
+    assert_equivalent(start_data(call_id=42))
+    assert_equivalent(end_data())
+    assert_equivalent(end_data(type=...))
+
+
+@given(
+    call_id=st.one_of(st.integers(-2 ** 31, 2 ** 31 - 1), st.text(max_size=5),
+                      st.none()),
+    type=st.sampled_from([Record.START, Record.END, 'other', None]),
+    timestamp=st.one_of(
+        st.datetimes().map(lambda d: d.isoformat()),
+        st.text(max_size=20)
+    ),
+    source=st.one_of(st.from_regex(r'^[1-9]{2}9?[0-9]{8}$', fullmatch=True),
+                     st.text(max_size=12)),
+    destination=st.sampled_from(['9933468278', '99988526423', '0123'])
+)
+def test_validator_equivalent_fields(call_id, type, timestamp, source,
+                                     destination):
+    assert_equivalent({
+        'type': type,
+        'call_id': call_id,
+        'timestamp': timestamp,
+        'source': source,
+        'destination': destination
+    })
+
+
+def test_validator_form_data():
+    data = QueryDict(mutable=True)
+    data.update({'type': '', 'call_id': '42',
+                 'timestamp': '2018-09-25T08:28:00Z'})
+    serializer = EndRecordSerializer(data=data)
+    validator = RecordValidator(data)
+    assert validator.is_valid() == serializer.is_valid()
+    assert validator.errors == serializer.errors
+
+
+def test_validator_save(django_assert_num_queries):
+    validator = RecordValidator(start_data())
+    with django_assert_num_queries(1):
+        assert validator.is_valid()
+    validator.save()
+    assert Record.objects.get(call_id=70).source == '99988526423'
+
+    validator = RecordValidator(end_data(call_id=70))
+    with django_assert_num_queries(1):
+        assert validator.is_valid()
+    with CaptureQueriesContext(connection) as context:
+        validator.save()
+    # The call is neither read again nor checked by clean_fields
+    assert not any(q['sql'].startswith('SELECT (1) AS "a" FROM "core_call"')
+                   for q in context.captured_queries)
+    assert Call.objects.get(id=70).bill.price is not None
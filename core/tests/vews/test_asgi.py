@@ -0,0 +1,210 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from django.core.wsgi import get_wsgi_application
+
+from core.asgi import AsgiHandler, wsgi_environ
+from core.models import Record
+
+
+@pytest.fixture()
+def make_handler():
+    handlers = []
+
+    def _make_handler(application=None, **options):
+        handler = AsgiHandler(application or get_wsgi_application(),
+                              **options)
+        handlers.append(handler)
+        return handler
+
+    yield _make_handler
+    for handler in handlers:
+        handler.executor.shutdown()
+
+
+def http_scope(method='GET', path='/', query_string=b'', headers=()):
+    return {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query_string,
+        'headers': [(b'host', b'testserver'), *headers],
+        'server': ('testserver', 80)
+    }
+
+
+async def call(handler, scope, body=b'', delay=0):
+    """
+    Sends a request to the handler as a client taking delay seconds to send
+    its body in two parts, and returns the messages sent back
+    """
+    parts = [body[:len(body) // 2], body[len(body) // 2:]]
+    messages = []
+
+    async def receive():
+        await asyncio.sleep(delay / 2)
+        part = parts.pop(0)
+        return {'type': 'http.request', 'body': part, 'more_body': bool(parts)}
+
+    async def send(message):
+        messages.append(message)
+
+    await handler(scope, receive, send)
+    return messages
+
+
+def simple_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [environ['wsgi.input'].read()]
+
+
+def test_wsgi_environ():
+    environ = wsgi_environ(http_scope(
+        method='POST',
+        path='/bills/99988526423',
+        query_string=b'reference=08/2018',
+        headers=[(b'content-type', b'application/json'),
+                 (b'content-length', b'2'),
+                 (b'x-forwarded-for', b'10.0.0.1'),
+                 (b'x-forwarded-for', b'10.0.0.2')]
+    ), b'{}')
+    assert environ['REQUEST_METHOD'] == 'POST'
+    assert environ['PATH_INFO'] == '/bills/99988526423'
+    assert environ['QUERY_STRING'] == 'reference=08/2018'
+    assert environ['CONTENT_TYPE'] == 'application/json'
+    assert environ['CONTENT_LENGTH'] == '2'
+    assert environ['HTTP_HOST'] == 'testserver'
+    assert environ['HTTP_X_FORWARDED_FOR'] == '10.0.0.1,10.0.0.2'
+    assert environ['SERVER_NAME'] == 'testserver'
+    assert environ['wsgi.input'].read() == b'{}'
+
+
+def test_handler_body(make_handler):
+    handler = make_handler(simple_app, threads=1)
+    messages = asyncio.run(call(handler, http_scope(method='POST'), b'abcd'))
+    assert messages[0] == {
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'text/plain')]
+    }
+    assert b''.join(m['body'] for m in messages[1:]) == b'abcd'
+    assert not messages[-1].get('more_body')
+
+
+def test_handler_body_too_large(make_handler):
+    handler = make_handler(simple_app, threads=1, max_body_size=3)
+    messages = asyncio.run(call(handler, http_scope(method='POST'), b'abcd'))
+    assert messages[0]['status'] == 413
+
+
+def test_handler_client_disconnected(make_handler):
+    handler = make_handler(simple_app, threads=1)
+
+    async def receive():
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        raise AssertionError('Nothing is sent to a disconnected client')
+
+    asyncio.run(handler(http_scope(), receive, send))
+
+
+def test_handler_application_error(make_handler):
+    def failing_app(environ, start_response):
+        raise RuntimeError('Failed')
+
+    handler = make_handler(failing_app, threads=1)
+    with pytest.raises(RuntimeError):
+        asyncio.run(call(handler, http_scope()))
+
+
+def test_handler_slow_clients_do_not_hold_threads(make_handler):
+    handler = make_handler(simple_app, threads=1)
+
+    async def clients():
+        return await asyncio.gather(*(
+            call(handler, http_scope(), b'abcd', delay=0.2)
+            for _ in range(20)
+        ))
+
+    started = time.perf_counter()
+    responses = asyncio.run(clients())
+    # A thread per request would take 20 * 0.2 seconds
+    assert time.perf_counter() - started < 2
+    assert all(messages[0]['status'] == 200 for messages in responses)
+
+
+def test_handler_stops_streaming_to_gone_client(make_handler):
+    closed = threading.Event()
+
+    class Chunks:
+        def __iter__(self):
+            while True:
+                yield b'chunk'
+
+        def close(self):
+            closed.set()
+
+    def streaming_app(environ, start_response):
+        start_response('200 OK', [])
+        return Chunks()
+
+    handler = make_handler(streaming_app, threads=1, buffer=2)
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        sent.append(message)
+        if len(sent) == 5:
+            raise OSError('Connection reset')
+
+    with pytest.raises(OSError):
+        asyncio.run(handler(http_scope(), receive, send))
+    assert closed.wait(1)
+    # The thread is free again
+    assert asyncio.run(call(make_handler(simple_app, threads=1),
+                            http_scope()))[0]['status'] == 200
+    assert handler.executor.submit(lambda: True).result(timeout=1)
+
+
+def test_handler_lifespan(make_handler):
+    handler = make_handler(simple_app, threads=1)
+    messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message['type'])
+
+    asyncio.run(handler({'type': 'lifespan'}, receive, send))
+    assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+
+
+def test_handler_records_and_bills(make_handler, transactional_db):
+    handler = make_handler(threads=2)
+    headers = [(b'content-type', b'application/json')]
+    for record in [
+        {'type': 'start', 'call_id': 42, 'timestamp': '2018-08-25T08:28:00Z',
+         'source': '99988526423', 'destination': '9933468278'},
+        {'type': 'end', 'call_id': 42, 'timestamp': '2018-08-25T08:30:00Z'}
+    ]:
+        messages = asyncio.run(call(
+            handler, http_scope('POST', '/records', headers=headers),
+            json.dumps(record).encode()
+        ))
+        assert messages[0]['status'] == 201
+    assert Record.objects.count() == 2
+
+    messages = asyncio.run(call(handler, http_scope(
+        path='/bills/99988526423', query_string=b'reference=08/2018'
+    )))
+    assert messages[0]['status'] == 200
+    data = json.loads(b''.join(m['body'] for m in messages[1:]))
+    assert data['total_calls'] == 1
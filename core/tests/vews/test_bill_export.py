@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+
+
+def make_calls(make_call_record):
+    make_call_record(
+        id='42',
+        source='99988526423',
+        start_timestamp='2018-08-25T08:28:00Z',
+        end_timestamp='2018-08-25T08:30:00Z'
+    )
+    make_call_record(
+        id='43',
+        source='11987665433',
+        start_timestamp='2018-08-26T08:28:00Z',
+        end_timestamp='2018-08-26T09:28:10Z'
+    )
+    make_call_record(
+        id='44',
+        source='11987665433',
+        start_timestamp='2018-09-26T08:28:00Z',
+        end_timestamp='2018-09-26T09:28:10Z'
+    )
+
+
+def test_export_csv(client, make_call_record):
+    make_calls(make_call_record)
+    response = client.get('/bills/export?reference=08/2018')
+    assert response.status_code == 200
+    assert response.streaming
+    assert response['Content-Type'] == 'text/csv'
+    assert 'bills-2018-08.csv' in response['Content-Disposition']
+
+    content = b''.join(response.streaming_content).decode()
+    rows = sorted(csv.DictReader(io.StringIO(content)),
+                  key=lambda row: row['call_id'])
+    assert [row['call_id'] for row in rows] == ['42', '43']
+    assert rows[1] == {
+        'call_id': '43',
+        'source': '11987665433',
+        'destination': '9933468278',
+        'start': '2018-08-26T08:28:00+00:00',
+        'end': '2018-08-26T09:28:10+00:00',
+        'duration': '3610',
+        'price': '5.76'
+    }
+
+
+def test_export_ndjson(client, make_call_record):
+    make_calls(make_call_record)
+    response = client.get('/bills/export?reference=08/2018&output=ndjson')
+    assert response['Content-Type'] == 'application/x-ndjson'
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    rows = [json.loads(line) for line in lines]
+    assert sorted(row['call_id'] for row in rows) == [42, 43]
+
+
+def test_export_invalid_output(client):
+    response = client.get('/bills/export?reference=08/2018&output=xml')
+    assert response.status_code == 400
+
+
+def test_export_open_period(client):
+    response = client.get('/bills/export?reference=08/2098')
+    assert response.status_code == 400
@@ -1,3 +1,14 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+
+from core import cache
+from core.models import Bill, Record
+
+
 def test_get_bill_call_record_success(client, make_call_record):
     make_call_record()
     subscriber = '99988526423'
@@ -17,6 +28,116 @@ def test_get_bill_valid_reference_period(client, make_call_record):
     assert response.status_code == 200
 
 
+def test_get_bill_totals_from_statement(client, make_call_record):
+    make_call_record(
+        start_timestamp='2018-08-25T08:28:00Z',
+        end_timestamp='2018-08-25T08:30:00Z'
+    )
+    subscriber = '99988526423'
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(f'/bills/{subscriber}?reference=08/2018')
+    assert 'statement' not in response.data
+    assert response.data['total_calls'] == 1
+    assert response.data['total_duration'] == '0h2m0s'
+    assert response.data['total_price'] == 'R$ 0,54'
+    # The bills of the period are not aggregated
+    assert not any('SUM(' in q['sql'] for q in queries.captured_queries)
+
+
+def test_get_bill_cached(client, make_call_record,
+                         django_assert_num_queries):
+    make_call_record(
+        start_timestamp='2018-08-25T08:28:00Z',
+        end_timestamp='2018-08-25T08:30:00Z'
+    )
+    url = '/bills/99988526423?reference=08/2018'
+    response = client.get(url)
+    with django_assert_num_queries(0):
+        cached = client.get(url)
+    assert cached.status_code == 200
+    assert cached.data == response.data
+    assert cached['ETag'] == response['ETag']
+    assert cached['Last-Modified'] == response['Last-Modified']
+
+
+def test_get_bill_not_modified(client, make_call_record,
+                               django_assert_num_queries):
+    make_call_record(
+        start_timestamp='2018-08-25T08:28:00Z',
+        end_timestamp='2018-08-25T08:30:00Z'
+    )
+    url = '/bills/99988526423?reference=08/2018'
+    etag = client.get(url)['ETag']
+    with django_assert_num_queries(0):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response['ETag'] == etag
+
+    last_modified = client.get(url)['Last-Modified']
+    response = client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+    assert response.status_code == 304
+
+
+def test_get_bill_cache_invalidated_by_late_bill(client, transactional_db,
+                                                 make_call_record):
+    make_call_record(
+        id='42',
+        start_timestamp='2018-08-25T08:28:00Z',
+        end_timestamp='2018-08-25T08:30:00Z'
+    )
+    url = '/bills/99988526423?reference=08/2018'
+    etag = client.get(url)['ETag']
+    make_call_record(
+        id='43',
+        start_timestamp='2018-08-26T08:28:00Z',
+        end_timestamp='2018-08-26T08:30:00Z'
+    )
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+    assert len(response.data['bill_call_records']) == 2
+
+
+def test_get_bill_cache_keyed_by_statement_generation(client,
+                                                      transactional_db,
+                                                      make_call_record):
+    make_call_record(
+        start_timestamp='2018-08-25T08:28:00Z',
+        end_timestamp='2018-08-25T08:30:00Z'
+    )
+    url = '/bills/99988526423?reference=08/2018'
+    etag = client.get(url)['ETag']
+    Record.objects.filter(call_id=42, type=Record.END).update(
+        timestamp=F('timestamp') + timedelta(minutes=10)
+    )
+    Bill.objects.get(call_id=42).save()
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+    assert response.data['total_duration'] == '0h12m0s'
+
+
+def test_get_bill_generation_read_once_expired(client, make_call_record):
+    make_call_record(
+        start_timestamp='2018-08-25T08:28:00Z',
+        end_timestamp='2018-08-25T08:30:00Z'
+    )
+    url = '/bills/99988526423?reference=08/2018'
+    etag = client.get(url)['ETag']
+    # As committed by another process, whose cache is not this one
+    Record.objects.filter(call_id=42, type=Record.END).update(
+        timestamp=F('timestamp') + timedelta(minutes=10)
+    )
+    Bill.objects.get(call_id=42).save()
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    cache.bills_cache().delete(cache.generation_key('99988526423', 8, 2018))
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+    assert response.data['total_duration'] == '0h12m0s'
+
+
 def test_invalid_reference_period_date(client, make_call_record):
     subscriber = '99988526423'
     reference = '08/2098'
@@ -37,3 +158,118 @@ def test_invalid_reference_period_format(client, make_call_record):
                  b'where MM is the month and YYYY is the year."}')
     assert response.status_code == 400
     assert error_msg == response.content
+
+
+def make_month_of_calls(make_call_record, count):
+    for day in range(1, count + 1):
+        make_call_record(
+            id=str(100 + day),
+            start_timestamp=f'2018-08-{day:02d}T08:28:00Z',
+            end_timestamp=f'2018-08-{day:02d}T08:30:00Z'
+        )
+
+
+def test_get_bill_pages(client, make_call_record):
+    make_month_of_calls(make_call_record, 5)
+    url = '/bills/99988526423?reference=08/2018&page_size=2'
+    days = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        days += [b['call_start_date'].day
+                 for b in response.data['bill_call_records']]
+        url = response.data['next']
+    assert days == [1, 2, 3, 4, 5]
+
+
+def test_get_bill_last_page(client, make_call_record):
+    make_month_of_calls(make_call_record, 2)
+    response = client.get('/bills/99988526423?reference=08/2018&page_size=2')
+    assert len(response.data['bill_call_records']) == 2
+    assert response.data['next'] is None
+
+
+def test_get_bill_next_page_of_each_request(client, make_call_record):
+    make_month_of_calls(make_call_record, 2)
+    url = '/bills/99988526423?reference=08/2018&page_size=1'
+    first = client.get(url, HTTP_HOST='a.example.com').data['next']
+    # The cached page links to the next one from the host requested
+    cached = client.get(url, HTTP_HOST='b.example.com').data['next']
+    assert first.startswith('http://a.example.com/bills/')
+    assert cached.startswith('http://b.example.com/bills/')
+    assert cached.replace('b.example.com', 'a.example.com') == first
+
+
+def test_get_bill_page_keyset_query(client, make_call_record):
+    make_month_of_calls(make_call_record, 3)
+    url = client.get('/bills/99988526423?reference=08/2018&page_size=1'
+                     ).data['next']
+    with CaptureQueriesContext(connection) as context:
+        client.get(url)
+    bill_queries = [q['sql'] for q in context.captured_queries
+                    if 'FROM "core_bill"' in q['sql']]
+    assert bill_queries
+    assert not any('OFFSET' in sql for sql in bill_queries)
+    # The keyset range stops at the end of the period
+    page_query = next(sql for sql in bill_queries
+                      if 'ORDER BY "core_bill"."start"' in sql)
+    assert '"core_bill"."start" >=' in page_query
+    assert '"core_bill"."start" <' in page_query.replace(
+        '"core_bill"."start" <=', '')
+
+
+@pytest.mark.skipif(connection.vendor != 'postgresql',
+                    reason='EXPLAIN plans are checked on PostgreSQL only')
+def test_get_bill_page_index_range_scan(client, make_call_record):
+    make_month_of_calls(make_call_record, 3)
+    url = client.get('/bills/99988526423?reference=08/2018&page_size=1'
+                     ).data['next']
+    with CaptureQueriesContext(connection) as context:
+        client.get(url)
+    page_query = next(q['sql'] for q in context.captured_queries
+                      if 'ORDER BY "core_bill"."start"' in q['sql'])
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute(f'EXPLAIN {page_query}')
+        plan = '\n'.join(row[0] for row in cursor.fetchall())
+    assert 'core_bill_source_3cb99b_idx' in plan
+    index_cond = next(line for line in plan.splitlines()
+                      if 'Index Cond' in line)
+    assert 'start >=' in index_cond
+    assert 'start <' in index_cond.replace('start <=', '')
+
+
+def test_get_bill_invalid_cursor(client):
+    response = client.get('/bills/99988526423?reference=08/2018&cursor=xyz')
+    assert response.status_code == 400
+
+
+def test_get_bill_invalid_page_size(client, settings):
+    settings.BILLS_PAGE_MAX_SIZE = 10
+    for page_size in ('0', '11', 'a'):
+        response = client.get(f'/bills/99988526423?reference=08/2018'
+                              f'&page_size={page_size}')
+        assert response.status_code == 400
+
+
+def test_get_bill_totals(client, make_call_record):
+    make_call_record(
+        start_timestamp='2018-08-25T08:28:00Z',
+        end_timestamp='2018-08-25T08:30:00Z'
+    )
+    make_call_record(
+        id='43',
+        start_timestamp='2018-08-26T21:57:13Z',
+        end_timestamp='2018-08-26T22:17:53Z'
+    )
+    response = client.get('/bills/99988526423?reference=08/2018&page_size=1')
+    assert response.data['total_calls'] == 2
+    assert response.data['total_duration'] == '0h22m40s'
+    assert response.data['total_price'] == 'R$ 1,08'
+
+
+def test_get_bill_empty_totals(client):
+    response = client.get('/bills/99988526423?reference=08/2018')
+    assert response.data['total_calls'] == 0
+    assert response.data['total_duration'] == '0h0m0s'
+    assert response.data['total_price'] == 'R$ 0,00'
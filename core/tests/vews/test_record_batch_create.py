@@ -0,0 +1,317 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core import tariffs
+from core.batch import RecordBatch
+from core.models import (
+    Bill,
+    Call,
+    LineState,
+    MonthlyStatement,
+    Record,
+    StagedRecord
+)
+
+
+def post_batch(client, data):
+    return client.post('/records/batch', json.dumps(data),
+                       content_type='application/json')
+
+
+def make_batch(size, start='2018-09-25T08:00:00Z'):
+    start = timezone.datetime.strptime(start, '%Y-%m-%dT%H:%M:%SZ')
+    data = []
+    for call_id in range(1, size + 1):
+        data.append({
+            'type': Record.START,
+            'call_id': call_id,
+            'timestamp': f'{start:%Y-%m-%dT%H:%M:%SZ}',
+            'source': f'119876{call_id:05d}',
+            'destination': f'219876{call_id:05d}'
+        })
+    for call_id in range(1, size + 1):
+        end = start + timezone.timedelta(minutes=call_id)
+        data.append({
+            'type': Record.END,
+            'call_id': call_id,
+            'timestamp': f'{end:%Y-%m-%dT%H:%M:%SZ}'
+        })
+    return data
+
+
+def test_create_batch_success(client):
+    data = [
+        {
+            'type': Record.START,
+            'call_id': 42,
+            'timestamp': '2018-09-25T08:20:00Z',
+            'source': '11987665433',
+            'destination': '9933468278'
+        },
+        {
+            'type': Record.END,
+            'call_id': 42,
+            'timestamp': '2018-09-25T08:28:00Z'
+        }
+    ]
+    response = post_batch(client, data)
+    results = response.json()['results']
+    assert response.status_code == 200
+    assert [r['status'] for r in results] == [201, 201]
+    assert [r['data'] for r in results] == data
+    assert Record.objects.count() == 2
+    assert Bill.objects.get(call_id=42).price == Bill.objects.get(
+        call_id=42).calculate_price()
+
+
+def test_create_batch_partial_failure(client, make_start_record):
+    make_start_record('2018-09-25T08:00:00Z')
+    data = [
+        {
+            'type': Record.START,
+            'call_id': 43,
+            'timestamp': '2018-09-25T08:10:00Z',
+            'source': '99988526423',
+            'destination': '11987665433'
+        },
+        {
+            'type': Record.END,
+            'call_id': 42,
+            'timestamp': '2018-09-25T08:30:00Z'
+        },
+        {
+            'type': Record.START,
+            'call_id': 44,
+            'timestamp': '2018-09-25T08:31:00Z',
+            'source': '1199',
+            'destination': '11987665433'
+        },
+        {
+            'type': Record.END,
+            'call_id': 45,
+            'timestamp': '2018-09-25T08:31:00Z'
+        }
+    ]
+    response = post_batch(client, data)
+    results = response.json()['results']
+    assert [r['status'] for r in results] == [400, 201, 400, 202]
+    assert results[0]['errors'] == ['There is already an ongoing call from '
+                                    'this source']
+    assert 'source' in results[2]['errors']
+    assert Record.objects.count() == 2
+    assert Bill.objects.count() == 1
+    assert StagedRecord.objects.get().call_id == 45
+
+
+def test_create_batch_overlapping_records(client, make_call_record):
+    make_call_record(
+        start_timestamp='2018-09-25T08:00:00Z',
+        end_timestamp='2018-09-25T09:00:00Z'
+    )
+    data = [
+        {
+            'type': Record.START,
+            'call_id': 43,
+            'timestamp': '2018-09-25T08:30:00Z',
+            'source': '99988526423',
+            'destination': '11987665433'
+        },
+        {
+            'type': Record.START,
+            'call_id': 44,
+            'timestamp': '2018-09-25T07:30:00Z',
+            'source': '99988526423',
+            'destination': '11987665433'
+        },
+        {
+            'type': Record.END,
+            'call_id': 44,
+            'timestamp': '2018-09-25T09:30:00Z'
+        }
+    ]
+    response = post_batch(client, data)
+    results = response.json()['results']
+    assert results[0]['errors'] == ['There is already a call record for '
+                                    'this source in this interval.']
+    assert results[1]['status'] == 201
+    assert results[2]['errors'] == ['Cannot end this call overlapping '
+                                    'another call record with the same '
+                                    'source']
+
+
+def non_insert_queries(context):
+    """
+    Bulk inserts and updates are split in several statements by SQLite, so
+    they are left out of the count
+    """
+    return [q for q in context.captured_queries
+            if not q['sql'].startswith('INSERT') and
+            not q['sql'].startswith('UPDATE "core_linestate"')]
+
+
+def test_create_batch_constant_queries(client):
+    # Tariffs are loaded once per process
+    tariffs.for_time(timezone.now())
+    with CaptureQueriesContext(connection) as small:
+        post_batch(client, make_batch(5))
+    Call.objects.all().delete()
+    MonthlyStatement.objects.all().delete()
+
+    with CaptureQueriesContext(connection) as large:
+        response = post_batch(client, make_batch(200))
+    assert len(non_insert_queries(large)) == len(non_insert_queries(small))
+    assert all(r['status'] == 201 for r in response.json()['results'])
+    assert Bill.objects.count() == 200
+    # Lines are updated in place, by batches of the database parameter limit
+    line_updates = [q for q in large.captured_queries
+                    if q['sql'].startswith('UPDATE "core_linestate"')]
+    batch_size = connection.ops.bulk_batch_size(
+        ['pk', 'pk'] + [None] * 4, [None] * 400
+    )
+    assert len(line_updates) == -(-400 // batch_size)
+    assert not any(q['sql'].startswith('DELETE FROM "core_linestate"')
+                   for q in large.captured_queries)
+
+
+def test_create_batch_invalid_payload(client):
+    response = post_batch(client, {'type': Record.START})
+    assert response.status_code == 400
+
+
+def test_create_batch_too_large(client, settings):
+    settings.RECORD_BATCH_MAX_SIZE = 2
+    response = post_batch(client, make_batch(2))
+    assert response.status_code == 400
+    assert Record.objects.count() == 0
+
+
+def test_create_batch_replayed_records(client):
+    data = make_batch(2)
+    post_batch(client, data)
+    response = post_batch(client, data + data[:1])
+    results = response.json()['results']
+    assert [r['status'] for r in results] == [200] * 5
+    assert [r['data'] for r in results] == data + data[:1]
+    assert Record.objects.count() == 4
+
+
+def start_42(source, destination):
+    return {'type': Record.START, 'call_id': 42,
+            'timestamp': '2018-09-25T08:00:00Z', 'source': source,
+            'destination': destination}
+
+
+@pytest.fixture()
+def post_after_calls_read(client, monkeypatch):
+    """
+    Makes the next batch post a record to /records right after it first
+    reads its calls, before locking their lines, as a concurrent post of
+    other lines would
+    """
+    def _post_after_calls_read(record):
+        load_phones = RecordBatch.load_phones
+
+        def load_phones_then_post(self):
+            phones = load_phones(self)
+            monkeypatch.setattr(RecordBatch, 'load_phones', load_phones)
+            assert client.post('/records', record).status_code == 201
+            return phones
+
+        monkeypatch.setattr(RecordBatch, 'load_phones',
+                            load_phones_then_post)
+
+    return _post_after_calls_read
+
+
+def test_create_batch_start_of_call_created_concurrently(
+        client, post_after_calls_read):
+    post_after_calls_read(start_42('99988526423', '9933468278'))
+    response = post_batch(client, [start_42('11987654321', '21987654321')])
+    assert response.json()['results'][0]['errors'] == {
+        'id': ['Call with this Id already exists.']
+    }
+    assert Call.objects.get(id=42).source == '99988526423'
+
+
+def test_create_batch_end_of_call_created_concurrently(
+        client, post_after_calls_read):
+    post_after_calls_read(start_42('99988526423', '9933468278'))
+    response = post_batch(client, [{'type': Record.END, 'call_id': 42,
+                                    'timestamp': '2018-09-25T08:10:00Z'}])
+    # The lines of the call are locked before the record is checked
+    assert response.json()['results'][0]['status'] == 201
+    assert LineState.objects.get(phone='99988526423').source_call is None
+    assert Bill.objects.filter(call_id=42).exists()
+
+
+def test_create_batch_call_created_after_read_again(client, monkeypatch):
+    client.post('/records', start_42('99988526423', '9933468278'))
+    load_phones, load = RecordBatch.load_phones, RecordBatch.load
+    reads = []
+
+    # The first attempt reads the batch as before the concurrent post
+    # created the call
+    def load_phones_without_call(self):
+        phones = load_phones(self)
+        reads.append(self)
+        if len(reads) <= 2:
+            del self.calls[42]
+        return phones
+
+    def load_without_call(self, phones):
+        load(self, phones)
+        if len(reads) <= 2:
+            del self.records[(42, Record.START)]
+
+    monkeypatch.setattr(RecordBatch, 'load_phones', load_phones_without_call)
+    monkeypatch.setattr(RecordBatch, 'load', load_without_call)
+    response = post_batch(client, [start_42('11987654321', '21987654321')])
+    # The insert of the call fails, and the batch is checked again
+    assert len(reads) == 4
+    assert response.json()['results'][0]['errors'] == {
+        'id': ['Call with this Id already exists.']
+    }
+    assert Call.objects.get(id=42).source == '99988526423'
+
+
+@pytest.mark.skipif(not connection.features.has_select_for_update,
+                    reason='Lines are locked by row locks on PostgreSQL')
+def test_create_batch_and_record_on_same_line(transactional_db):
+    barrier = threading.Barrier(2)
+
+    def post(path, data):
+        try:
+            barrier.wait()
+            return Client().post(path, json.dumps(data),
+                                 content_type='application/json')
+        finally:
+            connection.close()
+
+    for round in range(5):
+        # Both start a call from the same source at the same time
+        source = f'9998852{round:04d}'
+        batch_call, single_call = round * 10 + 1, round * 10 + 2
+        start = {'type': Record.START,
+                 'timestamp': f'2018-09-{round + 10}T08:00:00Z',
+                 'source': source}
+        with ThreadPoolExecutor(2) as executor:
+            batch = executor.submit(post, '/records/batch', [dict(
+                start, call_id=batch_call, destination='9933468278'
+            )])
+            single = executor.submit(post, '/records', dict(
+                start, call_id=single_call, destination='9933468279'
+            ))
+        batch_status = batch.result().json()['results'][0]['status']
+        single_status = single.result().status_code
+        assert sorted([batch_status, single_status]) == [201, 400]
+        created = batch_call if batch_status == 201 else single_call
+        assert list(Record.objects.filter(
+            source=source).values_list('call_id', flat=True)) == [created]
+        assert LineState.objects.get(phone=source).source_call_id == created
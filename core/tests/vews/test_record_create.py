@@ -1,4 +1,13 @@
-from core.models import Record
+import json
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core import tariffs
+from core.models import Record, StagedRecord
+from core.validation import RecordValidator
 
 
 def test_create_start_record_success(client):
@@ -28,6 +37,148 @@ def test_create_end_record_success(client, make_start_record):
     assert response.json() == data
 
 
+def test_create_end_record_before_start_record(client):
+    data = {
+        'type': Record.END,
+        'call_id': 42,
+        'timestamp': '2018-09-25T08:28:00Z',
+    }
+    response = client.post('/records', data)
+    retry = client.post('/records', data)
+    assert response.status_code == 202
+    assert retry.status_code == 202
+    assert response.json() == data
+    assert Record.objects.count() == 0
+    assert StagedRecord.objects.get().call_id == 42
+
+
 def test_create_record_fails(client):
     response = client.post('/records')
     assert response.status_code == 400
+
+
+def replay_data():
+    return {
+        'type': 'start',
+        'timestamp': '2018-09-25T08:20:00Z',
+        'call_id': 70,
+        'source': '99988526423',
+        'destination': '9933468278'
+    }
+
+
+def test_replayed_record_from_memory(client, django_assert_num_queries):
+    created = client.post('/records', replay_data())
+    assert created.status_code == 201
+    with django_assert_num_queries(0):
+        replayed = client.post('/records', replay_data())
+    assert replayed.status_code == 200
+    assert replayed.json() == created.json()
+
+
+def test_replayed_record_from_database(client, django_assert_num_queries):
+    from core import replay
+
+    created = client.post('/records', replay_data())
+    end = {'type': 'end', 'timestamp': '2018-09-25T08:28:00Z', 'call_id': 70}
+    client.post('/records', end)
+    replay.recent.clear()
+    # The call is found to exist, then the record is looked up
+    with django_assert_num_queries(2):
+        replayed = client.post('/records', replay_data())
+    assert replayed.status_code == 200
+    assert replayed.json() == created.json()
+    assert client.post('/records', end).status_code == 200
+
+
+def test_replayed_record_lookup_bounded_by_timestamp(client):
+    from core import replay
+
+    client.post('/records', replay_data())
+    replay.recent.clear()
+    with CaptureQueriesContext(connection) as queries:
+        assert client.post('/records', replay_data()).status_code == 200
+    # Reads a single partition when records are partitioned
+    assert any('"core_record"."timestamp" =' in q['sql']
+               for q in queries.captured_queries)
+
+
+def test_replayed_record_other_timezone(client):
+    client.post('/records', replay_data())
+    data = replay_data()
+    data['timestamp'] = '2018-09-25T05:20:00-03:00'
+    assert client.post('/records', data).status_code == 200
+
+
+def test_changed_record_is_not_a_replay(client):
+    client.post('/records', replay_data())
+    data = replay_data()
+    data['timestamp'] = '2018-09-25T08:21:00Z'
+    response = client.post('/records', data)
+    assert response.status_code == 400
+
+
+def test_create_end_record_reads(client, make_start_record):
+    make_start_record('2018-09-25T08:20:00Z')
+    tariffs.for_time(timezone.now())
+    data = {'type': 'end', 'timestamp': '2018-09-25T08:28:00Z', 'call_id': 42}
+    with CaptureQueriesContext(connection) as queries:
+        response = client.post('/records', json.dumps(data),
+                               content_type='application/json')
+    assert response.status_code == 201
+    # Call and its records, line states with the records of the call again
+    # under the lock, and the statement
+    reads = [q for q in queries.captured_queries
+             if q['sql'].startswith('SELECT')]
+    assert len(reads) == 3
+    # The line states are updated by one statement, without savepoints
+    sql = [q['sql'] for q in queries.captured_queries]
+    assert len([q for q in sql if q.startswith('UPDATE')]) == 1
+    assert len([q for q in sql if q.startswith('SAVEPOINT')]) == 1
+
+
+@pytest.fixture()
+def post_concurrently(client, monkeypatch):
+    """
+    Makes the next post to /records save another record right after it is
+    validated, as a concurrent post saved first would
+    """
+    def _post_concurrently(other):
+        is_valid = RecordValidator.is_valid
+
+        def is_valid_then_post(self):
+            valid = is_valid(self)
+            monkeypatch.setattr(RecordValidator, 'is_valid', is_valid)
+            assert client.post('/records', other).status_code == 201
+            return valid
+
+        monkeypatch.setattr(RecordValidator, 'is_valid', is_valid_then_post)
+
+    return _post_concurrently
+
+
+@pytest.mark.parametrize('data, status', [
+    (replay_data(), 200),
+    (dict(replay_data(), destination='9933468279'), 400)
+])
+def test_create_start_record_saved_concurrently(client, post_concurrently,
+                                                data, status):
+    post_concurrently(replay_data())
+    response = client.post('/records', data)
+    # Answered as if posted after the other record
+    assert response.status_code == status
+    assert Record.objects.count() == 1
+
+
+@pytest.mark.parametrize('timestamp, status', [
+    ('2018-09-25T08:28:00Z', 200),
+    ('2018-10-25T08:28:00Z', 400)
+])
+def test_create_end_record_saved_concurrently(client, post_concurrently,
+                                              timestamp, status):
+    client.post('/records', replay_data())
+    end = {'type': 'end', 'timestamp': '2018-09-25T08:28:00Z', 'call_id': 70}
+    post_concurrently(end)
+    response = client.post('/records', dict(end, timestamp=timestamp))
+    assert response.status_code == status
+    assert Record.objects.filter(type=Record.END).count() == 1
@@ -0,0 +1,79 @@
+import pytest
+from django.core.management import call_command
+
+from core.models import Bill, QueuedRecord, Record
+
+
+@pytest.fixture()
+def async_mode(settings):
+    settings.RECORD_INGESTION_MODE = 'async'
+
+
+def start_data(call_id=42, timestamp='2018-09-25T08:20:00Z'):
+    return {
+        'type': Record.START,
+        'call_id': call_id,
+        'timestamp': timestamp,
+        'source': '11987665433',
+        'destination': '9933468278'
+    }
+
+
+def end_data(call_id=42, timestamp='2018-09-25T08:28:00Z'):
+    return {
+        'type': Record.END,
+        'call_id': call_id,
+        'timestamp': timestamp
+    }
+
+
+def test_queue_record(client, async_mode, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        response = client.post('/records', start_data())
+    assert response.status_code == 202
+    assert response.data['status'] == QueuedRecord.QUEUED
+    assert response['Location'] == (f'/records/queue/'
+                                     f'{response.data["tracking_id"]}')
+    assert not Record.objects.exists()
+
+
+def test_queue_invalid_record(client, async_mode):
+    data = start_data()
+    data['source'] = '1199'
+    response = client.post('/records', data)
+    assert response.status_code == 400
+    assert not QueuedRecord.objects.exists()
+
+
+def test_process_queued_records(client, async_mode):
+    start = client.post('/records', start_data())
+    end = client.post('/records', end_data())
+    overlap = client.post('/records', start_data(
+        call_id=43, timestamp='2018-09-25T08:25:00Z'
+    ))
+    call_command('process_record_queue', '--once')
+
+    response = client.get(start['Location'])
+    assert response.status_code == 200
+    assert response.data['status'] == QueuedRecord.CREATED
+    assert response.data['result'] == start_data()
+    assert response.data['processed_at']
+    assert client.get(end['Location']).data['status'] == QueuedRecord.CREATED
+    response = client.get(overlap['Location'])
+    assert response.data['status'] == QueuedRecord.REJECTED
+    assert response.data['result'] == ['There is already a call record for '
+                                       'this source in this interval.']
+    assert Bill.objects.get(call_id=42).total_minutes == 8
+
+
+def test_process_queued_orphan_end_record(client, async_mode):
+    response = client.post('/records', end_data())
+    call_command('process_record_queue', '--once')
+    response = client.get(response['Location'])
+    assert response.data['status'] == QueuedRecord.STAGED
+
+
+def test_record_status_not_found(client):
+    response = client.get('/records/queue/9a1b7d1e-3d3b-4d6e-9f44-'
+                          '2f7a1c1f2b3c')
+    assert response.status_code == 404
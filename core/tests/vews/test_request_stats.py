@@ -0,0 +1,74 @@
+import json
+import logging
+
+import pytest
+
+from core.middleware import server_timing
+
+
+@pytest.fixture()
+def request_stats(settings):
+    settings.REQUEST_STATS_ENABLED = True
+    settings.REQUEST_STATS_SAMPLE_RATE = 1
+    settings.REQUEST_STATS_HEADER = True
+
+
+def logged_stats(caplog):
+    return [json.loads(r.message) for r in caplog.records
+            if r.name == 'core.middleware']
+
+
+def test_record_create_stats(client, request_stats, make_call, caplog):
+    record = {
+        'type': 'start',
+        'timestamp': '2018-09-25T08:20:00Z',
+        'call_id': '70',
+        'source': '99988526423',
+        'destination': '9933468278'
+    }
+    with caplog.at_level(logging.INFO, logger='core.middleware'):
+        response = client.post('/records', record)
+    assert response.status_code == 201
+    stats, = logged_stats(caplog)
+    assert stats['path'] == '/records'
+    assert stats['status'] == 201
+    assert stats['queries'] > 0
+    timing = stats['timings']['Record.validate_unique_source_timestamp']
+    assert timing['calls'] == 1
+    assert f'{stats["queries"]} queries' in response['Server-Timing']
+
+
+def test_bill_list_stats(client, request_stats, make_call_record, caplog):
+    make_call_record()
+    with caplog.at_level(logging.INFO, logger='core.middleware'):
+        client.get('/bills/99988526423')
+    stats, = logged_stats(caplog)
+    assert stats['queries'] > 0
+    assert 'db_ms' in stats
+
+
+def test_stats_disabled_by_default(client, caplog):
+    with caplog.at_level(logging.INFO, logger='core.middleware'):
+        response = client.get('/bills/99988526423')
+    assert not logged_stats(caplog)
+    assert not response.has_header('Server-Timing')
+
+
+def test_stats_sampling(client, request_stats, settings, caplog):
+    settings.REQUEST_STATS_SAMPLE_RATE = 0
+    with caplog.at_level(logging.INFO, logger='core.middleware'):
+        client.get('/bills/99988526423')
+    assert not logged_stats(caplog)
+
+
+def test_server_timing():
+    data = {
+        'total_ms': 5.1,
+        'db_ms': 2.5,
+        'queries': 3,
+        'timings': {'Bill.calculate_price': {'calls': 2, 'ms': 0.1}}
+    }
+    assert server_timing(data) == (
+        'total;dur=5.1, db;dur=2.5;desc="3 queries", '
+        'Bill.calculate_price;dur=0.1;desc="2 calls"'
+    )
@@ -1,4 +1,7 @@
+import re
+
 from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils import timezone
 
 from rest_framework.exceptions import ValidationError as DRFValidationError
 from rest_framework.views import exception_handler as drf_exception_handler
@@ -12,3 +15,43 @@ def custom_exception_handler(exc, context):
         exc = DRFValidationError(detail=exc.message_dict)
 
     return drf_exception_handler(exc, context)
+
+
+def month_range(month, year):
+    """
+    Returns the aware datetimes [start, end) delimiting a month, in the
+    current timezone
+    """
+    start = timezone.datetime(year, month, 1)
+    if month == 12:
+        end = start.replace(year=year + 1, month=1)
+    else:
+        end = start.replace(month=month + 1)
+    return timezone.make_aware(start), timezone.make_aware(end)
+
+
+def format_duration(total_seconds):
+    """
+    Formats a number of seconds as XhYmZs
+    """
+    hours, rem = divmod(total_seconds, 60 * 60)
+    minutes, seconds = divmod(rem, 60)
+    return f'{hours}h{minutes}m{seconds}s'
+
+
+def format_price(price):
+    """
+    Formats a price in Brazilian Real, ie: R$ 0,54
+    """
+    return f'R$ {price:.2f}'.replace('.', ',')
+
+
+def parse_reference(reference):
+    """
+    Parses a reference period formatted as MM/YYYY, MM-YYYY, MM:YYYY or
+    MM.YYYY. Returns a (month, year) tuple, or raises ValueError.
+    """
+    month, year = map(int, re.split(r'[^\d]', reference))
+    if not 1 <= month <= 12:
+        raise ValueError(f'Invalid month: {month}')
+    return month, year
@@ -0,0 +1,245 @@
+import re
+from collections.abc import Mapping
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError
+from django.http import QueryDict
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from pytz import InvalidTimeError
+
+from core.models import Call, LineState, Record, RecordContext
+
+# Messages of the serializer fields and model checks replaced by
+# RecordValidator, which must answer exactly as the serializers do with the
+# Django REST framework release locked in Pipfile.lock
+REQUIRED = 'This field is required.'
+NULL = 'This field may not be null.'
+BLANK = 'This field may not be blank.'
+NULL_CHARACTERS = 'Null characters are not allowed.'
+INVALID_STRING = 'Not a valid string.'
+INVALID_INTEGER = 'A valid integer is required.'
+INTEGER_TOO_LONG = 'String value too large.'
+INVALID_CHOICE = '"{input}" is not a valid choice.'
+INVALID_DATETIME = ('Datetime has wrong format. Use one of these formats '
+                    'instead: '
+                    'YYYY-MM-DDThh:mm[:ss[.uuuuuu]][+HH:MM|-HH:MM|Z].')
+DATETIME_OVERFLOW = 'Datetime value out of range.'
+DATETIME_NOT_AWARE = 'Invalid datetime for the timezone "{timezone}".'
+SAME_PHONES = 'Source and Destination cannot be equal'
+CALL_EXISTS = 'Call with this Id already exists.'
+CALL_MISSING = 'call instance with id {call_id} does not exist.'
+RECORD_EXISTS = 'Record with this Call and Type already exists.'
+TYPE_NULL = 'This field cannot be null.'
+
+DECIMAL_RE = re.compile(r'\.0*\s*$')
+PHONE_RE = Call.phone_validator.regex
+TYPES = {Record.START, Record.END}
+
+
+class FieldError(Exception):
+    pass
+
+
+class RecordConflict(Exception):
+    """
+    Raised by ``RecordValidator.save`` when a concurrent post of the same
+    call was saved after the record was validated
+    """
+
+
+def parse_integer(value):
+    if isinstance(value, str) and len(value) > 1000:
+        raise FieldError(INTEGER_TOO_LONG)
+    try:
+        return int(DECIMAL_RE.sub('', str(value)))
+    except (ValueError, TypeError):
+        raise FieldError(INVALID_INTEGER)
+
+
+def parse_phone(value):
+    if value == '' or str(value).strip() == '':
+        raise FieldError(BLANK)
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise FieldError(INVALID_STRING)
+    value = str(value).strip()
+    errors = []
+    if not PHONE_RE.search(value):
+        errors.append(Call.phone_validator.message)
+    if '\x00' in value:
+        errors.append(NULL_CHARACTERS)
+    if errors:
+        raise FieldError(*errors)
+    return value
+
+
+def parse_type(value):
+    if str(value) not in TYPES:
+        raise FieldError(INVALID_CHOICE.format(input=value))
+    return str(value)
+
+
+def parse_timestamp(value):
+    try:
+        parsed = parse_datetime(value)
+    except (ValueError, TypeError):
+        parsed = None
+    if parsed is None:
+        raise FieldError(INVALID_DATETIME)
+
+    current = timezone.get_current_timezone()
+    if timezone.is_aware(parsed):
+        try:
+            return parsed.astimezone(current)
+        except OverflowError:
+            raise FieldError(DATETIME_OVERFLOW)
+    try:
+        return timezone.make_aware(parsed, current)
+    except InvalidTimeError:
+        raise FieldError(DATETIME_NOT_AWARE.format(timezone=current))
+
+
+def format_timestamp(value):
+    value = timezone.localtime(value).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+class RecordValidator:
+    """
+    Validates and creates a record posted to :view:`core.RecordCreate`,
+    with the rules and error messages of ``StartRecordSerializer`` and
+    ``EndRecordSerializer``.
+
+    Each field is parsed and checked once, and the call is read with a
+    single query, so the record is saved without cleaning its fields again
+    in ``Call.save`` and ``Record.save``. Like the serializers, it expects
+    ``USE_TZ`` and ISO 8601 timestamps.
+    """
+
+    def __init__(self, data):
+        if isinstance(data, QueryDict):
+            # Like form fields, an optional field left blank is missing
+            data = {key: value for key, value in data.dict().items()
+                    if value != '' or key != 'type'}
+        self.initial_data = data
+        self.validated_data = {}
+        self.errors = {}
+        self.call = None
+        self.records = {}
+        self.start = data.get('type') == Record.START \
+            if isinstance(data, Mapping) else False
+
+    def is_valid(self):
+        data = self.initial_data
+        if not isinstance(data, Mapping):
+            self.errors = {'non_field_errors': [
+                f'Invalid data. Expected a dictionary, but got '
+                f'{type(data).__name__}.'
+            ]}
+            return False
+
+        parsers = [('call_id', parse_integer)]
+        if self.start:
+            parsers += [('source', parse_phone), ('destination', parse_phone)]
+        parsers += [('type', parse_type), ('timestamp', parse_timestamp)]
+
+        for name, parse in parsers:
+            if name not in data:
+                if name != 'type':
+                    self.errors[name] = [REQUIRED]
+                continue
+            if data[name] is None:
+                self.errors[name] = [NULL]
+                continue
+            try:
+                self.validated_data[name] = parse(data[name])
+            except FieldError as exc:
+                self.errors[name] = list(exc.args)
+
+        if not self.errors:
+            self.errors = self.validate(self.validated_data)
+        return not self.errors
+
+    def validate(self, attrs):
+        """
+        Runs the checks of the serializers ``validate``, returning their
+        errors, if any
+        """
+        call_id = attrs['call_id']
+        if self.start:
+            if attrs['source'] == attrs['destination']:
+                return {'non_field_errors': [SAME_PHONES]}
+            errors = []
+            for validator in Call._meta.get_field('id').validators:
+                try:
+                    validator(call_id)
+                except DjangoValidationError as exc:
+                    errors.extend(exc.messages)
+            if errors:
+                return {'id': errors}
+            if Call.objects.filter(id=call_id).exists():
+                return {'id': [CALL_EXISTS]}
+            self.call = Call(id=call_id, source=attrs['source'],
+                             destination=attrs['destination'])
+            return {}
+
+        rows = Call.objects.filter(id=call_id).values_list(
+            'source', 'destination', 'records__type', 'records__timestamp'
+        )
+        if not rows:
+            return {'call': [CALL_MISSING.format(call_id=call_id)]}
+        self.records = {row[2]: row[3] for row in rows if row[2]}
+        if attrs.get('type', Record.START) in self.records:
+            return {'__all__': [RECORD_EXISTS]}
+        if 'type' not in attrs:
+            # Raised by Record.save when the serializer left the type out
+            return {'type': [TYPE_NULL]}
+        self.call = Call(id=call_id, source=rows[0][0],
+                         destination=rows[0][1])
+        return {}
+
+    def save(self):
+        """
+        Creates the call of a start record and the record, running the
+        record validations of ``Record.save`` under the lock of the lines.
+
+        The call was checked before the lock was taken, so it is checked
+        again under it: the call of a start record must still be missing,
+        and the records of an end record's call are read again. Raises
+        RecordConflict when a concurrent post of the call was saved first.
+        """
+        attrs = self.validated_data
+        record = Record(
+            call=self.call,
+            type=attrs['type'],
+            timestamp=attrs['timestamp'],
+            source=self.call.source,
+            destination=self.call.destination
+        )
+        with LineState.objects.lock(self.call.source, self.call.destination):
+            if self.start:
+                context = RecordContext(record, self.records)
+                try:
+                    self.call.save(clean=False, force_insert=True)
+                except IntegrityError:
+                    raise RecordConflict
+            else:
+                context = RecordContext(record)
+                if record.type in context.records:
+                    raise RecordConflict
+            record.save(clean=False, force_insert=True, context=context,
+                        locked=True)
+
+    @property
+    def data(self):
+        attrs = self.validated_data
+        data = {'call_id': attrs['call_id']}
+        if self.start:
+            data.update(source=attrs['source'],
+                        destination=attrs['destination'])
+        if 'type' in attrs:
+            data['type'] = attrs['type']
+        data['timestamp'] = format_timestamp(attrs['timestamp'])
+        return data
@@ -1,38 +1,165 @@
-import re
-
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.utils.timezone import timedelta, now
 from rest_framework import status
 from rest_framework.exceptions import ParseError, ValidationError
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 
-from core import schemas
-from core.models import Bill
+from core import cache, export, pagination, record_queue, replay, schemas
+from core.batch import RecordBatch
+from core.models import Bill, MonthlyStatement, QueuedRecord
 from core.serializers import (
+    BatchEndRecordSerializer,
+    BatchStartRecordSerializer,
     BillSerializer,
     EndRecordSerializer,
+    QueuedRecordSerializer,
+    StagedRecordSerializer,
     StartRecordSerializer
 )
+from core.utils import (
+    format_price,
+    month_range,
+    parse_reference
+)
+from core.validation import RecordConflict, RecordValidator
+
+
+def get_reference_period(request):
+    """
+    Returns the (month, year) closed reference period requested, or the last
+    closed period when no reference is given
+    """
+    reference = request.GET.get('reference')
+    last_closed_period = now().replace(day=1) - timedelta(days=1)
+
+    if reference:
+        try:
+            month, year = parse_reference(reference)
+            ref_date = now().replace(year=year, month=month)
+        except ValueError:
+            message = ('Invalid reference period format. Try one of the '
+                       'following: MM/YYYY, MM-YYYY, MM:YYYY, MM.YYYY '
+                       'where MM is the month and YYYY is the year.')
+            raise ParseError(detail=message)
+
+        if ref_date > last_closed_period:
+            message = ('Invalid reference period. It\'s only possible to '
+                       'get a telephone bill after the reference period '
+                       'has ended.')
+            raise ValidationError(detail=message)
+    else:
+        month, year = last_closed_period.month, last_closed_period.year
+
+    return month, year
 
 
 class RecordCreate(APIView):
     """
-    Creates a start or end call record.
+    Creates a start or end call record. An end record received before the
+    start record of its call is staged, to be reconciled later, and a record
+    received again is answered with its original payload.
     """
 
     schema = schemas.get_record_schema()
 
     def post(self, request):
+        if settings.RECORD_INGESTION_MODE == 'async':
+            return self.enqueue(request)
+
         if request.data.get('type') == 'start':
-            serializer = StartRecordSerializer(data=request.data)
+            serializer_class = StartRecordSerializer
         else:
-            serializer = EndRecordSerializer(data=request.data)
+            serializer_class = EndRecordSerializer
+
+        # Records resent by switches are answered with their first payload,
+        # looked up in the database only once they fail validation
+        payload = replay.recall(request.data)
+        if payload is not None:
+            return Response(payload, status=status.HTTP_200_OK)
 
+        serializer = RecordValidator(request.data)
         if serializer.is_valid():
-            serializer.save()
+            try:
+                serializer.save()
+            except RecordConflict:
+                # Answered as if posted after the concurrent post of the
+                # call, which was saved first
+                return self.post(request)
+            replay.remember(serializer.data)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+        payload = replay.find(request.data, serializer_class)
+        if payload is not None:
+            return Response(payload, status=status.HTTP_200_OK)
+
+        if request.data.get('type') != 'start':
+            staged = StagedRecordSerializer(data=request.data)
+            if staged.is_valid():
+                staged.save()
+                return Response(staged.data, status=status.HTTP_202_ACCEPTED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def enqueue(self, request):
+        """
+        Only checks the record fields, without touching the database, and
+        queues it to be processed by the record queue worker
+        """
+        if request.data.get('type') == 'start':
+            serializer = BatchStartRecordSerializer(data=request.data)
+        else:
+            serializer = BatchEndRecordSerializer(data=request.data)
+
+        if not serializer.is_valid():
+            return Response(serializer.errors,
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        queued = record_queue.enqueue(serializer.data)
+        serializer = QueuedRecordSerializer(queued)
+        location = reverse('record-status', args=[queued.tracking_id])
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': location})
+
+
+class RecordStatus(APIView):
+    """
+    Retrieves the processing status of a record queued by the asynchronous
+    ingestion mode
+    """
+
+    schema = schemas.get_record_status_schema()
+
+    def get(self, request, tracking_id):
+        queued = get_object_or_404(QueuedRecord, tracking_id=tracking_id)
+        serializer = QueuedRecordSerializer(queued)
+        return Response(serializer.data)
+
+
+class RecordBatchCreate(APIView):
+    """
+    Creates a batch of start and end call records.
+    """
+
+    schema = schemas.get_record_batch_schema()
+
+    def post(self, request):
+        if not isinstance(request.data, list):
+            raise ParseError(detail='Expected a list of records.')
+
+        max_size = settings.RECORD_BATCH_MAX_SIZE
+        if len(request.data) > max_size:
+            message = f'A batch cannot have more than {max_size} records.'
+            raise ValidationError(detail=message)
+
+        results = RecordBatch(request.data).save()
+        return Response({'results': results})
+
 
 class BillList(APIView):
     """
@@ -42,34 +169,137 @@ class BillList(APIView):
     schema = schemas.get_bill_schema()
 
     def get(self, request, subscriber):
-        reference = request.GET.get('reference')
-        last_closed_period = now().replace(day=1) - timedelta(days=1)
+        month, year = get_reference_period(request)
+        cursor, page_size = self.get_page(request)
+        page = f'{page_size}:{request.GET.get("cursor", "")}'
+
+        # Cached pages are served from the cache alone, the generation of
+        # their statement included
+        generation = cache.get_generation(subscriber, month, year)
+        entry = None
+        if generation is not None:
+            entry = cache.get_bills(subscriber, month, year, generation, page)
+        if entry is None:
+            statement = MonthlyStatement.objects.filter(
+                source=subscriber,
+                year=year,
+                month=month
+            ).first() or MonthlyStatement(source=subscriber, year=year,
+                                          month=month)
+            generation = cache.generation(statement)
+            cache.add_generation(subscriber, month, year, generation)
+            entry = cache.get_bills(subscriber, month, year, generation, page)
+        if entry is None:
+            data, next_cursor = self.get_response_data(
+                subscriber, month, year, cursor, page_size, statement
+            )
+            entry = cache.set_bills(subscriber, month, year, generation, data,
+                                    next_cursor, page)
+
+        response = get_conditional_response(
+            request,
+            etag=entry['etag'],
+            last_modified=entry['last_modified']
+        )
+        if response is None:
+            response = Response(dict(
+                entry['data'],
+                next=self.get_next_url(request, entry['cursor'])
+            ))
+        response['ETag'] = entry['etag']
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        return response
 
-        if reference:
+    def get_page(self, request):
+        """
+        Returns the decoded cursor and the page size requested
+        """
+        cursor = request.GET.get('cursor')
+        if cursor is not None:
             try:
-                month, year = map(int, re.split('[^\d]', reference))
-                ref_date = now().replace(year=year, month=month)
+                cursor = pagination.decode_cursor(cursor)
             except ValueError:
-                message = ('Invalid reference period format. Try one of the '
-                           'following: MM/YYYY, MM-YYYY, MM:YYYY, MM.YYYY '
-                           'where MM is the month and YYYY is the year.')
-                raise ParseError(detail=message)
-
-            if ref_date > last_closed_period:
-                message = ('Invalid reference period. It\'s only possible to '
-                           'get a telephone bill after the reference period '
-                           'has ended.')
-                raise ValidationError(detail=message)
-        else:
-            month, year = last_closed_period.month, last_closed_period.year
+                raise ParseError(detail='Invalid cursor.')
+
+        page_size = request.GET.get('page_size', settings.BILLS_PAGE_SIZE)
+        try:
+            page_size = int(page_size)
+        except ValueError:
+            page_size = 0
+        if not 0 < page_size <= settings.BILLS_PAGE_MAX_SIZE:
+            message = (f'Invalid page size. It must be between 1 and '
+                       f'{settings.BILLS_PAGE_MAX_SIZE}.')
+            raise ParseError(detail=message)
+        return cursor, page_size
+
+    def get_next_url(self, request, cursor):
+        """
+        Returns the URL of the page starting at cursor, relative to the
+        current request
+        """
+        if not cursor:
+            return None
+        return replace_query_param(request.build_absolute_uri(), 'cursor',
+                                   cursor)
 
+    def get_response_data(self, subscriber, month, year, cursor=None,
+                          page_size=None, statement=None):
+        """
+        Returns the data of a page of bills, without the URL of the next
+        page, and the cursor of the next page
+        """
         queryset = Bill.objects.get_bills(source=subscriber, m=month, y=year)
-        serializer = BillSerializer(queryset, many=True)
+        bills, next_cursor = pagination.bill_page(
+            queryset,
+            month_range(month, year)[1],
+            cursor=cursor,
+            size=page_size or settings.BILLS_PAGE_SIZE
+        )
+        serializer = BillSerializer(bills, many=True)
+
+        # Totals of the period are kept on its statement, so no page
+        # aggregates the bills of the whole period
+        if statement is None:
+            statement = MonthlyStatement.objects.filter(
+                source=subscriber,
+                year=year,
+                month=month
+            ).first() or MonthlyStatement(source=subscriber, year=year,
+                                          month=month)
 
         response_data = {
             'subscriber': subscriber,
             'reference_period': f'{month:02d}/{year}',
+            'total_calls': statement.call_count,
+            'total_duration': statement.duration,
+            'total_price': format_price(statement.total_price),
             'bill_call_records': serializer.data
         }
 
-        return Response(response_data)
+        return response_data, next_cursor
+
+
+class BillExport(APIView):
+    """
+    Streams the bills of a closed reference period for all subscribers, as
+    CSV or NDJSON
+    """
+
+    schema = schemas.get_bill_export_schema()
+
+    def get(self, request):
+        month, year = get_reference_period(request)
+        output = request.GET.get('output', 'csv')
+        if output not in export.FORMATS:
+            message = (f'Invalid output format. Try one of the following: '
+                       f'{", ".join(export.FORMATS)}.')
+            raise ParseError(detail=message)
+
+        response = StreamingHttpResponse(
+            export.export_bills(month, year, format=output,
+                                chunk_size=settings.BILLS_EXPORT_CHUNK_SIZE),
+            content_type=export.CONTENT_TYPES[output]
+        )
+        filename = f'bills-{year}-{month:02d}.{output}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
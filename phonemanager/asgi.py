@@ -0,0 +1,19 @@
+"""
+ASGI config for phonemanager project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Django 2.2 views are synchronous, so they run on a bounded thread pool while
+the ASGI server receives requests and sends responses, see
+``core.asgi.AsgiHandler``.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+from dj_static import Cling
+
+from core.asgi import AsgiHandler
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'phonemanager.settings')
+
+application = AsgiHandler(Cling(get_wsgi_application()))
@@ -51,6 +51,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.RequestStatsMiddleware',
 ]
 
 ROOT_URLCONF = 'phonemanager.urls'
@@ -85,6 +86,19 @@ DATABASES = {
     ),
 }
 
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': config(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -140,3 +154,98 @@ STD_MINUTE_CHARGE = config('STD_MINUTE_CHARGE', default=0.09)
 # Reduced Prices
 RDC_STANDING_CHARGE = config('RDC_STANDING_CHARGE', default=0.36)
 RDC_MINUTE_CHARGE = config('RDC_MINUTE_CHARGE', default=0)
+# The settings above price the calls started before the first core.Tariff.
+# Tariffs are kept in memory and reloaded when their version, stored in the
+# database, changes. The version is checked at most every
+# TARIFF_VERSION_CHECK_INTERVAL seconds
+TARIFF_VERSION_CHECK_INTERVAL = config('TARIFF_VERSION_CHECK_INTERVAL',
+                                       default=5, cast=float)
+
+"""
+Phone Manager ingestion settings.
+"""
+# Maximum number of records accepted by a single batch request
+RECORD_BATCH_MAX_SIZE = config('RECORD_BATCH_MAX_SIZE', default=1000,
+                               cast=int)
+# sync: records are validated and stored within the request. async: records
+# are queued and processed by the process_record_queue worker
+RECORD_INGESTION_MODE = config('RECORD_INGESTION_MODE', default='sync')
+# Seconds a staged end record waits for the start record of its call
+STAGED_RECORD_TTL = config('STAGED_RECORD_TTL', default=24 * 60 * 60,
+                           cast=int)
+
+# Number of recently created records each process remembers, so records
+# resent by switches are answered without validating them again
+RECORD_REPLAY_CACHE_SIZE = config('RECORD_REPLAY_CACHE_SIZE', default=10000,
+                                  cast=int)
+
+# Stores records and bills in monthly partitions, on PostgreSQL 11 or later.
+# Applied by migrate; the partitions process of the Procfile creates those of
+# the next months
+PARTITIONED_STORAGE = config('PARTITIONED_STORAGE', default=False, cast=bool)
+
+# Days after which the records of billed calls are moved to ArchivedRecord by
+# the archive_records command. Records older than that are no longer checked
+# for overlaps, so keep it longer than the delay of late records
+RECORD_ARCHIVE_HORIZON_DAYS = config('RECORD_ARCHIVE_HORIZON_DAYS',
+                                     default=90, cast=int)
+
+# Cache alias and timeout (seconds) of closed period bill responses. They
+# are keyed by the generation of their statement, cached whenever it changes
+BILLS_CACHE = config('BILLS_CACHE', default='default')
+BILLS_CACHE_TIMEOUT = config('BILLS_CACHE_TIMEOUT', default=60 * 60,
+                             cast=int)
+
+# Timeout (seconds) of the cached statement generations. With a cache not
+# shared by all processes, it bounds how long one serves pages of bills
+# changed by another
+BILLS_GENERATION_TIMEOUT = config('BILLS_GENERATION_TIMEOUT', default=60,
+                                  cast=int)
+
+# Default and maximum number of bills per page of /bills/<subscriber>
+BILLS_PAGE_SIZE = config('BILLS_PAGE_SIZE', default=1000, cast=int)
+BILLS_PAGE_MAX_SIZE = config('BILLS_PAGE_MAX_SIZE', default=10000, cast=int)
+
+# Number of bills fetched from the database at a time by bill exports
+BILLS_EXPORT_CHUNK_SIZE = config('BILLS_EXPORT_CHUNK_SIZE', default=2000,
+                                 cast=int)
+
+"""
+Phone Manager request instrumentation.
+"""
+# Reports SQL query counts and timings of requests as a log line of the
+# core.middleware logger
+REQUEST_STATS_ENABLED = config('REQUEST_STATS_ENABLED', default=False,
+                               cast=bool)
+# Share of requests instrumented, between 0 and 1
+REQUEST_STATS_SAMPLE_RATE = config('REQUEST_STATS_SAMPLE_RATE', default=1.0,
+                                   cast=float)
+# Also report them in a Server-Timing response header
+REQUEST_STATS_HEADER = config('REQUEST_STATS_HEADER', default=False,
+                              cast=bool)
+
+"""
+Phone Manager ASGI entry point, phonemanager.asgi.
+"""
+# Threads running views per process. Each thread holds its own database
+# connection, so keep it within the connections available to a process
+ASGI_THREADS = config('ASGI_THREADS', default=16, cast=int)
+# Largest request body, in bytes, before answering 413 Payload Too Large
+ASGI_MAX_BODY_SIZE = config('ASGI_MAX_BODY_SIZE', default=10 * 1024 * 1024,
+                            cast=int)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core': {
+            'handlers': ['console'],
+            'level': config('CORE_LOG_LEVEL', default='INFO'),
+        },
+    },
+}
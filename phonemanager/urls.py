@@ -7,6 +7,10 @@ from core import views
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('records', views.RecordCreate.as_view()),
+    path('records/batch', views.RecordBatchCreate.as_view()),
+    path('records/queue/<uuid:tracking_id>', views.RecordStatus.as_view(),
+         name='record-status'),
+    path('bills/export', views.BillExport.as_view()),
     path('bills/<subscriber>', views.BillList.as_view()),
     path('', include_docs_urls(title='Phone Manager API')),
 ]